@@ -0,0 +1 @@
+"""EVS assessment helpers shared by the Streamlit app and offline tooling."""
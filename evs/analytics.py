@@ -0,0 +1,250 @@
+"""Columnar tables of a document for ad-hoc SQL (DuckDB over Arrow / Parquet).
+
+The doc is flattened into a few long tables (one row per campus, answer,
+photo or score) so questions the dashboards don't cover are one query away:
+
+* ``campuses``    — system, hospital, campus and the campus profile
+* ``responses``   — every answer, value and comment (section, BCI area, question)
+* ``photos``      — photo metadata (no image data)
+* ``scores``      — per campus and period, scored with the doc's maps and weights
+* ``area_scores`` — per campus, period and BCI area
+
+`AnalyticsStore.sync` rebuilds the Arrow slices of campuses whose revision
+moved (all of them only when the response maps or weights change) and, when
+given a directory, rewrites only those campuses' Parquet files, so the tables
+stay fresh incrementally. Queries run on an in-process DuckDB connection with
+external file access disabled: SQL sees the registered tables and nothing else
+on the server.
+
+Needs ``pyarrow``, and ``duckdb`` for queries.
+"""
+import hashlib
+import json
+import os
+import time
+from datetime import date, datetime
+from typing import Dict, List, Tuple
+
+from evs.model import iter_campuses
+from evs.scoring import compute_period_components, summarise_from_components
+
+CampusPath = Tuple[str, str, str]
+
+# table -> ((column, arrow type name), ...); "date" is a date32, "float" a float64.
+TABLES: Dict[str, Tuple[Tuple[str, str], ...]] = {
+    "campuses": (("system", "str"), ("hospital", "str"), ("campus", "str"), ("date", "str"),
+                 ("assessed_by", "str"), ("evs_manager", "str"), ("periods", "int"), ("revision", "int")),
+    "responses": (("system", "str"), ("hospital", "str"), ("campus", "str"), ("period", "str"), ("period_month", "date"),
+                  ("section", "str"), ("area", "str"), ("idx", "int"), ("question", "str"), ("points", "float"),
+                  ("response", "str"), ("value", "str"), ("comment", "str")),
+    "photos": (("system", "str"), ("hospital", "str"), ("campus", "str"), ("period", "str"), ("period_month", "date"),
+               ("area", "str"), ("idx", "int"), ("question", "str"), ("photo_id", "str"), ("caption", "str"),
+               ("taken_at", "float"), ("kb", "float")),
+    "scores": (("system", "str"), ("hospital", "str"), ("campus", "str"), ("period", "str"), ("period_month", "date"),
+               ("bci_pct", "float"), ("pip_pct", "float"), ("sys_pct", "float"), ("weighted_pct", "float")),
+    "area_scores": (("system", "str"), ("hospital", "str"), ("campus", "str"), ("period", "str"), ("period_month", "date"),
+                    ("area", "str"), ("score", "float"), ("denominator", "float"), ("pct", "float")),
+}
+EXAMPLE_QUERIES = {
+    "Most-failed BCI questions in the Operating Rooms": (
+        "SELECT question, count(*) AS fails, count(DISTINCT campus) AS campuses\n"
+        "FROM responses\n"
+        "WHERE section = 'bci' AND area LIKE 'Operating Rooms%' AND response = 'Fail'\n"
+        "  -- AND quarter(period_month) = 2\n"
+        "GROUP BY question ORDER BY fails DESC LIMIT 20"
+    ),
+    "PIP compliance by hospital vs. an Operational Info KPI": (
+        "SELECT s.hospital, s.period, round(avg(s.pip_pct), 1) AS pip_pct,\n"
+        "       avg(TRY_CAST(replace(r.value, '%', '') AS DOUBLE)) AS kpi\n"
+        "FROM scores s LEFT JOIN responses r USING (system, hospital, campus, period)\n"
+        "WHERE r.section = 'operational_info' AND r.question LIKE 'Bed Turnaround time for Stat%'\n"
+        "GROUP BY ALL ORDER BY s.hospital, s.period"
+    ),
+    "Weighted score trend by system": (
+        "SELECT system, period, period_month, round(avg(weighted_pct), 1) AS weighted_pct, count(*) AS campuses\n"
+        "FROM scores GROUP BY ALL ORDER BY system, period_month NULLS LAST, period"
+    ),
+    "Lowest BCI areas in the latest year": (
+        "SELECT area, round(sum(score) / nullif(sum(denominator), 0) * 100, 1) AS pct\n"
+        "FROM area_scores WHERE year(period_month) = (SELECT max(year(period_month)) FROM area_scores)\n"
+        "GROUP BY area ORDER BY pct LIMIT 5"
+    ),
+}
+_PERIOD_FORMATS = ("%b-%y", "%b-%Y", "%b %y", "%b %Y", "%B %Y", "%B-%Y", "%Y-%m", "%m/%Y", "%m/%y", "%m-%Y")
+
+def _pyarrow():
+    try:
+        import pyarrow
+    except ImportError as e:
+        raise RuntimeError("The query tables need the 'pyarrow' package.") from e
+    return pyarrow
+
+def _duckdb():
+    try:
+        import duckdb
+    except ImportError as e:
+        raise RuntimeError("The query panel needs the 'duckdb' package.") from e
+    return duckdb
+
+def period_month(label: str) -> date | None:
+    """First day of the month a period label names ("Jun-25", "2025-06", "June 2025", …), if it names one."""
+    for fmt in _PERIOD_FORMATS:
+        try:
+            return datetime.strptime(label.strip(), fmt).date().replace(day=1)
+        except ValueError:
+            continue
+    return None
+
+# =============================================================
+# Rows of one campus
+# =============================================================
+def _text(value) -> str | None:
+    """A cell for a string column: answers and comments may have been imported as numbers."""
+    return None if value is None or value == "" else str(value)
+
+def campus_rows(path: CampusPath, campus: Dict, maps: Dict[str, Dict], weights: Dict[str, float]) -> Dict[str, List[Tuple]]:
+    """table -> row tuples (in `TABLES` column order) for one campus."""
+    out: Dict[str, List[Tuple]] = {name: [] for name in TABLES}
+    months = {p: period_month(p) for p in campus["periods"]}
+    meta = campus["meta"]
+    out["campuses"].append((*path, meta["date"], meta["assessed_by"], meta["evs_manager"], len(campus["periods"]), campus.get("revision", 0)))
+    responses, photos = out["responses"], out["photos"]
+    for section in ("operational_info", "contractual_pip", "system_standards"):
+        is_kpi = section == "operational_info"
+        for i, row in enumerate(campus["sections"][section]):
+            values, comments = row["values" if is_kpi else "responses"], row["comments"]
+            for p in (values.keys() | comments.keys()):
+                val = _text(values.get(p))
+                responses.append((*path, p, months.get(p), section, None, i, row["name"], None,
+                                  None if is_kpi else val, val if is_kpi else None, _text(comments.get(p))))
+    for area, items in campus["sections"]["bci"]["areas"].items():
+        for i, it in enumerate(items):
+            values, comments = it["responses"], it["comments"]
+            for p in (values.keys() | comments.keys()):
+                responses.append((*path, p, months.get(p), "bci", area, i, it["name"], it["points"],
+                                  _text(values.get(p)), None, _text(comments.get(p))))
+            for p, gallery in it["photos"].items():
+                for ph in gallery:
+                    photos.append((*path, p, months.get(p), area, i, it["name"], ph["id"], ph["caption"], float(ph["ts"]),
+                                   round(len(ph["b64"]) * 3 / 4 / 1024, 1)))
+    for p in campus["periods"]:
+        comp = compute_period_components(campus, p, maps)
+        summ = summarise_from_components(comp, weights)["operational"]
+        out["scores"].append((*path, p, months[p], summ["bci"], summ["financial_pip"], summ["system_standards"], summ["weighted"]))
+        for area, (sc, d) in comp["bci_by_dimension"].items():
+            out["area_scores"].append((*path, p, months[p], area, sc, d, round(sc / d * 100, 1) if d else None))
+    return out
+
+def _schema(pa, table: str):
+    types = {"str": pa.string(), "int": pa.int64(), "float": pa.float64(), "date": pa.date32()}
+    return pa.schema([(col, types[kind]) for col, kind in TABLES[table]])
+
+def _arrow_table(pa, table: str, rows: List[Tuple]):
+    schema = _schema(pa, table)
+    if not rows:
+        return schema.empty_table()
+    return pa.Table.from_arrays([pa.array(col, type=f.type) for col, f in zip(zip(*rows), schema)], schema=schema)
+
+def _partition_name(path: CampusPath) -> str:
+    return hashlib.sha1(json.dumps(path).encode("utf-8")).hexdigest()[:16] + ".parquet"
+
+# =============================================================
+# Store
+# =============================================================
+class AnalyticsStore:
+    """Arrow tables of one doc, rebuilt per campus revision, queried with DuckDB."""
+
+    def __init__(self, directory: str | None = None):
+        self.directory = directory  # Parquet partitions: <directory>/<table>/<campus hash>.parquet
+        self._parts: Dict[CampusPath, Tuple[int, int, Dict]] = {}   # path -> (revision, id(campus), table -> arrow)
+        self._settings = ""
+        self._tables: Dict[str, object] = {}
+        self._con = None
+        self.last_sync: Dict = {}
+
+    def sync(self, doc: Dict) -> Dict:
+        """Bring the tables up to date with `doc`; returns what was rebuilt."""
+        pa = _pyarrow()
+        t0 = time.perf_counter()
+        settings = json.dumps([doc["response_maps"], doc["weights"]], sort_keys=True)
+        if settings != self._settings:
+            self._parts.clear()  # scores depend on the maps and weights
+            self._settings = settings
+        seen, rebuilt = set(), []
+        for sys_name, hosp, camp, campus in iter_campuses(doc):
+            path = (sys_name, hosp, camp)
+            seen.add(path)
+            hit = self._parts.get(path)
+            if hit is not None and hit[0] == campus.get("revision", 0) and hit[1] == id(campus):
+                continue
+            rows = campus_rows(path, campus, doc["response_maps"], doc["weights"])
+            tables = {name: _arrow_table(pa, name, data) for name, data in rows.items()}
+            self._parts[path] = (campus.get("revision", 0), id(campus), tables)
+            rebuilt.append(path)
+        removed = [p for p in self._parts if p not in seen]
+        for p in removed:
+            del self._parts[p]
+        if rebuilt or removed or not self._tables:
+            self._tables = {name: pa.concat_tables([part[2][name] for part in self._parts.values()])
+                            if self._parts else _schema(pa, name).empty_table() for name in TABLES}
+            if self._con is not None:
+                for name, table in self._tables.items():
+                    self._con.register(name, table)
+            if self.directory:
+                self._write_partitions(rebuilt, removed)
+        self.last_sync = {"rebuilt": len(rebuilt), "removed": len(removed), "campuses": len(self._parts),
+                          "rows": {name: t.num_rows for name, t in self._tables.items()},
+                          "ms": round((time.perf_counter() - t0) * 1000, 1)}
+        return self.last_sync
+
+    def _write_partitions(self, rebuilt: List[CampusPath], removed: List[CampusPath]) -> None:
+        import pyarrow.parquet as pq
+        for name in TABLES:
+            folder = os.path.join(self.directory, name)
+            os.makedirs(folder, exist_ok=True)
+            for path in rebuilt:
+                pq.write_table(self._parts[path][2][name], os.path.join(folder, _partition_name(path)))
+            for path in removed:
+                try:
+                    os.remove(os.path.join(folder, _partition_name(path)))
+                except FileNotFoundError:
+                    pass
+
+    def table(self, name: str):
+        return self._tables[name]
+
+    def _connection(self):
+        if self._con is None:
+            con = _duckdb().connect(":memory:")
+            for name, table in self._tables.items():
+                con.register(name, table)
+            # Queries may only touch the registered tables, never the server's files or network.
+            con.execute("SET enable_external_access = false")
+            con.execute("SET lock_configuration = true")
+            self._con = con
+        return self._con
+
+    def query(self, sql: str, limit: int = 10_000):
+        """Run `sql` against the tables; returns (pandas DataFrame of at most `limit` rows, elapsed ms, truncated)."""
+        t0 = time.perf_counter()
+        rel = self._connection().sql(sql)
+        if rel is None:
+            return None, round((time.perf_counter() - t0) * 1000, 1), False
+        df = rel.limit(limit + 1).df()
+        truncated = len(df) > limit
+        return df.head(limit), round((time.perf_counter() - t0) * 1000, 1), truncated
+
+    def write_parquet(self, directory: str) -> List[str]:
+        """One Parquet file per table (the whole doc), e.g. for offline analysis."""
+        import pyarrow.parquet as pq
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        for name, table in self._tables.items():
+            paths.append(os.path.join(directory, f"{name}.parquet"))
+            pq.write_table(table, paths[-1])
+        return paths
+
+    def close(self) -> None:
+        if self._con is not None:
+            self._con.close()
+            self._con = None
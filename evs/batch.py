@@ -0,0 +1,112 @@
+"""Headless batch scoring: campus / hospital / system scores for every period.
+
+Systems are independent, so `score_doc` fans them out over a process pool for
+nightly jobs. Workers receive a photo- and comment-free view of each system to
+keep pickling cheap.
+"""
+import csv
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List
+
+from evs.codec import load_document
+from evs.model import migrate_old_doc
+from evs.schema import repair_doc
+from evs.scoring import aggregate_components, compute_period_components, summarise_from_components
+
+LEVELS = ("campus", "hospital", "system")
+
+def load_doc(path: str) -> Dict:
+    """Read a JSON or compact binary export, migrating pre-v4 shapes and repairing the schema."""
+    with open(path, "rb") as fh:
+        doc = load_document(fh.read())
+    if not isinstance(doc, dict) or "systems" not in doc:
+        doc = migrate_old_doc(doc)
+    repair_doc(doc)
+    return doc
+
+def _scoring_view(sysobj: Dict) -> Dict:
+    """Just the fields scoring reads (periods, points, responses) for one system."""
+    def rows(section: List[Dict]) -> List[Dict]:
+        return [{"responses": r["responses"]} for r in section]
+
+    return {"hospitals": {
+        hosp: {"campuses": {
+            camp: {
+                "periods": list(c["periods"]),
+                "sections": {
+                    "contractual_pip": rows(c["sections"]["contractual_pip"]),
+                    "system_standards": rows(c["sections"]["system_standards"]),
+                    "bci": {"areas": {
+                        area: [{"points": it["points"], "responses": it["responses"]} for it in items]
+                        for area, items in c["sections"]["bci"]["areas"].items()
+                    }},
+                },
+            }
+            for camp, c in h["campuses"].items()
+        }}
+        for hosp, h in sysobj["hospitals"].items()
+    }}
+
+def _row(level: str, sys_name: str, hosp: str, camp: str, period: str, comp: Dict, weights: Dict[str, float]) -> Dict:
+    s = summarise_from_components(comp, weights)
+    row = {"level": level, "system": sys_name, "hospital": hosp, "campus": camp, "period": period}
+    row.update({
+        "bci_overall": s["bci_overall"],
+        "financial_pip": s["operational"]["financial_pip"],
+        "system_standards": s["operational"]["system_standards"],
+        "weighted": s["operational"]["weighted"],
+    })
+    row.update({f"bci:{area}": pct for area, pct in s["bci_by_dimension"].items()})
+    return row
+
+def score_system(sys_name: str, sysobj: Dict, maps: Dict[str, Dict], weights: Dict[str, float], levels: Iterable[str] = LEVELS) -> List[Dict]:
+    levels = set(levels)
+    out: List[Dict] = []
+    sys_comps: Dict[str, List[Dict]] = {}
+    for hosp, hospobj in sysobj["hospitals"].items():
+        hosp_comps: Dict[str, List[Dict]] = {}
+        for camp_name, camp in hospobj["campuses"].items():
+            for p in camp["periods"]:
+                comp = compute_period_components(camp, p, maps)
+                hosp_comps.setdefault(p, []).append(comp)
+                sys_comps.setdefault(p, []).append(comp)
+                if "campus" in levels:
+                    out.append(_row("campus", sys_name, hosp, camp_name, p, comp, weights))
+        if "hospital" in levels:
+            for p in sorted(hosp_comps):
+                out.append(_row("hospital", sys_name, hosp, "", p, aggregate_components(hosp_comps[p]), weights))
+    if "system" in levels:
+        for p in sorted(sys_comps):
+            out.append(_row("system", sys_name, "", "", p, aggregate_components(sys_comps[p]), weights))
+    return out
+
+def _score_system_job(args) -> List[Dict]:
+    return score_system(*args)
+
+def score_doc(doc: Dict, workers: int = 1, levels: Iterable[str] = LEVELS) -> List[Dict]:
+    """Score every system; `workers > 1` scores systems in parallel processes."""
+    levels = tuple(levels)
+    jobs = [(name, _scoring_view(sysobj), doc["response_maps"], doc["weights"], levels) for name, sysobj in doc["systems"].items()]
+    if workers <= 1 or len(jobs) <= 1:
+        results = [_score_system_job(j) for j in jobs]
+    else:
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs)), mp_context=ctx) as pool:
+            results = list(pool.map(_score_system_job, jobs))
+    return [row for rows in results for row in rows]
+
+def write_scores(rows: List[Dict], path: str, fmt: str = "csv") -> None:
+    if fmt == "parquet":
+        import pandas as pd  # pyarrow (or fastparquet) must be installed
+        pd.DataFrame(rows).to_parquet(path, index=False)
+        return
+    if fmt != "csv":
+        raise ValueError(f"Unknown output format: {fmt}")
+    fields: List[str] = []
+    for r in rows:
+        fields.extend(k for k in r if k not in fields)
+    with open(path, "w", newline="", encoding="utf-8") as fh:
+        writer = csv.DictWriter(fh, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(rows)
@@ -0,0 +1,66 @@
+"""Revision-keyed caches of per-campus scoring inputs.
+
+Entries are validated against the campus ``revision`` counter (bumped by every
+save) and the campus object identity, so a stale entry is recomputed on the next
+read instead of needing explicit invalidation from each save path.
+"""
+from typing import Any, Callable, Dict, List, Tuple
+
+from evs.scoring import failed_items, response_histogram
+
+CampusPath = Tuple[str, str, str]
+
+class HistogramCache:
+    """(system, hospital, campus, period) -> response histogram / failed BCI items."""
+
+    def __init__(self):
+        self._hists: Dict[Tuple[str, str, str, str], Tuple[int, int, Dict]] = {}
+        self._fails: Dict[Tuple[str, str, str, str], Tuple[int, int, List[Tuple[str, int]]]] = {}
+
+    @staticmethod
+    def _get(store: Dict, path: CampusPath, campus: Dict, period: str, compute: Callable):
+        key = (*path, period)
+        rev = campus.get("revision", 0)
+        hit = store.get(key)
+        if hit is not None and hit[0] == rev and hit[1] == id(campus):
+            return hit[2]
+        value = compute(campus, period)
+        store[key] = (rev, id(campus), value)
+        return value
+
+    def get(self, path: CampusPath, campus: Dict, period: str) -> Dict:
+        return self._get(self._hists, path, campus, period, response_histogram)
+
+    def failures(self, path: CampusPath, campus: Dict, period: str) -> List[Tuple[str, int]]:
+        return self._get(self._fails, path, campus, period, failed_items)
+
+    def clear(self) -> None:
+        self._hists.clear()
+        self._fails.clear()
+
+    def __len__(self) -> int:
+        return len(self._hists)
+
+class FrameCache:
+    """(system, hospital, campus, period, part) -> editor frame, least-recently-used first out."""
+
+    def __init__(self, keep: int = 64):
+        self._keep = keep
+        self._frames: Dict[Tuple[str, str, str, str, str], Tuple[int, int, Any]] = {}
+
+    def get(self, path: CampusPath, campus: Dict, period: str, part: str, build: Callable[[], Any]) -> Any:
+        key = (*path, period, part)
+        rev = campus.get("revision", 0)
+        hit = self._frames.pop(key, None)
+        if hit is None or hit[0] != rev or hit[1] != id(campus):
+            hit = (rev, id(campus), build())
+        self._frames[key] = hit  # re-insert as most recent
+        while len(self._frames) > self._keep:
+            self._frames.pop(next(iter(self._frames)))
+        return hit[2]
+
+    def clear(self) -> None:
+        self._frames.clear()
+
+    def __len__(self) -> int:
+        return len(self._frames)
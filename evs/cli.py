@@ -0,0 +1,120 @@
+"""Command-line entry point: `python -m evs <command> ...`."""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import List
+
+from evs.analytics import AnalyticsStore
+from evs.batch import LEVELS, load_doc, score_doc, write_scores
+from evs.codec import benchmark, dump_document
+
+def _cmd_score(args: argparse.Namespace) -> int:
+    t0 = time.perf_counter()
+    doc = load_doc(args.input)
+    levels = [lvl.strip() for lvl in args.levels.split(",") if lvl.strip()]
+    unknown = set(levels) - set(LEVELS)
+    if unknown:
+        print(f"Unknown level(s): {', '.join(sorted(unknown))}", file=sys.stderr)
+        return 2
+    rows = score_doc(doc, workers=args.workers, levels=levels)
+    fmt = args.format or ("parquet" if args.output.endswith(".parquet") else "csv")
+    write_scores(rows, args.output, fmt)
+    print(f"Wrote {len(rows)} rows to {args.output} in {time.perf_counter() - t0:.2f}s")
+    return 0
+
+def _cmd_bench(args: argparse.Namespace) -> int:
+    doc = load_doc(args.input)
+    print(f"{'format':<22}{'size (MB)':>12}{'encode ms':>12}{'decode ms':>12}")
+    for r in benchmark(doc, repeat=args.repeat):
+        print(f"{r['format']:<22}{r['bytes'] / 1e6:>12.2f}{r['encode_ms']:>12.1f}{r['decode_ms']:>12.1f}")
+    return 0
+
+def _cmd_convert(args: argparse.Namespace) -> int:
+    doc = load_doc(args.input)
+    fmt = args.format or ("evsb" if args.output.endswith(".evsb") else "json")
+    with open(args.output, "wb") as fh:
+        fh.write(dump_document(doc, fmt))
+    print(f"Wrote {fmt} document to {args.output}")
+    return 0
+
+def _cmd_tables(args: argparse.Namespace) -> int:
+    doc = load_doc(args.input)
+    store = AnalyticsStore()
+    synced = store.sync(doc)
+    if args.query:
+        df, ms, more = store.query(args.query, limit=args.limit)
+        if df is not None:
+            print(df.to_string(index=False))
+            print(f"{len(df)}{'+' if more else ''} row(s) in {ms:.0f} ms")
+    if args.output:
+        for path in store.write_parquet(args.output):
+            print(f"Wrote {path}")
+    if not (args.query or args.output):
+        for name, n in synced["rows"].items():
+            print(f"{name:<14}{n:>10} rows")
+    return 0
+
+def _cmd_loadtest(args: argparse.Namespace) -> int:
+    from evs.loadtest import format_report, run_load_test, synthetic_doc
+
+    if args.input:
+        doc = load_doc(args.input)
+    else:
+        doc = synthetic_doc(args.systems, args.hospitals, args.campuses, args.periods, args.photos, args.photo_kb)
+    res = run_load_test(doc, sessions=args.sessions, iterations=args.iterations, timeout=args.timeout)
+    print("\n".join(format_report(res)))
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(res, fh, indent=2)
+    return 1 if res["errors"] else 0
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m evs", description="EVS assessment batch tools.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("score", help="Emit campus/hospital/system scores for every period.")
+    p.add_argument("input", help="Path to an EVS_MultiHospital.json (or .evsb) export.")
+    p.add_argument("-o", "--output", required=True, help="Output file (.csv or .parquet).")
+    p.add_argument("--format", choices=["csv", "parquet"], help="Output format (default: from the file extension).")
+    p.add_argument("--levels", default=",".join(LEVELS), help="Comma-separated subset of: campus,hospital,system.")
+    p.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processes used to score systems in parallel.")
+    p.set_defaults(func=_cmd_score)
+
+    p = sub.add_parser("bench", help="Compare document codecs (size, encode and decode time) on a real export.")
+    p.add_argument("input", help="Path to an EVS_MultiHospital.json (or .evsb) export.")
+    p.add_argument("--repeat", type=int, default=3, help="Runs per codec; the best time is reported.")
+    p.set_defaults(func=_cmd_bench)
+
+    p = sub.add_parser("convert", help="Rewrite a document as JSON or compact binary.")
+    p.add_argument("input", help="Path to an EVS_MultiHospital.json (or .evsb) export.")
+    p.add_argument("-o", "--output", required=True, help="Output file (.json or .evsb).")
+    p.add_argument("--format", choices=["json", "evsb"], help="Output format (default: from the file extension).")
+    p.set_defaults(func=_cmd_convert)
+
+    p = sub.add_parser("tables", help="Export the query tables as Parquet, or run SQL over them with DuckDB.")
+    p.add_argument("input", help="Path to an EVS_MultiHospital.json (or .evsb) export.")
+    p.add_argument("-o", "--output", help="Directory for one <table>.parquet per table.")
+    p.add_argument("-q", "--query", help="SQL to run (tables: campuses, responses, photos, scores, area_scores).")
+    p.add_argument("--limit", type=int, default=100, help="Most rows to print for --query.")
+    p.set_defaults(func=_cmd_tables)
+
+    p = sub.add_parser("loadtest", help="Simulate concurrent inspectors and report rerun latency and memory per session.")
+    p.add_argument("input", nargs="?", help="Document to load in every session (default: a synthetic one).")
+    p.add_argument("--sessions", type=int, default=4, help="Concurrent sessions.")
+    p.add_argument("--iterations", type=int, default=3, help="Flows (campus, BCI save, photo, roll-up) per session.")
+    p.add_argument("--systems", type=int, default=2, help="Synthetic doc: systems.")
+    p.add_argument("--hospitals", type=int, default=5, help="Synthetic doc: hospitals per system.")
+    p.add_argument("--campuses", type=int, default=4, help="Synthetic doc: campuses per hospital.")
+    p.add_argument("--periods", type=int, default=6, help="Synthetic doc: periods per campus.")
+    p.add_argument("--photos", type=int, default=4, help="Synthetic doc: photos per campus and period.")
+    p.add_argument("--photo-kb", type=int, default=200, help="Synthetic doc: size of each photo.")
+    p.add_argument("--timeout", type=float, default=120.0, help="Seconds allowed per rerun.")
+    p.add_argument("--json", help="Also write the full results to this file.")
+    p.set_defaults(func=_cmd_loadtest)
+    return parser
+
+def main(argv: List[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
@@ -0,0 +1,152 @@
+"""Document codecs: the JSON export and a compact binary format.
+
+The binary format is a 6-byte header (``EVSB``, format version, flags)
+followed by a MessagePack body, optionally zstd-compressed. The body is the
+v4 doc with each photo's base64 ``b64`` string stored as raw bytes under
+``img``, so photos cost their real size and need no base64 pass. Decoding
+restores ``b64`` at the same key position, so a binary round trip re-exports
+byte-identical JSON. Strings that are not canonical base64 stay text.
+
+`load_document` sniffs the header, so callers can accept either format.
+"""
+import base64
+import binascii
+import json
+import time
+from typing import Dict, List
+
+MAGIC = b"EVSB"
+FORMAT_VERSION = 1
+FLAG_ZSTD = 0x01
+ZSTD_LEVEL = 3
+DOC_FORMATS = {
+    "json": ("JSON", "application/json", "json"),
+    "evsb": ("Compact binary (MessagePack + zstd)", "application/octet-stream", "evsb"),
+}
+
+def _msgpack():
+    try:
+        import msgpack
+    except ImportError as e:
+        raise RuntimeError("The compact document format needs the 'msgpack' package.") from e
+    return msgpack
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+# =============================================================
+# Photo payloads: base64 text <-> raw bytes
+# =============================================================
+def _photos_to_bytes(doc: Dict) -> Dict:
+    """View of `doc` with raw photo bytes; only containers on the way to a photo are copied."""
+    def photo(ph: Dict) -> Dict:
+        try:
+            data = base64.b64decode(ph["b64"], validate=True)
+        except (binascii.Error, TypeError, KeyError):
+            return ph  # not base64: keep the text so the round trip stays exact
+        if base64.b64encode(data).decode("ascii") != ph["b64"]:
+            return ph  # decodes, but not canonically (e.g. "QR==" re-encodes as "QQ=="): keep the text too
+        return {("img" if k == "b64" else k): (data if k == "b64" else v) for k, v in ph.items()}
+
+    def item(it: Dict) -> Dict:
+        if not it.get("photos"):
+            return it
+        return {**it, "photos": {p: [photo(ph) for ph in gallery] for p, gallery in it["photos"].items()}}
+
+    def campus(c: Dict) -> Dict:
+        areas = c["sections"]["bci"]["areas"]
+        bci = {**c["sections"]["bci"], "areas": {a: [item(it) for it in items] for a, items in areas.items()}}
+        return {**c, "sections": {**c["sections"], "bci": bci}}
+
+    return {**doc, "systems": {
+        s: {**sysobj, "hospitals": {
+            h: {**hospobj, "campuses": {name: campus(c) for name, c in hospobj["campuses"].items()}}
+            for h, hospobj in sysobj["hospitals"].items()
+        }}
+        for s, sysobj in doc["systems"].items()
+    }}
+
+def _photos_to_b64(doc: Dict) -> None:
+    """Inverse of `_photos_to_bytes`, in place (the decoded doc is ours)."""
+    for sysobj in doc["systems"].values():
+        for hospobj in sysobj["hospitals"].values():
+            for c in hospobj["campuses"].values():
+                for items in c["sections"]["bci"]["areas"].values():
+                    for it in items:
+                        for gallery in it.get("photos", {}).values():
+                            for j, ph in enumerate(gallery):
+                                if "img" in ph:
+                                    gallery[j] = {("b64" if k == "img" else k): (base64.b64encode(v).decode("ascii") if k == "img" else v)
+                                                  for k, v in ph.items()}
+
+# =============================================================
+# Encode / decode
+# =============================================================
+def dump_json(doc: Dict) -> bytes:
+    """The classic `EVS_MultiHospital.json` export."""
+    return json.dumps(doc, indent=2).encode("utf-8")
+
+def dump_binary(doc: Dict, compress: bool = True) -> bytes:
+    """Compact binary export; compression is skipped when zstandard is not installed."""
+    body = _msgpack().packb(_photos_to_bytes(doc), use_bin_type=True)
+    flags = 0
+    zstd = _zstd() if compress else None
+    if zstd is not None:
+        body = zstd.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+        flags |= FLAG_ZSTD
+    return MAGIC + bytes([FORMAT_VERSION, flags]) + body
+
+def dump_document(doc: Dict, fmt: str = "json", compress: bool = True) -> bytes:
+    if fmt == "json":
+        return dump_json(doc)
+    if fmt == "evsb":
+        return dump_binary(doc, compress)
+    raise ValueError(f"Unknown document format: {fmt}")
+
+def detect_format(data: bytes) -> str:
+    return "evsb" if data[:4] == MAGIC else "json"
+
+def load_document(data: bytes):
+    """Parse either export format (auto-detected); returns the raw doc for migration / repair."""
+    if detect_format(data) == "json":
+        return json.loads(data)
+    version, flags = data[4], data[5]
+    if version > FORMAT_VERSION:
+        raise ValueError(f"Document was written by a newer app (binary format v{version}).")
+    body = data[6:]
+    if flags & FLAG_ZSTD:
+        zstd = _zstd()
+        if zstd is None:
+            raise RuntimeError("This document is zstd-compressed; install the 'zstandard' package to open it.")
+        body = zstd.ZstdDecompressor().decompressobj().decompress(body)
+    doc = _msgpack().unpackb(body, raw=False, strict_map_key=False)
+    _photos_to_b64(doc)
+    return doc
+
+# =============================================================
+# Benchmark
+# =============================================================
+def benchmark(doc: Dict, repeat: int = 3) -> List[Dict]:
+    """Best-of-`repeat` encode/decode time and size for each codec variant."""
+    variants = [
+        ("json (indent 2)", dump_json),
+        ("msgpack", lambda d: dump_binary(d, compress=False)),
+    ]
+    if _zstd() is not None:
+        variants.append((f"msgpack + zstd-{ZSTD_LEVEL}", dump_binary))
+    out = []
+    for name, encode in variants:
+        enc = dec = float("inf")
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            data = encode(doc)
+            t1 = time.perf_counter()
+            load_document(data)
+            t2 = time.perf_counter()
+            enc, dec = min(enc, t1 - t0), min(dec, t2 - t1)
+        out.append({"format": name, "bytes": len(data), "encode_ms": round(enc * 1000, 1), "decode_ms": round(dec * 1000, 1)})
+    return out
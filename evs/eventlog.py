@@ -0,0 +1,343 @@
+"""Append-only edit log with periodic snapshots.
+
+Every save is recorded as a small event (``response_set``, ``photo_added``,
+``period_renamed``, ...) that is applied to the doc *and* appended to
+``events.jsonl``. Every ``snapshot_every`` events the whole doc is written to
+``snapshots/<seq>.json``, so any past state is the nearest snapshot plus a short
+replay. Without a directory the log lives in memory only (history and undo still
+work for the session) and keeps a single base snapshot: a structural copy that
+shares the doc's strings, photo data included, so the log costs little more than
+its events.
+
+Events carry both the ``old`` and ``new`` value; a key that was absent before
+the edit simply has no ``old`` entry. That makes every event invertible, which
+is how per-campus undo works: it appends the inverse event rather than
+rewriting history.
+"""
+import copy
+import json
+import os
+import time
+from typing import Dict, Iterable, List, Tuple
+
+from evs.model import ensure_campus, migrate_period_label, new_doc_id
+
+FIELD_OPS = {"response_set": "responses", "comment_set": "comments", "value_set": "values"}
+FIELD_EVENTS = {field: op for op, field in FIELD_OPS.items()}
+INVERSE_OPS = {
+    "photo_added": "photo_removed",
+    "photo_removed": "photo_added",
+    "period_added": "period_removed",
+    "period_removed": "period_added",
+}
+OP_LABELS = {
+    "response_set": "Response",
+    "comment_set": "Comment",
+    "value_set": "Value",
+    "points_set": "Points",
+    "photo_added": "Photo added",
+    "photo_removed": "Photo removed",
+    "caption_set": "Caption",
+    "period_added": "Period added",
+    "period_removed": "Period removed",
+    "period_renamed": "Period renamed",
+    "meta_set": "Profile",
+    "checkpoint": "Checkpoint",
+}
+_MISSING = object()
+
+def photo_key(photo: Dict):
+    """Stable handle for a photo inside one item/period list."""
+    return photo.get("id") or photo.get("ts")
+
+# =============================================================
+# Applying events
+# =============================================================
+def _campus(doc: Dict, path: List[str]) -> Dict:
+    ensure_campus(doc, *path)
+    return doc["systems"][path[0]]["hospitals"][path[1]]["campuses"][path[2]]
+
+def _photo_pos(gallery: List[Dict], target: Dict) -> int | None:
+    """Position of the target photo, trusting the recorded ``pos`` when it still holds that photo."""
+    pos = target.get("pos")
+    if pos is not None and pos < len(gallery) and photo_key(gallery[pos]) == target["photo"]:
+        return pos
+    return next((i for i, ph in enumerate(gallery) if photo_key(ph) == target["photo"]), None)
+
+def _row(campus: Dict, target: Dict) -> Dict:
+    if target["section"] == "bci":
+        return campus["sections"]["bci"]["areas"][target["area"]][target["idx"]]
+    return campus["sections"][target["section"]][target["idx"]]
+
+def _period_fields(campus: Dict) -> Iterable[Tuple[Dict, str, Dict]]:
+    """(row target, field, period -> value) for every per-period field of a campus."""
+    sections = campus["sections"]
+    for section in ("operational_info", "contractual_pip", "system_standards"):
+        for i, row in enumerate(sections[section]):
+            for field in ("values" if section == "operational_info" else "responses", "comments"):
+                yield {"section": section, "idx": i}, field, row.get(field) or {}
+    for area, items in sections["bci"]["areas"].items():
+        for i, it in enumerate(items):
+            for field in ("responses", "comments", "photos"):
+                yield {"section": "bci", "area": area, "idx": i}, field, it.get(field) or {}
+
+def held_cells(campus: Dict, old: str, new: str) -> List[Dict]:
+    """Cells with data under period `old` and none under `new`: what renaming `old` to `new` moves."""
+    return [{**target, "field": field} for target, field, values in _period_fields(campus) if old in values and new not in values]
+
+def apply_event(doc: Dict, ev: Dict) -> None:
+    """Mutate `doc` by one event (creating the campus if a replay starts before it existed)."""
+    op = ev["op"]
+    if op == "checkpoint":
+        return
+    campus = _campus(doc, ev["path"])
+    period = ev.get("period")
+    target = ev.get("target", {})
+    if op in FIELD_OPS:
+        values = _row(campus, target).setdefault(FIELD_OPS[op], {})
+        if "new" in ev:
+            values[period] = ev["new"]
+        else:
+            values.pop(period, None)
+    elif op == "points_set":
+        _row(campus, target)["points"] = ev["new"]
+    elif op == "caption_set":
+        gallery = _row(campus, target).get("photos", {}).get(period, [])
+        pos = _photo_pos(gallery, target)
+        if pos is not None:
+            gallery[pos]["caption"] = ev.get("new", "")
+    elif op == "photo_added":
+        gallery = _row(campus, target).setdefault("photos", {}).setdefault(period, [])
+        # A copy, so later caption edits to the doc never reach back into the logged event.
+        gallery.insert(min(target.get("pos", len(gallery)), len(gallery)), dict(ev["new"]))
+    elif op == "photo_removed":
+        gallery = _row(campus, target).setdefault("photos", {}).setdefault(period, [])
+        pos = _photo_pos(gallery, target)
+        if pos is not None:
+            del gallery[pos]
+    elif op == "period_added":
+        if period not in campus["periods"]:
+            campus["periods"].append(period)
+    elif op == "period_removed":
+        if period in campus["periods"]:
+            campus["periods"].remove(period)
+    elif op == "period_renamed":
+        # Moves the data; the periods list is only relabelled for a true rename
+        # (adding a period is its own `period_added` event).
+        old, new = ev["old"], ev["new"]
+        if "cells" in ev:  # exactly the cells the edit moved, so the inverse moves back only those
+            for cell in ev["cells"]:
+                values = _row(campus, cell).setdefault(cell["field"], {})
+                if old in values:
+                    values[new] = values.pop(old)
+        else:
+            migrate_period_label(campus, old, new)
+        if target.get("relabel_list") and old in campus["periods"]:
+            campus["periods"][campus["periods"].index(old)] = new
+    elif op == "meta_set":
+        campus["meta"][target["field"]] = ev.get("new", "")
+    else:
+        raise ValueError(f"Unknown event op: {op}")
+
+def invert_event(ev: Dict) -> Dict:
+    inv = {k: v for k, v in ev.items() if k not in ("old", "new", "seq", "ts", "undo_of")}
+    inv["op"] = INVERSE_OPS.get(ev["op"], ev["op"])
+    if "old" in ev:
+        inv["new"] = ev["old"]
+    if "new" in ev:
+        inv["old"] = ev["new"]
+    return inv
+
+# =============================================================
+# Log
+# =============================================================
+class EventLog:
+    """Per-document event log; ``directory=None`` keeps everything in memory."""
+
+    def __init__(self, doc: Dict, directory: str | None = None, snapshot_every: int = 500, keep_snapshots: int = 10):
+        self.doc_id = doc.setdefault("doc_id", new_doc_id())
+        self.snapshot_every = snapshot_every
+        self.keep_snapshots = keep_snapshots
+        self.seq = 0
+        self._dir = os.path.join(directory, self.doc_id) if directory else None
+        self._events: List[Dict] = []                      # in-memory mode: every event
+        self._offsets: Dict[int, int] = {}                 # file mode: seq -> byte offset
+        self._by_campus: Dict[Tuple[str, str, str], List[int]] = {}
+        self._undone: set = set()
+        self._snapshots: Dict[int, str | Dict] = {}        # seq -> path (file) or the one doc copy (memory)
+        if self._dir:
+            os.makedirs(os.path.join(self._dir, "snapshots"), exist_ok=True)
+            self._load_existing()
+        if not self._snapshots:
+            self._write_snapshot(doc)
+        elif self.seq:
+            # The live doc may not match what the existing log replays to; anchor it.
+            self.checkpoint(doc)
+
+    @property
+    def directory(self) -> str | None:
+        return self._dir
+
+    def _events_path(self) -> str:
+        return os.path.join(self._dir, "events.jsonl")
+
+    def _load_existing(self) -> None:
+        for name in os.listdir(os.path.join(self._dir, "snapshots")):
+            if name.endswith(".json"):
+                self._snapshots[int(name[:-5])] = os.path.join(self._dir, "snapshots", name)
+        if not os.path.exists(self._events_path()):
+            return
+        with open(self._events_path(), "rb") as fh:
+            offset = 0
+            for line in fh:
+                if line.strip():
+                    ev = json.loads(line)
+                    self._index(ev, offset)
+                offset += len(line)
+
+    def _index(self, ev: Dict, offset: int | None) -> None:
+        self.seq = max(self.seq, ev["seq"])
+        if offset is not None:
+            self._offsets[ev["seq"]] = offset
+        if ev["op"] != "checkpoint":
+            self._by_campus.setdefault(tuple(ev["path"]), []).append(ev["seq"])
+        if "undo_of" in ev:
+            self._undone.add(ev["undo_of"])
+
+    def _append(self, ev: Dict) -> None:
+        if self._dir:
+            line = (json.dumps(ev, separators=(",", ":")) + "\n").encode("utf-8")
+            with open(self._events_path(), "ab") as fh:
+                offset = fh.tell()
+                fh.write(line)
+            self._index(ev, offset)
+        else:
+            self._events.append(ev)
+            self._index(ev, None)
+
+    def event(self, seq: int) -> Dict:
+        if not self._dir:
+            return dict(self._events[seq - 1])
+        with open(self._events_path(), "rb") as fh:
+            fh.seek(self._offsets[seq])
+            return json.loads(fh.readline())
+
+    # ---- writing ----
+    def record(self, doc: Dict, op: str, path: Iterable[str], period: str | None = None, target: Dict | None = None,
+               old=_MISSING, new=_MISSING, **extra) -> Dict:
+        """Apply one edit to `doc` and append it to the log."""
+        ev = {"seq": self.seq + 1, "ts": time.time(), "op": op, "path": list(path)}
+        if period is not None:
+            ev["period"] = period
+        if target:
+            ev["target"] = target
+        if old is not _MISSING:
+            ev["old"] = old
+        if new is not _MISSING:
+            ev["new"] = new
+        ev.update(extra)
+        apply_event(doc, ev)
+        self._append(ev)
+        if self._dir and self.seq % self.snapshot_every == 0:
+            self._write_snapshot(doc)
+        return ev
+
+    def checkpoint(self, doc: Dict) -> None:
+        """Declare `doc` authoritative at a fresh seq (e.g. after an import)."""
+        self._append({"seq": self.seq + 1, "ts": time.time(), "op": "checkpoint", "path": []})
+        self._write_snapshot(doc)
+
+    def _write_snapshot(self, doc: Dict) -> None:
+        if self._dir:
+            path = os.path.join(self._dir, "snapshots", f"{self.seq:010d}.json")
+            tmp = path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as fh:
+                json.dump(doc, fh, separators=(",", ":"))
+            os.replace(tmp, path)
+            self._snapshots[self.seq] = path
+        else:
+            # In memory, one snapshot: replays from it are cheap, and every extra copy would count against the session.
+            # deepcopy shares the immutable strings (base64 photos included) with `doc` instead of duplicating them.
+            self._snapshots = {self.seq: copy.deepcopy(doc)}
+            return
+        # Compact: keep the oldest (base) snapshot plus the most recent few.
+        seqs = sorted(self._snapshots)
+        for s in seqs[1:-self.keep_snapshots]:
+            dropped = self._snapshots.pop(s)
+            if isinstance(dropped, str) and os.path.exists(dropped):
+                os.remove(dropped)
+
+    # ---- reading ----
+    def history(self, path: Iterable[str], limit: int = 20) -> List[Dict]:
+        """Newest-first events for one campus, flagged when they have been undone."""
+        seqs = self._by_campus.get(tuple(path), [])
+        out = []
+        for seq in reversed(seqs[-limit:]):
+            ev = self.event(seq)
+            ev["undone"] = seq in self._undone
+            out.append(ev)
+        return out
+
+    def undo_last(self, doc: Dict, path: Iterable[str]) -> Dict | None:
+        """Revert the newest not-yet-undone edit on a campus by appending its inverse."""
+        path = tuple(path)
+        for seq in reversed(self._by_campus.get(path, [])):
+            ev = self.event(seq)
+            if seq in self._undone or "undo_of" in ev:
+                continue
+            inv = invert_event(ev)
+            return self.record(doc, inv.pop("op"), inv.pop("path"), undo_of=seq, **inv)
+        return None
+
+    def state_at(self, seq: int) -> Dict:
+        """The whole doc as it was right after event `seq`."""
+        base = max((s for s in self._snapshots if s <= seq), default=None)
+        if base is None:
+            raise ValueError(f"No snapshot at or before event {seq}")
+        snap = self._snapshots[base]
+        if isinstance(snap, str):
+            with open(snap, "r", encoding="utf-8") as fh:
+                doc = json.load(fh)
+        else:
+            doc = copy.deepcopy(snap)
+        for s in range(base + 1, seq + 1):
+            ev = self.event(s)
+            if ev["op"] == "checkpoint":
+                continue
+            apply_event(doc, ev)
+        return doc
+
+    def oldest_restorable(self) -> int:
+        return min(self._snapshots) if self._snapshots else self.seq
+
+def list_logged_docs(directory: str) -> List[Tuple[str, float]]:
+    """(doc_id, last modified) for every log under `directory`, newest first."""
+    if not directory or not os.path.isdir(directory):
+        return []
+    out = []
+    for name in os.listdir(directory):
+        ev_path = os.path.join(directory, name, "events.jsonl")
+        snap_dir = os.path.join(directory, name, "snapshots")
+        if os.path.isdir(snap_dir):
+            out.append((name, os.path.getmtime(ev_path if os.path.exists(ev_path) else snap_dir)))
+    return sorted(out, key=lambda t: t[1], reverse=True)
+
+def restore_latest(directory: str, doc_id: str) -> Dict:
+    """Rebuild the newest state of a logged doc from its latest snapshot plus the tail of the log."""
+    snap_dir = os.path.join(directory, doc_id, "snapshots")
+    seqs = sorted(int(n[:-5]) for n in os.listdir(snap_dir) if n.endswith(".json"))
+    with open(os.path.join(snap_dir, f"{seqs[-1]:010d}.json"), "r", encoding="utf-8") as fh:
+        doc = json.load(fh)
+    ev_path = os.path.join(directory, doc_id, "events.jsonl")
+    if os.path.exists(ev_path):
+        with open(ev_path, "r", encoding="utf-8") as fh:
+            for line in fh:
+                # Lines start with '{"seq":N,' so older events are skipped without parsing them.
+                head = line[7:line.find(",", 7)]
+                if head.isdigit() and int(head) <= seqs[-1]:
+                    continue
+                if line.strip():
+                    ev = json.loads(line)
+                    if ev["op"] != "checkpoint":
+                        apply_event(doc, ev)
+    return doc
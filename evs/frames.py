@@ -0,0 +1,75 @@
+"""Data-editor frames for the entry tabs and cell-level save diffs.
+
+Frames are built column-wise (one list per column) rather than from a list of
+row dicts, and the app caches them per campus revision with `evs.cache.FrameCache`.
+On save, `changed_cells` compares the cached frame with the editor's output in
+one vectorised pass, so only the cells the user actually touched are written.
+"""
+from typing import Dict, List, Tuple
+
+import pandas as pd
+
+# (column label, row field); a field of None is a display-only column.
+Columns = Tuple[Tuple[str, str | None], ...]
+
+SECTION_COLUMNS: Dict[str, Columns] = {
+    "operational_info": (("KPI", "name"), ("Value", "values"), ("Comments", "comments")),
+    "contractual_pip": (("Question", "name"), ("Response", "responses"), ("Comments", "comments")),
+    "system_standards": (("Question", "name"), ("Response", "responses"), ("Comments", "comments")),
+}
+BCI_COLUMNS: Columns = (
+    ("Q#", None), ("Item", "name"), ("Points", "points"), ("Response", "responses"), ("Comments", "comments"), ("Action", None),
+)
+PER_PERIOD_FIELDS = ("values", "responses", "comments")
+READ_ONLY_FIELDS = ("name",)
+
+def editor_frame(rows: List[Dict], period: str, columns: Columns) -> pd.DataFrame:
+    """One row per question (index = question position) with the period's values."""
+    data: Dict[str, List] = {}
+    for label, field in columns:
+        if field is None:
+            data[label] = [i + 1 for i in range(len(rows))] if label == "Q#" else [""] * len(rows)
+        elif field in PER_PERIOD_FIELDS:
+            data[label] = [r[field].get(period, "") for r in rows]
+        else:
+            data[label] = [r[field] for r in rows]
+    return pd.DataFrame(data)
+
+def _normalise(frame: pd.DataFrame) -> pd.DataFrame:
+    """Blank text cells compare equal whether the editor returns "", None or NaN."""
+    out = frame.copy()
+    for col in out.columns:
+        if not pd.api.types.is_numeric_dtype(out[col]):
+            out[col] = out[col].astype(object).where(out[col].notna(), "")
+    return out
+
+def changed_cells(original: pd.DataFrame, edited: pd.DataFrame, columns: Columns) -> List[Tuple[int, str, object]]:
+    """(question index, row field, new value) for every edited cell of an editable column.
+
+    Rows the editor added or deleted are ignored; questions come from the template.
+    """
+    cols = [label for label, field in columns if field is not None and field not in READ_ONLY_FIELDS]
+    fields = {label: field for label, field in columns}
+    common = original.index.intersection(edited.index)
+    if not len(common) or not cols:
+        return []
+    before = _normalise(original.loc[common, cols])
+    after = _normalise(edited.loc[common, cols])
+    same = before.eq(after) | (before.isna() & after.isna())
+    changed = same.stack()
+    out = []
+    for i, label in changed.index[~changed.to_numpy()]:
+        val = after.at[i, label]
+        if hasattr(val, "item"):
+            val = val.item()  # numpy scalar -> plain Python for JSON / the event log
+        if isinstance(val, float) and val != val:
+            val = None
+        out.append((int(i), fields[label], val))
+    return out
+
+def requested_actions(edited: pd.DataFrame, n_rows: int, action: str = "Add evidence") -> List[int]:
+    """Question indices whose Action column is set to `action`."""
+    if "Action" not in edited.columns:
+        return []
+    hits = edited.index[edited["Action"].fillna("").eq(action).to_numpy()]
+    return [int(i) for i in hits if 0 <= i < n_rows]
@@ -0,0 +1,148 @@
+"""Prebuilt index of the system / hospital / campus hierarchy for the sidebar navigator.
+
+The sidebar needs, on every rerun, the sibling names at each level of the
+current path, and on each keystroke in the campus finder, the campuses matching
+some text. `HierarchyIndex` keeps both ready: sorted system and hospital lists,
+campus lists in document order, and a sorted word list (every word of every
+campus, hospital and system name, with the campus it belongs to) that prefix
+lookups bisect into. Words that match nothing fall back to close matches
+(`difflib`) over the distinct words, so "memorail" still finds "Memorial".
+
+The index is rebuilt only when the hierarchy changes shape. `covers` is O(1) on
+reruns without a save (the doc revision is unchanged) and O(hospitals) after a
+save; creates from the sidebar go through `add`, which inserts in place.
+"""
+import difflib
+import heapq
+import re
+from bisect import bisect_left, insort
+from typing import Dict, List, Set, Tuple
+
+from evs.model import iter_campuses
+
+CampusPath = Tuple[str, str, str]
+
+def fold(text: str) -> List[str]:
+    """Case-folded words of `text`."""
+    return re.findall(r"\w+", text.casefold(), flags=re.UNICODE)
+
+def _shape(doc: Dict) -> Tuple[int, int, int]:
+    systems = doc["systems"].values()
+    hospitals = [h for s in systems for h in s["hospitals"].values()]
+    return len(doc["systems"]), len(hospitals), sum(len(h["campuses"]) for h in hospitals)
+
+class HierarchyIndex:
+    """Sibling lists and a word index over every campus path of one doc."""
+
+    def __init__(self):
+        self.systems: List[str] = []                           # sorted
+        self.hospitals: Dict[str, List[str]] = {}              # system -> sorted hospitals
+        self.campuses: Dict[Tuple[str, str], List[str]] = {}   # (system, hospital) -> campuses in doc order
+        self._paths: List[CampusPath] = []
+        self._known: Set[CampusPath] = set()
+        self._words: List[Tuple[str, int]] = []                # sorted (word, path number)
+        self._vocab: Set[str] = set()                          # distinct words, for close matches
+        self._doc_key: Tuple[int, int] = (0, -1)               # (id(doc), doc revision) last checked
+        self._shape: Tuple[int, int, int] = (0, 0, 0)
+
+    @classmethod
+    def from_doc(cls, doc: Dict) -> "HierarchyIndex":
+        idx = cls()
+        idx.systems = sorted(doc["systems"])
+        for sys_name, sysobj in doc["systems"].items():
+            idx.hospitals[sys_name] = sorted(sysobj["hospitals"])
+            for hosp_name, hospobj in sysobj["hospitals"].items():
+                idx.campuses[(sys_name, hosp_name)] = list(hospobj["campuses"])
+        words = []
+        for sys_name, hosp_name, camp_name, _ in iter_campuses(doc):
+            n = len(idx._paths)
+            idx._paths.append((sys_name, hosp_name, camp_name))
+            words.extend((w, n) for w in {*fold(camp_name), *fold(hosp_name), *fold(sys_name)})
+        idx._known = set(idx._paths)
+        idx._words = sorted(words)
+        idx._vocab = {w for w, _ in words}
+        idx._doc_key = (id(doc), doc.get("revision", 0))
+        idx._shape = _shape(doc)
+        return idx
+
+    def covers(self, doc: Dict) -> bool:
+        """Whether the index still matches `doc`'s hierarchy (names are only ever added, not renamed)."""
+        key = (id(doc), doc.get("revision", 0))
+        if key == self._doc_key:
+            return True
+        if key[0] != self._doc_key[0] or _shape(doc) != self._shape:
+            return False
+        self._doc_key = key
+        return True
+
+    def add(self, doc: Dict, path: Tuple[str, ...]) -> None:
+        """Record a system, hospital or campus just created in `doc` (a no-op for known names)."""
+        sys_name = path[0]
+        if sys_name not in self.hospitals:
+            insort(self.systems, sys_name)
+            self.hospitals[sys_name] = []
+        if len(path) > 1 and (sys_name, path[1]) not in self.campuses:
+            insort(self.hospitals[sys_name], path[1])
+            self.campuses[(sys_name, path[1])] = []
+        if len(path) > 2 and path not in self._known:
+            self.campuses[(sys_name, path[1])].append(path[2])
+            n = len(self._paths)
+            self._paths.append(path)
+            self._known.add(path)
+            for w in {*fold(path[2]), *fold(path[1]), *fold(sys_name)}:
+                insort(self._words, (w, n))
+                self._vocab.add(w)
+        self._doc_key = (id(doc), doc.get("revision", 0))
+        self._shape = _shape(doc)
+
+    def __contains__(self, path: CampusPath) -> bool:
+        return path in self._known
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+    def _prefixed(self, prefix: str) -> Set[int]:
+        out = set()
+        for i in range(bisect_left(self._words, (prefix,)), len(self._words)):
+            word, n = self._words[i]
+            if not word.startswith(prefix):
+                break
+            out.add(n)
+        return out
+
+    def _close(self, word: str) -> Set[int]:
+        out = set()
+        for near in difflib.get_close_matches(word, self._vocab, n=5, cutoff=0.75):
+            out |= self._prefixed(near)
+        return out
+
+    def search(self, text: str, limit: int = 10) -> List[CampusPath]:
+        """Campuses whose names (campus, hospital or system) match every word of `text`.
+
+        Each word matches as a prefix of a name word, or failing that as a close
+        (typo-tolerant) match. Exact and prefix matches on the campus name rank first.
+        """
+        terms = fold(text)
+        if not terms:
+            return []
+        hits = None
+        for t in terms:
+            ids = self._prefixed(t) or self._close(t)
+            hits = ids if hits is None else hits & ids
+            if not hits:
+                return []
+        query = " ".join(terms)
+
+        def rank(n: int):
+            path = self._paths[n]
+            name = " ".join(fold(path[2]))
+            return (name != query, not name.startswith(query), path[2].casefold(), path)
+
+        return [self._paths[n] for n in heapq.nsmallest(limit, hits, key=rank)]
+
+    def similar(self, system: str, hospital: str, name: str, limit: int = 3) -> List[str]:
+        """Existing campuses of a hospital whose names are close to `name` (e.g. a typo of one)."""
+        names = self.campuses.get((system, hospital), [])
+        folded = {" ".join(fold(c)): c for c in names}
+        near = difflib.get_close_matches(" ".join(fold(name)), folded, n=limit, cutoff=0.75)
+        return [folded[f] for f in near]
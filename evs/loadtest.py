@@ -0,0 +1,230 @@
+"""Concurrent-session load test of the Streamlit app (via `streamlit.testing.v1.AppTest`).
+
+Each simulated inspector is its own AppTest session with its own copy of the
+document. AppTest sessions are not safe to run concurrently in one process
+(their element registries collide), so each session runs in its own spawned
+process; all run at once and compete for the CPU as sessions on a busy server
+do, and each process's RSS is one session's footprint. Caches shared through
+`st.cache_resource` are therefore per session here. Every session walks a
+scripted flow:
+
+* ``load``    — first run with the document in session state
+* ``campus``  — switch to another campus (one rerun per sidebar selectbox changed)
+* ``bci``     — submit a BCI area form (Save changes & open evidence) with one
+                item's evidence panel requested (AppTest cannot drive
+                `data_editor`, so the request is put in session state, as the
+                form's "Add evidence" action would)
+* ``photo``   — upload a photo to that item and click "Save uploads" (the
+                app's own event-log and reindex path)
+* ``rollup``  — switch the Roll-Up Dashboard to system scope
+
+The report gives p50 / p95 / max rerun time per step, each session's RSS
+(baseline, peak, growth over the flow) and its state size (`evs.session.sizeof`). Documents are
+either a real export or `synthetic_doc`, whose photos are valid PNGs of random
+(incompressible) pixels, so inline-photo costs are realistic.
+"""
+import logging
+import multiprocessing
+import os
+import random
+import resource
+import statistics
+import struct
+import threading
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+
+from evs.model import BCI_AREAS, build_evs_template, bytes_to_b64, iter_campuses, new_empty_doc, new_photo_id
+from evs.session import scope_suffix, sizeof
+
+STEPS = ("load", "campus", "bci", "photo", "rollup")
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "streamlit_app.py")
+RESPONSES = ("Pass", "Fail", "N/A")
+
+def synthetic_doc(systems: int = 2, hospitals: int = 5, campuses: int = 4, periods: int = 6,
+                  photos: int = 4, photo_kb: int = 200, seed: int = 1) -> Dict:
+    """A filled-in doc: every question answered for every period, `photos` photos per campus and period."""
+    rng = random.Random(seed)
+    labels = [time.strftime("%b-%y", (2025, m, 1, 0, 0, 0, 0, 0, 0)) for m in range(1, periods + 1)]
+    doc = new_empty_doc()
+    for s in range(systems):
+        hosp_objs = doc["systems"].setdefault(f"System {s + 1}", {"hospitals": {}})["hospitals"]
+        for h in range(hospitals):
+            camp_objs = hosp_objs.setdefault(f"Hospital {s + 1}.{h + 1}", {"campuses": {}})["campuses"]
+            for c in range(campuses):
+                camp = build_evs_template()
+                camp["meta"].update(system=f"System {s + 1}", hospital=f"Hospital {s + 1}.{h + 1}", campus=f"Campus {c + 1}")
+                camp["periods"] = list(labels)
+                for section in ("contractual_pip", "system_standards"):
+                    for row in camp["sections"][section]:
+                        row["responses"] = {p: rng.choice(("Yes", "No")) for p in labels}
+                for row in camp["sections"]["operational_info"]:
+                    row["values"] = {p: f"{rng.randint(50, 100)}%" for p in labels}
+                items = [it for area in camp["sections"]["bci"]["areas"].values() for it in area]
+                for it in items:
+                    it["responses"] = {p: rng.choice(RESPONSES) for p in labels}
+                for p in labels:
+                    for it in rng.sample(items, min(photos, len(items))):
+                        it["photos"].setdefault(p, []).append(_photo(rng, photo_kb))
+                camp_objs[f"Campus {c + 1}"] = camp
+    return doc
+
+def _png(rng: random.Random, kb: int, width: int = 256) -> bytes:
+    """A valid RGB PNG of about `kb` KiB of random (incompressible) pixels, stored uncompressed."""
+    height = max(1, kb * 1024 // (width * 3 + 1))
+    raw = b"".join(b"\x00" + rng.randbytes(width * 3) for _ in range(height))
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(raw, 0)) + chunk(b"IEND", b""))
+
+def _photo(rng: random.Random, kb: int) -> Dict:
+    return {"b64": bytes_to_b64(_png(rng, kb)), "caption": "", "ts": time.time(), "id": new_photo_id()}
+
+def _rss_mb() -> float:
+    """Current resident set size (Linux); peak RSS elsewhere."""
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1048576
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1048576 if peak > 1 << 32 else peak / 1024  # bytes on macOS, KiB on Linux
+
+def _percentile(vals: List[float], q: float) -> float:
+    vals = sorted(vals)
+    if not vals:
+        return 0.0
+    pos = (len(vals) - 1) * q / 100
+    lo = int(pos)
+    hi = min(lo + 1, len(vals) - 1)
+    return vals[lo] + (vals[hi] - vals[lo]) * (pos - lo)
+
+# =============================================================
+# One session
+# =============================================================
+def _timed(at, timings: Dict[str, List[float]], step: str) -> None:
+    t0 = time.perf_counter()
+    at.run()
+    timings[step].append(time.perf_counter() - t0)
+    if at.exception:
+        raise RuntimeError(f"{step}: {at.exception[0].value}")
+
+def _select(at, timings: Dict[str, List[float]], doc: Dict, s: str, h: str, c: str) -> Dict:
+    """Walk the sidebar to a campus's latest period, one widget (and rerun) at a time, as a user would."""
+    campus = doc["systems"][s]["hospitals"][h]["campuses"][c]
+    for key, value in (("sys_select", s), ("hosp_select", h), ("camp_select", c),
+                       ("current_period_select", campus["periods"][-1])):
+        if at.session_state[key] != value:
+            at.selectbox(key=key).select(value)
+            _timed(at, timings, "campus")
+    return campus
+
+def run_session(doc: Dict, iterations: int, seed: int, timeout: float = 120.0) -> Dict:
+    """One simulated inspector; returns per-step timings (s), RSS (MB) and the final session-state size."""
+    from streamlit.testing.v1 import AppTest
+
+    # Deprecation notices are logged on every rerun and would drown the report.
+    logging.getLogger("streamlit.deprecation_util").disabled = True
+
+    rss0 = _rss_mb()
+    peak = [rss0]
+    done = threading.Event()
+
+    def sample_rss() -> None:
+        while not done.wait(0.1):
+            peak[0] = max(peak[0], _rss_mb())
+
+    sampler = threading.Thread(target=sample_rss, daemon=True)
+    sampler.start()
+    try:
+        result = _flow(AppTest, doc, iterations, seed, timeout)
+    finally:
+        done.set()
+        sampler.join()
+    peak[0] = max(peak[0], _rss_mb())
+    result["rss_mb"] = {"baseline": rss0, "peak": peak[0]}
+    return result
+
+def _flow(AppTest, doc: Dict, iterations: int, seed: int, timeout: float) -> Dict:
+    rng = random.Random(seed)
+    paths = [(s, h, c) for s, h, c, _ in iter_campuses(doc)]
+    timings: Dict[str, List[float]] = {step: [] for step in STEPS}
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    at.session_state["doc"] = doc
+    _timed(at, timings, "load")
+    for _ in range(iterations):
+        s, h, c = rng.choice(paths)
+        campus = _select(at, timings, doc, s, h, c)
+
+        area = rng.choice(list(BCI_AREAS))
+        idx = rng.randrange(len(campus["sections"]["bci"]["areas"][area]))
+        scope = scope_suffix((s, h, c, at.session_state["current_period_select"]))
+        at.session_state[f"bci_pending_capture_{scope}"] = {area: [idx]}
+        save = [b for b in at.button if b.label == "Save changes & open evidence"]
+        save[list(campus["sections"]["bci"]["areas"]).index(area)].click()
+        _timed(at, timings, "bci")
+
+        upl_key = f"bci_upl_{area}_{idx}_{scope}"
+        at.file_uploader(key=upl_key).set_value(("photo.png", _png(rng, 200), "image/png"))
+        at.button(key=f"bci_save_upl_{upl_key}").click()
+        _timed(at, timings, "photo")
+
+        at.radio(key=f"scope_radio_{s}_{h}").set_value("System (all hospitals & campuses)")
+        _timed(at, timings, "rollup")
+    state = at.session_state.to_dict()
+    return {"timings": timings, "state_mb": sizeof(state) / 1048576, "doc_mb": sizeof(doc) / 1048576}
+
+# =============================================================
+# Many sessions
+# =============================================================
+def run_load_test(doc: Dict, sessions: int = 4, iterations: int = 3, seed: int = 0, timeout: float = 120.0) -> Dict:
+    """Run `sessions` inspectors at once, one process (and one copy of `doc`) each."""
+    t0 = time.perf_counter()
+    results, errors = [], []
+    with ProcessPoolExecutor(max_workers=sessions, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = [pool.submit(run_session, doc, iterations, seed + i, timeout) for i in range(sessions)]
+        for fut in futures:
+            try:
+                results.append(fut.result())
+            except Exception as e:  # keep the other sessions' numbers
+                errors.append(str(e))
+    wall = time.perf_counter() - t0
+    steps = {}
+    for step in STEPS:
+        vals = [t for r in results for t in r["timings"][step]]
+        if vals:
+            steps[step] = {"n": len(vals), "p50_ms": _percentile(vals, 50) * 1000, "p95_ms": _percentile(vals, 95) * 1000,
+                           "max_ms": max(vals) * 1000}
+    every = [t for r in results for ts in r["timings"].values() for t in ts]
+
+    def mean(key) -> float:
+        return statistics.mean(key(r) for r in results) if results else 0.0
+
+    return {
+        "sessions": sessions, "iterations": iterations, "wall_s": wall, "errors": errors, "steps": steps,
+        "all": {"n": len(every), "p50_ms": _percentile(every, 50) * 1000, "p95_ms": _percentile(every, 95) * 1000},
+        "per_session_mb": {
+            "rss_baseline": mean(lambda r: r["rss_mb"]["baseline"]),
+            "rss_peak": mean(lambda r: r["rss_mb"]["peak"]),
+            "rss_peak_max": max((r["rss_mb"]["peak"] for r in results), default=0.0),
+            "state": mean(lambda r: r["state_mb"]),
+            "doc": mean(lambda r: r["doc_mb"]),
+        },
+    }
+
+def format_report(res: Dict) -> List[str]:
+    lines = [f"{res['sessions']} session(s) x {res['iterations']} iteration(s) in {res['wall_s']:.1f}s", "",
+             f"{'step':<10}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}"]
+    for step, s in res["steps"].items():
+        lines.append(f"{step:<10}{s['n']:>6}{s['p50_ms']:>10.0f}{s['p95_ms']:>10.0f}{s['max_ms']:>10.0f}")
+    lines.append(f"{'all':<10}{res['all']['n']:>6}{res['all']['p50_ms']:>10.0f}{res['all']['p95_ms']:>10.0f}")
+    per = res["per_session_mb"]
+    lines += ["", f"Per session RSS MB: baseline {per['rss_baseline']:.0f}, peak {per['rss_peak']:.0f} "
+                  f"(max {per['rss_peak_max']:.0f}), growth {per['rss_peak'] - per['rss_baseline']:.0f}",
+              f"Per session state MB: {per['state']:.1f} (document {per['doc']:.1f})"]
+    lines += [f"error: {e}" for e in res["errors"]]
+    return lines
@@ -0,0 +1,228 @@
+"""Delta export and three-way merge of documents edited on several devices.
+
+A *delta* lists what changed between a base document and an edited copy, as
+edit-log events (`evs.eventlog` ops) that carry both the base value (``old``)
+and the edited value (``new``), one per (campus, period, item, field), photo,
+profile field or added period. Merging a delta into another copy of the same
+base is a three-way merge per cell:
+
+* the cell still has the base value -> take theirs;
+* it already has their value -> nothing to do;
+* it has a third value -> conflict: keep ours (default) or take theirs, and
+  report it either way.
+
+Deltas are plain JSON and carry photos by value, so merging is lossless.
+"""
+import time
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from evs.eventlog import FIELD_EVENTS, FIELD_OPS, apply_event, photo_key
+from evs.model import build_evs_template, iter_campuses
+from evs.schema import BCI_FIELDS, SECTION_SPECS
+from evs.search import SECTION_LABELS
+
+DELTA_KIND = "evs-delta"
+DELTA_VERSION = 1
+PROFILE_FIELDS = ("date", "assessed_by", "evs_manager")
+_MISSING = object()
+
+def is_delta(obj) -> bool:
+    return isinstance(obj, dict) and obj.get("kind") == DELTA_KIND
+
+# =============================================================
+# Export
+# =============================================================
+def _change(op: str, path: Tuple[str, str, str], period=None, target=None, old=_MISSING, new=_MISSING) -> Dict:
+    ch = {"op": op, "path": list(path)}
+    if period is not None:
+        ch["period"] = period
+    if target:
+        ch["target"] = target
+    if old is not _MISSING:
+        ch["old"] = old
+    if new is not _MISSING:
+        ch["new"] = new
+    return ch
+
+def _field_changes(out: List[Dict], path, target: Dict, fields: Iterable[str], row: Dict, base_row: Dict | None) -> None:
+    for field in fields:
+        cur, old = row[field], (base_row[field] if base_row is not None else {})
+        if cur == old:
+            continue
+        for period in dict.fromkeys([*old, *cur]):
+            a, b = old.get(period, _MISSING), cur.get(period, _MISSING)
+            if a != b:
+                out.append(_change(FIELD_EVENTS[field], path, period, target, a, b))
+
+def _photo_changes(out: List[Dict], path, target: Dict, item: Dict, base_item: Dict | None) -> None:
+    old_photos = base_item["photos"] if base_item is not None else {}
+    for period in dict.fromkeys([*old_photos, *item["photos"]]):
+        before = {photo_key(ph): ph for ph in old_photos.get(period, ())}
+        after = item["photos"].get(period, [])
+        for pos, ph in enumerate(after):
+            pid = photo_key(ph)
+            prev = before.pop(pid, None)
+            if prev is None:
+                out.append(_change("photo_added", path, period, {**target, "photo": pid, "pos": pos}, new=ph))
+            elif prev["caption"] != ph["caption"]:
+                out.append(_change("caption_set", path, period, {**target, "photo": pid}, prev["caption"], ph["caption"]))
+        for pid, ph in before.items():
+            out.append(_change("photo_removed", path, period, {**target, "photo": pid}, old=ph))
+
+def _campus_changes(path, campus: Dict, base: Dict | None) -> List[Dict]:
+    out: List[Dict] = []
+    ref = base if base is not None else build_evs_template()
+    for field in PROFILE_FIELDS:
+        if campus["meta"][field] != ref["meta"][field]:
+            out.append(_change("meta_set", path, None, {"field": field}, ref["meta"][field], campus["meta"][field]))
+    for period in campus["periods"]:
+        if period not in ref["periods"]:
+            out.append(_change("period_added", path, period))
+    for section, (_, fields) in SECTION_SPECS.items():
+        base_rows = ref["sections"][section]
+        for i, row in enumerate(campus["sections"][section]):
+            base_row = base_rows[i] if i < len(base_rows) else None
+            if row != base_row:
+                _field_changes(out, path, {"section": section, "idx": i}, fields, row, base_row)
+    base_areas = ref["sections"]["bci"]["areas"]
+    for area, items in campus["sections"]["bci"]["areas"].items():
+        base_items = base_areas.get(area, [])
+        for i, it in enumerate(items):
+            base_it = base_items[i] if i < len(base_items) else None
+            if it == base_it:
+                continue
+            target = {"section": "bci", "area": area, "idx": i}
+            if base_it is None or it["points"] != base_it["points"]:
+                out.append(_change("points_set", path, None, target, base_it["points"] if base_it else _MISSING, it["points"]))
+            _field_changes(out, path, target, BCI_FIELDS, it, base_it)
+            if it["photos"] != (base_it["photos"] if base_it else {}):
+                _photo_changes(out, path, target, it, base_it)
+    return out
+
+def doc_delta(base: Dict, current: Dict) -> Dict:
+    """Everything `current` changed relative to `base` (both repaired v4 docs)."""
+    base_campuses = {(s, h, c): camp for s, h, c, camp in iter_campuses(base)}
+    changes: List[Dict] = []
+    for s, h, c, camp in iter_campuses(current):
+        old = base_campuses.get((s, h, c))
+        if camp is old or camp == old:
+            continue
+        changes.extend(_campus_changes((s, h, c), camp, old))
+    return {
+        "kind": DELTA_KIND,
+        "version": DELTA_VERSION,
+        "base": {"doc_id": base.get("doc_id"), "revision": base.get("revision", 0)},
+        "source": {"doc_id": current.get("doc_id"), "revision": current.get("revision", 0)},
+        "created": time.time(),
+        "changes": changes,
+    }
+
+# =============================================================
+# Merge
+# =============================================================
+def _campus(doc: Dict, path: List[str]) -> Dict | None:
+    try:
+        return doc["systems"][path[0]]["hospitals"][path[1]]["campuses"][path[2]]
+    except KeyError:
+        return None
+
+def _row(campus: Dict, target: Dict) -> Dict | None:
+    rows = campus["sections"]["bci"]["areas"].get(target["area"]) if target["section"] == "bci" else campus["sections"][target["section"]]
+    if rows is None or target["idx"] >= len(rows):
+        return None
+    return rows[target["idx"]]
+
+def _current(doc: Dict, ch: Dict):
+    """The doc's value for the cell a change touches (`_MISSING` when absent)."""
+    campus = _campus(doc, ch["path"])
+    op, target = ch["op"], ch.get("target", {})
+    if campus is None:
+        return _MISSING
+    if op == "meta_set":
+        return campus["meta"].get(target["field"], _MISSING)
+    if op in ("period_added", "period_removed"):
+        return ch["period"] if ch["period"] in campus["periods"] else _MISSING
+    row = _row(campus, target)
+    if row is None:
+        return _MISSING
+    if op in FIELD_OPS:
+        return row[FIELD_OPS[op]].get(ch["period"], _MISSING)
+    if op == "points_set":
+        return row["points"]
+    for ph in row["photos"].get(ch["period"], ()):
+        if photo_key(ph) == target["photo"]:
+            return ph["caption"] if op == "caption_set" else ph
+    return _MISSING
+
+def _reachable(doc: Dict, ch: Dict, mine) -> bool:
+    """False when our copy lacks the item (or photo) a change targets, so it cannot be applied."""
+    campus = _campus(doc, ch["path"])
+    if campus is None or ch["op"] == "meta_set":
+        return True  # a missing campus is created from the template on apply
+    if _row(campus, ch["target"]) is None:
+        return False
+    return ch["op"] != "caption_set" or mine is not _MISSING
+
+def _label(ch: Dict) -> str:
+    target = ch.get("target", {})
+    if ch["op"] == "meta_set":
+        return f"Profile: {target['field']}"
+    if ch["op"].startswith("period_"):
+        return "Periods"
+    where = target["area"] if target["section"] == "bci" else SECTION_LABELS[target["section"]]
+    what = {"points_set": "points", "caption_set": "photo caption", "photo_added": "photo", "photo_removed": "photo"}.get(ch["op"], FIELD_OPS.get(ch["op"], ""))
+    return f"{where} Q{target['idx'] + 1} {what}".strip()
+
+def _shown(value):
+    if value is _MISSING:
+        return None
+    return "(photo)" if isinstance(value, dict) else value
+
+def merge_delta(doc: Dict, delta: Dict, prefer: str = "ours", apply: Callable[[Dict], None] | None = None) -> Dict:
+    """Three-way merge a delta into `doc` in place.
+
+    `apply(event)` performs each accepted change (default: `apply_event`; the app
+    passes its edit log so merges can be undone). Returns counts, conflicts and
+    the campus paths that were touched.
+    """
+    if not is_delta(delta):
+        raise ValueError("Not an EVS delta file.")
+    if delta.get("version", 0) > DELTA_VERSION:
+        raise ValueError(f"Delta was written by a newer app (v{delta['version']}).")
+    apply = apply or (lambda ev: apply_event(doc, ev))
+    applied = unchanged = 0
+    conflicts: List[Dict] = []
+    touched: Dict[Tuple[str, str, str], None] = {}
+    for ch in delta["changes"]:
+        op = ch["op"]
+        base, theirs = ch.get("old", _MISSING), ch.get("new", _MISSING)
+        mine = _current(doc, ch)
+        if op in ("photo_added", "period_added"):
+            done = mine is not _MISSING
+        elif op == "photo_removed":
+            done = mine is _MISSING
+        else:
+            done = mine == theirs
+        if done:
+            unchanged += 1
+            continue
+        # Adding / removing a photo or period is a set operation and cannot clash.
+        clash = op not in ("photo_added", "photo_removed", "period_added") and mine != base
+        reachable = op == "period_added" or _reachable(doc, ch, mine)
+        if clash or not reachable:
+            keep_mine = prefer == "ours" or not reachable
+            conflicts.append({
+                "Campus": " / ".join(ch["path"]), "Period": ch.get("period", ""), "Where": _label(ch),
+                "Base": _shown(base), "Mine": _shown(mine), "Theirs": _shown(theirs), "Kept": "mine" if keep_mine else "theirs",
+            })
+            if keep_mine:
+                continue
+        ev = {k: v for k, v in ch.items() if k not in ("old", "new")}
+        if mine is not _MISSING and op != "photo_added":
+            ev["old"] = mine
+        if theirs is not _MISSING:
+            ev["new"] = theirs
+        apply(ev)
+        applied += 1
+        touched[tuple(ch["path"])] = None
+    return {"applied": applied, "unchanged": unchanged, "conflicts": conflicts, "touched": list(touched)}
@@ -0,0 +1,338 @@
+"""Document model: campus template, v4 multi-hospital doc scaffolding and migrations.
+
+Pure data helpers with no Streamlit dependency, so the scoring library, CLI and
+background workers can import them without starting a page.
+"""
+import base64
+import uuid
+from typing import Dict, Iterator, Tuple
+
+# =============================================================
+# Constants and Templates
+# =============================================================
+DEFAULT_WEIGHTS: Dict[str, float] = {
+    "financial_pip": 0.30,
+    "system_standards": 0.10,
+    "bci": 0.60,
+}
+
+# NOTE: None means "exclude from denominator"
+DEFAULT_RESPONSE_MAPS: Dict[str, Dict[str, float | None]] = {
+    "contractual_pip": {"Yes": 1.0, "Partial": 0.25, "No": 0.0, "N/A": None},
+    "system_standards": {"Yes": 1.0, "Partial": 0.5, "No": 0.0, "N/A": None},
+    "bci": {"Pass": 1.0, "Partial": 0.5, "Fail": 0.0, "N/A": None},
+}
+
+# Period selector entry for "no period yet"; data entered under it moves to the next period created.
+PERIOD_PLACEHOLDER = "(create new)"
+
+def copy_response_maps() -> Dict[str, Dict[str, float | None]]:
+    """Fresh, mutable copy of the default response maps (values are scalars, so two levels suffice)."""
+    return {section: dict(mapping) for section, mapping in DEFAULT_RESPONSE_MAPS.items()}
+
+# =============================================================
+# Photo helpers
+# =============================================================
+def bytes_to_b64(data: bytes) -> str:
+    return base64.b64encode(data).decode("utf-8")
+
+def new_photo_id() -> str:
+    return uuid.uuid4().hex
+
+def ensure_bci_item_photos(item: Dict, period: str) -> None:
+    photos = item.setdefault("photos", {})
+    photos.setdefault(period, [])
+
+# =============================================================
+# Template
+# =============================================================
+# Checklist text is module-level so it is built once per process, not per template.
+BCI_AREAS: Dict[str, Tuple[str, ...]] = {
+    "Entrance and Lobby": (
+        "Are entrance areas free of cigarette butts and litter?",
+        "Are mats clean and in proper position?",
+        "Are walls, windows, glass, mirrors and doors free of marks and finger smears?",
+        "Are cigarette urns, exterior urns and trash containers clean and properly lined?",
+        "Are floors finished with depth shine and/or carpets are clean and fresh?",
+        "Are ledges, lights, vents and registers clean and free of dust?",
+        "Are furniture, cabinets and locker exteriors dust free and clean?",
+    ),
+    "Restrooms": (
+        "Are floors clean and free of dirt, spills, litter and are grout lines clean?",
+        "Are all fixtures (sinks, toilets, tubs, water fountain, etc.) clean and mineral free?",
+        "Are walls, windows, glass, mirrors and doors free of marks and finger smears?",
+        "Are waste containers clean, properly lined and in proper condition?",
+        "Are supply dispensers clean and adequately filled?",
+        "Is room odor free?",
+    ),
+    "Corridors": (
+        "Are floors finished with depth shine and/or carpets are clean and fresh?",
+        "Are ledges, lights, vents and registers clean and free of dust?",
+        "Are walls windows, glass, mirrors and doors free of marks and finger smears?",
+        "Are waste containers clean, properly lined and in proper condition?",
+        "Are furniture, cabinets and locker exteriors dust free and clean?",
+        "Are fixtures (sinks, water fountain, etc.) soap and mineral free?",
+    ),
+    "Elevators": (
+        "Are floors finished with depth shine and/or carpets are clean and fresh?",
+        "Are walls are clean and free of smudges and marks?",
+        "Are ledges, lights, vents and registers clean and free of dust?",
+        "Are elevator tracks clean?",
+    ),
+    "Stairs": (
+        "Are floors finished with depth shine and/or carpets are clean and fresh?",
+        "Are walls, hand rails and doors clean and free of smudges and marks?",
+        "Are ledges, lights, vents and registers clean and free of dust?",
+        "Are fire extinguisher cabinets/closets clean?",
+    ),
+    "Support Rooms (Conference and Training)": (
+        "Are floors finished with depth shine and/or carpets are clean and fresh?",
+        "Are ledges, lights, vents and registers clean and free of dust?",
+        "Are walls, windows, glass, mirrors and doors free of marks and finger smears?",
+        "Are waste containers clean, properly lined and in proper condition?",
+        "Are furniture, cabinets and locker exteriors dust free and clean?",
+        "Are fixtures (sinks, water fountain, etc.) soap and mineral free?",
+    ),
+    "Patient/Resident Room (4 rooms)": (
+        "Are floors finished with depth shine and/or carpets are clean and fresh?",
+        "Are ledges, lights, vents and registers clean and free of dust?",
+        "Are walls, windows, glass, mirrors and doors free of marks and finger smears?",
+        "Are waste containers clean and properly lined and in proper condition?",
+        "Is the patient bed clean including side rails, headboard, footboard, frame and wheels?",
+        "Are furniture, cabinets and locker exteriors dust free and clean?",
+        "Are tent cards in patient room?",
+        "Are curtains, drapes and linens free of spots and dust?",
+        "Are all fixtures (sinks, toilets, tubs, water fountain, etc.) soap and mineral free?",
+        "Are supply dispensers clean and adequately filled?",
+        "Are the Que's of Clean completed in the Bathroom?",
+        "Is the room odor free?",
+    ),
+    "Operating Rooms, Corridor and Core": (
+        "Are the floors clean and free of visible debris and have the proper finish?",
+        "Are the vents and exhaust fans dust free?",
+        "Are the walls, doors and windows clean and with no spot or stains?",
+        "Are trash cans clean, emptied and lined?",
+        "Is the Equipment in EVS scope of services clean and sanitized to include behind and under equipment?",
+        "Are ledges and other horizontal surfaces clean and dust free?",
+        "Are all fixtures (scrub sinks, water fountain, etc.) soap and mineral free?",
+        "Are supply dispensers clean and adequately filled?",
+        "Is the room terminally cleaned within 24 hours after procedures?",
+    ),
+    "Sterile Processing Department": (
+        "Are the floors clean and free of visible debris and have the proper finish?",
+        "Are the vents and exhaust fans dust free?",
+        "Are the walls, doors and windows clean and with no spot or stains?",
+        "Are trash cans clean, emptied and lined?",
+        "Is the Equipment in EVS scope of services clean and sanitized to include behind and under equipment?",
+        "Are ledges and other horizontal surfaces clean and dust free?",
+        "Are all fixtures (scrub sinks, water fountain, etc.) soap and mineral free?",
+        "Are supply dispensers clean and adequately filled?",
+    ),
+    "Emergency Department": (
+        "Are floors finished with depth shine and/or carpets are clean and fresh?",
+        "Are ledges, lights, vents and registers clean and free of dust?",
+        "Are walls, windows, glass, mirrors and doors free of marks and finger smears?",
+        "Are trash cans clean, emptied and lined?",
+        "Are patient beds clean including side rails, headboard, footboard, frame and wheels?",
+        "Are furniture, cabinets and locker exteriors dust free and clean?",
+        "Are curtains, drapes and linens free of spots and dust?",
+        "Are all fixtures (sinks, toilets, tubs, water fountain, etc.) soap and mineral free?",
+        "Are supply dispensers clean and adequately filled?",
+        "Is the room odor free?",
+    ),
+    "Offices (4 rooms)": (
+        "Are floors finished with depth shine and/or carpets are clean and fresh?",
+        "Are ledges, lights, vents and registers clean and free of dust?",
+        "Are walls, windows, glass, mirrors and doors free of marks and finger smears?",
+        "Are trash cans clean, emptied and lined?",
+        "Are furniture, cabinets and locker exteriors dust free and clean?",
+        "Are restrooms clean and free of trash?",
+        "Are telephones clean and free of dust?",
+        "Are all fixtures (sinks, water fountain, etc.) soap and mineral free?",
+        "Are supply dispensers clean and adequately filled?",
+    ),
+}
+
+CONTRACTUAL_PIP_ITEMS: Tuple[str, ...] = (
+    "Qualtrics Patient Satisfaction Scores Cleanliness",
+    "Qualtrics Patient Satisfaction Scores Courtesy",
+    "Overall Discharge Clean Compliance Percent of Stat Rooms cleaned within 60 minutes and Routine rooms within 120 minutes equal to or above MHHS PIP Target?",
+    "Virtual Manager Utilization Percentage",
+    "ATP Compliance YTD equal to or above the PIP Targets?",
+    "Linen Clean Reject Rate",
+    "Linen Overall Fill Rate",
+    "Linen Overall On time Delivery",
+    "Is the Linen Utilization Pounds Per Adjusted Patient Day equal to or below the PIP Target?",
+    "Is Contract Service - Housekeeping Fees and Expenses below YTD budget",
+    "Is Chemicals Expenses below YTD budget",
+    "Is Housekeeping Supplies expenses below YTD budget",
+)
+
+SYSTEM_STANDARD_ITEMS: Tuple[str, ...] = (
+    "Is My Rounding program in place and maintained per Compass requirements (incl. feedback, service recovery communication)?",
+    "Has EVS implemented Right Person/Right Place to evaluate unit scores and dedicate staff accordingly?",
+    "Is patient scripting conducted daily (verified)?",
+    "Does EVS management conduct observations for 10 Step Cleaning & QA of rooms daily (≥2 per employee per month) and meet Compass targets?",
+    "Are Nurse Roundings conducted by EVS leadership and at/above Compass YTD targets?",
+    "Is EVS equipment in good working order with no dirt buildup?",
+)
+
+OPERATIONAL_INFO_ITEMS: Tuple[str, ...] = (
+    "YTD Adjusted Patient Days variance to budget",
+    "YTD Discharge Cleans",
+    "ATP swabs completed YTD?",
+    "Stat Rooms percent of total discharge cleans?",
+    "Bed Turnaround time for Stat Rooms cleans % compliant in 60 min",
+    "Bed Turnaround time for Regular Room cleans % compliant in 120 min.",
+    "Stat rooms % rooms occupied w/in 90 min",
+    "Stat rooms % rooms occupied w/in 60 min",
+    "Does Facility use Auto Stat function for bed to designate bed clean status in Bed Management?",
+    "Open Positions",
+)
+
+BCI_AREA_NAMES: Tuple[str, ...] = tuple(BCI_AREAS)
+
+def build_evs_template() -> Dict:
+    """Campus template with sections, checklists, and per-question photo storage."""
+    campus = {
+        "meta": {
+            "system": "",
+            "hospital": "",
+            "campus": "",
+            "date": "",
+            "assessed_by": "",
+            "evs_manager": "",
+        },
+        "periods": [],
+        "sections": {
+            "operational_info": [
+                {"name": k, "values": {}, "comments": {}} for k in OPERATIONAL_INFO_ITEMS
+            ],
+            "contractual_pip": [
+                {"name": k, "responses": {}, "comments": {}} for k in CONTRACTUAL_PIP_ITEMS
+            ],
+            "system_standards": [
+                {"name": k, "responses": {}, "comments": {}} for k in SYSTEM_STANDARD_ITEMS
+            ],
+            "bci": {
+                "areas": {
+                    area: [
+                        {"name": q, "points": 1.0, "responses": {}, "comments": {}, "photos": {}}
+                        for q in qs
+                    ]
+                    for area, qs in BCI_AREAS.items()
+                }
+            },
+        },
+    }
+    return campus
+
+# =============================================================
+# Initialization & Migration
+# =============================================================
+def new_doc_id() -> str:
+    return uuid.uuid4().hex
+
+def new_empty_doc() -> Dict:
+    return {
+        "doc_id": new_doc_id(),
+        "systems": {},
+        "weights": DEFAULT_WEIGHTS.copy(),
+        "response_maps": copy_response_maps(),
+        "version": 4,
+        "revision": 0,
+    }
+
+def bump_revision(doc: Dict, campus: Dict | None = None) -> None:
+    """Advance the doc (and campus) revision after any saved edit; caches key on these."""
+    doc["revision"] = doc.get("revision", 0) + 1
+    if campus is not None:
+        campus["revision"] = campus.get("revision", 0) + 1
+
+def ensure_system(doc: Dict, name: str) -> None:
+    if name and name not in doc["systems"]:
+        doc["systems"][name] = {"hospitals": {}}
+
+def ensure_hospital(doc: Dict, sys: str, hosp: str) -> None:
+    ensure_system(doc, sys)
+    sysobj = doc["systems"][sys]
+    if hosp and hosp not in sysobj["hospitals"]:
+        sysobj["hospitals"][hosp] = {"campuses": {}}
+
+def ensure_campus(doc: Dict, sys: str, hosp: str, camp: str) -> None:
+    ensure_hospital(doc, sys, hosp)
+    hospobj = doc["systems"][sys]["hospitals"][hosp]
+    if camp and camp not in hospobj["campuses"]:
+        hospobj["campuses"][camp] = build_evs_template()
+        hospobj["campuses"][camp]["meta"].update({"system": sys, "hospital": hosp, "campus": camp})
+
+def migrate_old_doc(old_doc: Dict | None) -> Dict:
+    """Migrate v2/v3 single-facility docs to v4 multi-hospital."""
+    new_doc = new_empty_doc()
+    if not isinstance(old_doc, dict):
+        return new_doc
+    if "facilities" in old_doc and isinstance(old_doc["facilities"], dict) and old_doc["facilities"]:
+        sys_name = old_doc.get("system_name", "Migrated System")
+        new_doc["systems"][sys_name] = {"hospitals": {}}
+        for fac_name, fac_data in old_doc["facilities"].items():
+            campus = build_evs_template()
+            if isinstance(fac_data, dict):
+                if isinstance(fac_data.get("sections"), dict):
+                    campus["sections"] = fac_data["sections"]
+                if isinstance(fac_data.get("periods"), list):
+                    campus["periods"] = fac_data["periods"]
+                if isinstance(fac_data.get("meta"), dict):
+                    campus["meta"].update({
+                        "date": fac_data["meta"].get("date", ""),
+                        "assessed_by": fac_data["meta"].get("assessed_by", ""),
+                        "evs_manager": fac_data["meta"].get("evs_manager", ""),
+                    })
+            campus["meta"].update({"system": sys_name, "hospital": fac_name, "campus": "Main Campus"})
+            new_doc["systems"][sys_name]["hospitals"][fac_name] = {"campuses": {"Main Campus": campus}}
+        if "weights" in old_doc:
+            new_doc["weights"] = old_doc["weights"]
+        if "response_maps" in old_doc:
+            new_doc["response_maps"] = old_doc["response_maps"]
+        return new_doc
+    return new_doc
+
+def iter_campuses(doc: Dict) -> Iterator[Tuple[str, str, str, Dict]]:
+    """Yield (system, hospital, campus, campus_obj) for every campus in the doc."""
+    for sys_name, sysobj in doc["systems"].items():
+        for hosp_name, hospobj in sysobj["hospitals"].items():
+            for camp_name, camp in hospobj["campuses"].items():
+                yield sys_name, hosp_name, camp_name, camp
+
+def migrate_period_label(campus: Dict, old_label: str, new_label: str) -> None:
+    """Move any data saved under a placeholder period label to the new label."""
+    if not old_label or not new_label or old_label == new_label:
+        return
+    # Operational Info
+    for r in campus["sections"]["operational_info"]:
+        if old_label in r["values"]:
+            r["values"].setdefault(new_label, r["values"][old_label])
+            r["values"].pop(old_label, None)
+        if old_label in r["comments"]:
+            r["comments"].setdefault(new_label, r["comments"][old_label])
+            r["comments"].pop(old_label, None)
+    # Contractual & System Standards
+    for section in ["contractual_pip", "system_standards"]:
+        for r in campus["sections"][section]:
+            if old_label in r["responses"]:
+                r["responses"].setdefault(new_label, r["responses"][old_label])
+                r["responses"].pop(old_label, None)
+            if old_label in r["comments"]:
+                r["comments"].setdefault(new_label, r["comments"][old_label])
+                r["comments"].pop(old_label, None)
+    # BCI
+    for items in campus["sections"]["bci"]["areas"].values():
+        for it in items:
+            if old_label in it["responses"]:
+                it["responses"].setdefault(new_label, it["responses"][old_label])
+                it["responses"].pop(old_label, None)
+            if old_label in it["comments"]:
+                it["comments"].setdefault(new_label, it["comments"][old_label])
+                it["comments"].pop(old_label, None)
+            if "photos" in it and old_label in it["photos"]:
+                it["photos"].setdefault(new_label, it["photos"][old_label])
+                it["photos"].pop(old_label, None)
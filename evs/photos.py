@@ -0,0 +1,145 @@
+"""Photo index for the evidence browser.
+
+Every BCI photo carries a stable ``id`` (assigned on capture, or by
+`evs.schema.repair_doc` for older files). `PhotoIndex` maps each id to its
+location and photo dict, and each (campus, period, area, item) to its ids, so
+lookups, caption edits and deletes never scan galleries. Pages of a scope are
+sorted once per index version. Grids show thumbnails (small JPEGs, made with
+Pillow only for the photos on the page being shown and cached); the full image
+is decoded only when a photo is opened.
+"""
+import base64
+import io
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+from evs.model import iter_campuses
+
+CampusPath = Tuple[str, str, str]
+ItemKey = Tuple[str, str, str, str, str, int]  # (system, hospital, campus, period, area, item index)
+THUMB_PX = 320  # longest side of a thumbnail
+
+def make_thumbnail(data: bytes, max_px: int = THUMB_PX, quality: int = 80) -> bytes:
+    """JPEG of at most `max_px` on the longest side (camera rotation applied)."""
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(data)) as im:
+        small = ImageOps.exif_transpose(im)
+        small.thumbnail((max_px, max_px))
+        if small.mode not in ("RGB", "L"):
+            small = small.convert("RGB")
+        out = io.BytesIO()
+        small.save(out, "JPEG", quality=quality, optimize=True)
+    return out.getvalue()
+
+class PhotoIndex:
+    """id -> (item key, photo) and item key -> ids, for every BCI photo in a doc."""
+
+    def __init__(self, thumb_cache: int = 256):
+        self._photos: Dict[str, Tuple[ItemKey, Dict, str]] = {}   # id -> (item key, photo, question)
+        self._by_item: Dict[ItemKey, List[str]] = {}
+        self._by_campus: Dict[CampusPath, List[str]] = {}
+        self._pages: Dict[Tuple, List[str]] = {}                   # filter -> ids, newest first
+        self._thumbs: "OrderedDict[str, bytes]" = OrderedDict()
+        self._thumb_cache = thumb_cache
+
+    @classmethod
+    def from_doc(cls, doc: Dict) -> "PhotoIndex":
+        idx = cls()
+        for sys_name, hosp, camp, campus in iter_campuses(doc):
+            idx._add_campus((sys_name, hosp, camp), campus)
+        return idx
+
+    def _add_campus(self, path: CampusPath, campus: Dict) -> None:
+        ids = self._by_campus.setdefault(path, [])
+        for area, items in campus["sections"]["bci"]["areas"].items():
+            for i, it in enumerate(items):
+                for period, gallery in it["photos"].items():
+                    if not gallery:
+                        continue
+                    key = (*path, period, area, i)
+                    item_ids = self._by_item.setdefault(key, [])
+                    for ph in gallery:
+                        pid = ph["id"]
+                        self._photos[pid] = (key, ph, it["name"])
+                        item_ids.append(pid)
+                        ids.append(pid)
+
+    def reindex(self, path: CampusPath, campus: Dict) -> None:
+        """Refresh one campus after a save (galleries are small; no image data is touched)."""
+        self.drop_campus(path)
+        self._add_campus(path, campus)
+
+    def drop_campus(self, path: CampusPath) -> None:
+        for pid in self._by_campus.pop(path, []):
+            key, _, _ = self._photos.pop(pid)
+            self._by_item.pop(key, None)
+            self._thumbs.pop(pid, None)
+        self._pages.clear()
+
+    # ---- lookups ----
+    def __contains__(self, pid: str) -> bool:
+        return pid in self._photos
+
+    def __len__(self) -> int:
+        return len(self._photos)
+
+    def photo(self, pid: str) -> Dict:
+        return self._photos[pid][1]
+
+    def location(self, pid: str) -> ItemKey:
+        return self._photos[pid][0]
+
+    def position(self, pid: str) -> int:
+        """Index of the photo in its item's gallery (ids are kept in gallery order)."""
+        return self._by_item[self._photos[pid][0]].index(pid)
+
+    def set_caption(self, pid: str, caption: str) -> None:
+        """Caption-only edit: pages are ordered by time, so nothing else needs refreshing."""
+        self._photos[pid][1]["caption"] = caption
+
+    def item_photos(self, key: ItemKey) -> List[Dict]:
+        return [self._photos[pid][1] for pid in self._by_item.get(key, ())]
+
+    def _filtered(self, system: str, hospital: str | None, campus: str | None, period: str | None, area: str | None) -> List[str]:
+        fkey = (system, hospital, campus, period, area)
+        if fkey not in self._pages:
+            ids = []
+            for path, camp_ids in self._by_campus.items():
+                if path[0] != system or (hospital is not None and path[1] != hospital) or (campus is not None and path[2] != campus):
+                    continue
+                for pid in camp_ids:
+                    key = self._photos[pid][0]
+                    if (period is None or key[3] == period) and (area is None or key[4] == area):
+                        ids.append(pid)
+            ids.sort(key=lambda pid: self._photos[pid][1]["ts"], reverse=True)
+            self._pages[fkey] = ids
+        return self._pages[fkey]
+
+    def count(self, system: str, hospital: str | None = None, campus: str | None = None,
+              period: str | None = None, area: str | None = None) -> int:
+        return len(self._filtered(system, hospital, campus, period, area))
+
+    def page(self, system: str, hospital: str | None = None, campus: str | None = None, period: str | None = None,
+             area: str | None = None, offset: int = 0, limit: int = 24) -> List[Dict]:
+        """Newest-first photo metadata for one page of a scope; `None` filters mean "any"."""
+        out = []
+        for pid in self._filtered(system, hospital, campus, period, area)[offset:offset + limit]:
+            (sys_name, hosp, camp, period_, area_, i), ph, question = self._photos[pid]
+            out.append({"id": pid, "system": sys_name, "hospital": hosp, "campus": camp, "period": period_,
+                        "area": area_, "idx": i, "question": question, "caption": ph["caption"], "ts": ph["ts"]})
+        return out
+
+    def image(self, pid: str) -> bytes:
+        """The full-size image (not cached: only decoded when a photo is opened)."""
+        return base64.b64decode(self._photos[pid][1]["b64"])
+
+    def thumbnail(self, pid: str) -> bytes:
+        """Small JPEG of the photo, kept for the most recently viewed photos only."""
+        data = self._thumbs.pop(pid, None)
+        if data is None:
+            data = make_thumbnail(self.image(pid))
+        self._thumbs[pid] = data
+        while len(self._thumbs) > self._thumb_cache:
+            self._thumbs.popitem(last=False)
+        return data
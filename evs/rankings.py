@@ -0,0 +1,187 @@
+"""Leaderboards and outliers across campuses, precomputed per period and area.
+
+`RankingIndex.build` scores every (campus, period) once from cached histograms
+and sorts the results; all queries afterwards are lookups or slices, so the
+Roll-Up tab can answer them for hundreds of campuses without rescoring.
+"""
+import bisect
+from collections import Counter
+from typing import Dict, List, Tuple
+
+from evs.cache import CampusPath, HistogramCache
+from evs.scoring import components_from_histogram, merge_histograms, summarise_from_components
+
+QUANTILES = (10, 25, 50, 75, 90)
+
+def _label(path: CampusPath) -> str:
+    return f"{path[1]} / {path[2]}"
+
+def _quantile(sorted_vals: List[float], q: float) -> float:
+    """Linear-interpolated percentile of an ascending list."""
+    if not sorted_vals:
+        return 0.0
+    pos = (len(sorted_vals) - 1) * q / 100
+    lo = int(pos)
+    hi = min(lo + 1, len(sorted_vals) - 1)
+    return sorted_vals[lo] + (sorted_vals[hi] - sorted_vals[lo]) * (pos - lo)
+
+class RankingIndex:
+    """Per-period / per-area campus rankings for one scope (hospital or system)."""
+
+    def __init__(self):
+        self.periods: List[str] = []
+        self._rows: Dict[str, Dict[CampusPath, Dict]] = {}        # period -> path -> summary row
+        self._order: Dict[Tuple[str, str], List[CampusPath]] = {}  # (period, metric) -> paths, best first
+        self._sorted_vals: Dict[Tuple[str, str], List[float]] = {} # (period, metric) -> ascending values
+        self._area_totals: Dict[str, Dict[str, float]] = {}        # period -> area -> scope-wide %
+        self._drops: Dict[str, List[Dict]] = {}
+        self._fails: Dict[str, Counter] = {}
+        self._names: Dict[Tuple[str, int], str] = {}
+        self._hists_by_period: Dict[str, List[Dict]] = {}
+        self._maps: Dict[str, Dict] = {}
+        self._weights: Dict[str, float] = {}
+        self._settings: str = ""
+        self._row_src: Dict[Tuple[CampusPath, str], Tuple[int, int, Dict]] = {}  # reusable per campus revision
+
+    @classmethod
+    def build(cls, campuses: List[Tuple[CampusPath, Dict]], maps: Dict[str, Dict], weights: Dict[str, float],
+              cache: HistogramCache, previous: "RankingIndex | None" = None) -> "RankingIndex":
+        """Index every (campus, period); rows of campuses unchanged since `previous` are reused."""
+        idx = cls()
+        idx._settings = repr((sorted(weights.items()), sorted((k, sorted(v.items())) for k, v in maps.items())))
+        reuse = previous._row_src if previous is not None and previous._settings == idx._settings else {}
+        hists_by_period: Dict[str, List[Dict]] = {}
+        for path, camp in campuses:
+            prev_weighted = None
+            rev = camp.get("revision", 0)
+            for p in camp["periods"]:
+                hist = cache.get(path, camp, p)
+                hists_by_period.setdefault(p, []).append(hist)
+                hit = reuse.get((path, p))
+                if hit is not None and hit[0] == rev and hit[1] == id(camp):
+                    row = hit[2]
+                else:
+                    comp = components_from_histogram(hist, maps)
+                    s = summarise_from_components(comp, weights)
+                    row = {
+                        "path": path,
+                        "Campus": _label(path),
+                        "weighted": s["operational"]["weighted"],
+                        "bci": s["bci_overall"],
+                        "pip": s["operational"]["financial_pip"],
+                        "sys": s["operational"]["system_standards"],
+                        # Areas with nothing scored are left out of area rankings rather than ranked as 0%.
+                        "areas": {a: s["bci_by_dimension"][a] for a, (_, d) in comp["bci_by_dimension"].items() if d},
+                    }
+                idx._row_src[(path, p)] = (rev, id(camp), row)
+                idx._rows.setdefault(p, {})[path] = row
+                # Month-over-month uses each campus's own period order.
+                if prev_weighted is not None:
+                    idx._drops.setdefault(p, []).append({
+                        "Campus": row["Campus"], "Previous": prev_weighted[0],
+                        "Previous %": prev_weighted[1], "Current %": row["weighted"],
+                        "Δ": round(row["weighted"] - prev_weighted[1], 1),
+                    })
+                prev_weighted = (p, row["weighted"])
+                fails = cache.failures(path, camp, p)
+                if fails:
+                    if p not in idx._fails:
+                        idx._fails[p] = Counter()
+                    idx._fails[p].update(set(fails))
+                    areas = camp["sections"]["bci"]["areas"]
+                    for area, i in fails:
+                        idx._names.setdefault((area, i), areas[area][i]["name"])
+        idx.periods = sorted(idx._rows)
+        for drops in idx._drops.values():
+            drops.sort(key=lambda d: d["Δ"])
+        idx._hists_by_period = hists_by_period
+        idx._maps, idx._weights = maps, weights
+        return idx
+
+    # Orderings and scope totals are materialised on first use and then memoised,
+    # so a rebuild after a save only pays for the periods someone actually views.
+    def _sorted(self, period: str, metric: str) -> Tuple[List[CampusPath], List[float]]:
+        key = (period, metric)
+        if key not in self._order:
+            vals = [(self._value(r, metric), path) for path, r in self._rows.get(period, {}).items()]
+            vals = [(v, path) for v, path in vals if v is not None]
+            vals.sort(key=lambda t: (-t[0], t[1]))
+            self._order[key] = [path for _, path in vals]
+            self._sorted_vals[key] = sorted(v for v, _ in vals)
+        return self._order[key], self._sorted_vals[key]
+
+    def _area_totals_for(self, period: str) -> Dict[str, float]:
+        if period not in self._area_totals:
+            hists = self._hists_by_period.get(period, [])
+            comp = components_from_histogram(merge_histograms(hists), self._maps)
+            agg = summarise_from_components(comp, self._weights)
+            self._area_totals[period] = {a: agg["bci_by_dimension"][a] for a, (_, d) in comp["bci_by_dimension"].items() if d}
+        return self._area_totals[period]
+
+    @staticmethod
+    def _value(row: Dict, metric: str) -> float | None:
+        if metric.startswith("area:"):
+            return row["areas"].get(metric[5:])
+        return row[metric]
+
+    def campus_count(self, period: str) -> int:
+        return len(self._rows.get(period, {}))
+
+    def percentile(self, period: str, path: CampusPath, metric: str = "weighted") -> float:
+        """Percent of campuses scoring strictly below, plus half the ties."""
+        _, vals = self._sorted(period, metric)
+        row = self._rows.get(period, {}).get(path)
+        if not vals or row is None:
+            return 0.0
+        v = self._value(row, metric)
+        lo = bisect.bisect_left(vals, v)
+        hi = bisect.bisect_right(vals, v)
+        return round((lo + (hi - lo) / 2) / len(vals) * 100, 1)
+
+    def leaderboard(self, period: str, metric: str = "weighted", limit: int | None = None, worst_first: bool = False) -> List[Dict]:
+        order, _ = self._sorted(period, metric)
+        if worst_first:
+            order = order[::-1]
+        rows = self._rows.get(period, {})
+        out = []
+        for rank, path in enumerate(order[:limit] if limit else order, start=1):
+            r = rows[path]
+            out.append({
+                "Rank": len(order) - rank + 1 if worst_first else rank,
+                "Campus": r["Campus"],
+                "Score %": self._value(r, metric),
+                "BCI Overall %": r["bci"],
+                "Contractual & PIP %": r["pip"],
+                "System Standards %": r["sys"],
+                "Weighted %": r["weighted"],
+                "Percentile": self.percentile(period, path, metric),
+            })
+        return out
+
+    def distribution(self, period: str, metric: str = "weighted") -> Dict[str, float]:
+        _, vals = self._sorted(period, metric)
+        return {f"p{q}": round(_quantile(vals, q), 1) for q in QUANTILES}
+
+    def worst_areas(self, period: str, limit: int = 5) -> List[Dict]:
+        """Scope-wide BCI areas, lowest % first, with the lowest and median campus score for each."""
+        totals = self._area_totals_for(period)
+        out = []
+        for area, pct in sorted(totals.items(), key=lambda t: t[1])[:limit]:
+            _, vals = self._sorted(period, f"area:{area}")
+            out.append({"Area": area, "Scope %": pct, "Lowest campus %": vals[0] if vals else 0.0,
+                        "Median campus %": round(_quantile(vals, 50), 1)})
+        return out
+
+    def biggest_drops(self, period: str, limit: int = 10) -> List[Dict]:
+        return [d for d in self._drops.get(period, []) if d["Δ"] < 0][:limit]
+
+    def fail_clusters(self, period: str, min_campuses: int = 2, limit: int = 10) -> List[Dict]:
+        """BCI questions answered "Fail" at `min_campuses` or more campuses in the period."""
+        n = self.campus_count(period)
+        out = []
+        for (area, i), count in self._fails.get(period, Counter()).most_common():
+            if count < min_campuses or len(out) >= limit:
+                break
+            out.append({"Area": area, "Q#": i + 1, "Question": self._names[(area, i)], "Campuses failing": count,
+                        "Share %": round(count / n * 100, 1) if n else 0.0})
+        return out
@@ -0,0 +1,285 @@
+"""Monthly report packets (XLSX / PDF) rendered in a background process pool.
+
+The app builds a plain-data *payload* (tables + photo thumbnails) for a scope and
+hands it to :class:`ReportQueue`, which renders it in a worker process so large
+system packets never block a Streamlit rerun. Finished reports are cached by
+key (scope, periods, format, doc revision) until the revision moves on.
+"""
+import base64
+import io
+import multiprocessing
+import struct
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from typing import Callable, Dict, Hashable, List, Tuple
+
+from evs.model import BCI_AREA_NAMES
+from evs.photos import make_thumbnail
+from evs.scoring import aggregate_components, compute_period_components, summarise_from_components, summary_tables
+
+REPORT_FORMATS: Dict[str, Tuple[str, str]] = {
+    "xlsx": ("XLSX (Excel)", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "pdf": ("PDF", "application/pdf"),
+}
+THUMBS_PER_CAMPUS = 12
+THUMB_MAX_PX = 180
+
+# =============================================================
+# Payload (built in the UI process; cheap)
+# =============================================================
+def _thumbnail(photo: Dict) -> bytes:
+    return make_thumbnail(base64.b64decode(photo["b64"]))
+
+def build_report_payload(title: str, campuses: List[Tuple[str, Dict]], chosen: List[str], maps: Dict[str, Dict], weights: Dict[str, float], with_rollup: bool, app_version: str = "",
+                         thumbnail: Callable[[Dict], bytes] = _thumbnail) -> Dict:
+    """Plain-data report packet for `evs.reports.render_report` (tables + newest evidence per campus).
+
+    Evidence goes in as small JPEGs from `thumbnail` (photo -> bytes; the app passes
+    its cached `PhotoIndex.thumbnail`), so full-size photos never reach the worker.
+    """
+    dims = list(BCI_AREA_NAMES)
+    blocks = []
+    rollup_comps: Dict[str, List[Dict]] = {p: [] for p in chosen}
+    for label, camp in campuses:
+        periods = [p for p in chosen if p in camp["periods"]]
+        comps = {p: compute_period_components(camp, p, maps) for p in periods}
+        for p, c in comps.items():
+            rollup_comps[p].append(c)
+        summaries = {p: summarise_from_components(c, weights) for p, c in comps.items()}
+        bci_rows, op_rows = summary_tables(summaries, chosen, dims)
+        photos = []
+        for area, items in camp["sections"]["bci"]["areas"].items():
+            for it in items:
+                for p in periods:
+                    for ph in it["photos"].get(p, ()):
+                        photos.append({"area": area, "question": it["name"], "period": p,
+                                       "caption": ph["caption"], "photo": ph, "ts": ph["ts"]})
+        photos.sort(key=lambda x: x["ts"], reverse=True)
+        thumbs = photos[:THUMBS_PER_CAMPUS]
+        for th in thumbs:
+            try:
+                th["image"] = thumbnail(th.pop("photo"))
+            except Exception:
+                th["image"] = None  # rendered as "(image unavailable)"
+        blocks.append({"label": label, "bci_table": bci_rows, "op_table": op_rows, "thumbnails": thumbs})
+    rollup = None
+    if with_rollup:
+        summaries = {p: summarise_from_components(aggregate_components(c), weights) for p, c in rollup_comps.items() if c}
+        bci_rows, op_rows = summary_tables(summaries, chosen, dims)
+        rollup = {"label": f"{title} — Roll-Up", "bci_table": bci_rows, "op_table": op_rows}
+    return {
+        "title": f"EVS Monthly Packet — {title}",
+        "subtitle": f"Periods: {', '.join(chosen)} | Generated {time.strftime('%Y-%m-%d %H:%M')} | App {app_version}",
+        "campuses": blocks,
+        "rollup": rollup,
+    }
+
+# =============================================================
+# Worker pool
+# =============================================================
+def make_report_executor(max_workers: int = 2) -> ProcessPoolExecutor:
+    """Spawn-based pool: forking a threaded Streamlit server is not safe."""
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+class ReportQueue:
+    """Per-session view of report jobs running on a (shared) executor."""
+
+    def __init__(self, executor: Executor, keep: int = 8):
+        self._executor = executor
+        self._keep = keep
+        self._jobs: Dict[Hashable, Future] = {}
+
+    def submit(self, key: Hashable, payload: Dict, fmt: str) -> Future:
+        fut = self._jobs.get(key)
+        if fut is not None and not (fut.done() and fut.exception() is not None):
+            return fut
+        fut = self._executor.submit(render_report, payload, fmt)
+        self._jobs[key] = fut
+        # Drop the oldest finished entries once the cache is full.
+        for old in list(self._jobs)[:-self._keep]:
+            if self._jobs[old].done():
+                self._jobs.pop(old, None)
+        return fut
+
+    def status(self, key: Hashable) -> str:
+        fut = self._jobs.get(key)
+        if fut is None:
+            return "missing"
+        if not fut.done():
+            return "running"
+        return "failed" if fut.exception() is not None else "ready"
+
+    def result(self, key: Hashable) -> bytes:
+        return self._jobs[key].result()
+
+    def error(self, key: Hashable) -> BaseException | None:
+        fut = self._jobs.get(key)
+        return fut.exception() if fut is not None and fut.done() else None
+
+# =============================================================
+# Rendering (runs in the worker process)
+# =============================================================
+def render_report(payload: Dict, fmt: str) -> bytes:
+    if fmt == "xlsx":
+        return _render_xlsx(payload)
+    if fmt == "pdf":
+        return _render_pdf(payload)
+    raise ValueError(f"Unknown report format: {fmt}")
+
+def _image_size(data: bytes) -> Tuple[int, int] | None:
+    """(width, height) of a PNG or JPEG without decoding it."""
+    if data[:8] == b"\x89PNG\r\n\x1a\n" and len(data) >= 24:
+        return struct.unpack(">II", data[16:24])
+    if data[:2] == b"\xff\xd8":
+        i = 2
+        while i + 9 < len(data):
+            if data[i] != 0xFF:
+                i += 1
+                continue
+            marker = data[i + 1]
+            if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+                i += 2
+                continue
+            seg_len = struct.unpack(">H", data[i + 2:i + 4])[0]
+            if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+                h, w = struct.unpack(">HH", data[i + 5:i + 9])
+                return w, h
+            i += 2 + seg_len
+    return None
+
+def _thumb_scale(data: bytes) -> Tuple[float, int, int]:
+    size = _image_size(data) or (THUMB_MAX_PX, THUMB_MAX_PX)
+    w, h = size
+    scale = min(1.0, THUMB_MAX_PX / max(w, h, 1))
+    return scale, int(w * scale), int(h * scale)
+
+def _sheet_name(label: str, used: set) -> str:
+    base = "".join("_" if ch in "[]:*?/\\" else ch for ch in label)[:31] or "Sheet"
+    name, n = base, 2
+    while name.lower() in used:
+        suffix = f" ({n})"
+        name = base[:31 - len(suffix)] + suffix
+        n += 1
+    used.add(name.lower())
+    return name
+
+def _table_matrix(rows: List[Dict]) -> Tuple[List[str], List[List]]:
+    if not rows:
+        return [], []
+    cols = list(rows[0].keys())
+    return cols, [[r.get(c, "") for c in cols] for r in rows]
+
+def _render_xlsx(payload: Dict) -> bytes:
+    try:
+        import xlsxwriter
+    except ImportError as e:
+        raise RuntimeError("XLSX reports need the 'xlsxwriter' package.") from e
+
+    buf = io.BytesIO()
+    wb = xlsxwriter.Workbook(buf, {"in_memory": True})
+    title_fmt = wb.add_format({"bold": True, "font_size": 14})
+    head_fmt = wb.add_format({"bold": True, "bg_color": "#DDEBF7", "border": 1})
+    pct_fmt = wb.add_format({"num_format": '0.0"%"', "border": 1})
+    txt_fmt = wb.add_format({"border": 1})
+    used: set = set()
+
+    def write_table(ws, row: int, heading: str, rows: List[Dict]) -> int:
+        ws.write(row, 0, heading, head_fmt)
+        cols, matrix = _table_matrix(rows)
+        row += 1
+        for c, name in enumerate(cols):
+            ws.write(row, c, name, head_fmt)
+        for vals in matrix:
+            row += 1
+            for c, v in enumerate(vals):
+                ws.write(row, c, v, pct_fmt if isinstance(v, (int, float)) else txt_fmt)
+        return row + 2
+
+    def write_block(ws, block: Dict) -> int:
+        ws.set_column(0, 0, 55)
+        ws.set_column(1, 8, 12)
+        ws.write(0, 0, block["label"], title_fmt)
+        row = write_table(ws, 2, "Building Cleanliness Inspection — % by area", block["bci_table"])
+        return write_table(ws, row, "OPERATIONAL MONTHLY ASSESSMENT", block["op_table"])
+
+    if payload.get("rollup"):
+        write_block(wb.add_worksheet(_sheet_name("Roll-Up", used)), payload["rollup"])
+    for camp in payload["campuses"]:
+        ws = wb.add_worksheet(_sheet_name(camp["label"].split(" / ")[-1], used))
+        row = write_block(ws, camp)
+        if camp["thumbnails"]:
+            ws.write(row, 0, "Evidence", head_fmt)
+            row += 1
+            for th in camp["thumbnails"]:
+                ws.write(row, 0, f"[{th['period']}] {th['area']} — {th['question']}", txt_fmt)
+                ws.write(row, 1, th["caption"], txt_fmt)
+                try:
+                    data = th["image"]
+                    scale, _, h = _thumb_scale(data)
+                    ws.set_row(row, max(15, h * 0.75))
+                    ws.insert_image(row, 2, "evidence", {
+                        "image_data": io.BytesIO(data), "x_scale": scale, "y_scale": scale, "object_position": 1,
+                    })
+                except Exception:
+                    ws.write(row, 2, "(image unavailable)", txt_fmt)
+                row += 1
+    wb.close()
+    return buf.getvalue()
+
+def _render_pdf(payload: Dict) -> bytes:
+    try:
+        from reportlab.lib import colors
+        from reportlab.lib.pagesizes import landscape, letter
+        from reportlab.lib.styles import getSampleStyleSheet
+        from reportlab.platypus import Image, PageBreak, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+    except ImportError as e:
+        raise RuntimeError("PDF reports need the 'reportlab' package.") from e
+
+    styles = getSampleStyleSheet()
+    buf = io.BytesIO()
+    doc = SimpleDocTemplate(buf, pagesize=landscape(letter), title=payload["title"])
+    story: List = [Paragraph(payload["title"], styles["Title"]), Paragraph(payload["subtitle"], styles["Normal"])]
+    style = TableStyle([
+        ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#DDEBF7")),
+        ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
+        ("FONTSIZE", (0, 0), (-1, -1), 8),
+        ("VALIGN", (0, 0), (-1, -1), "TOP"),
+    ])
+
+    def table(rows: List[Dict]) -> Table:
+        cols, matrix = _table_matrix(rows)
+        cells = [cols] + [
+            [f"{v:.1f}%" if isinstance(v, (int, float)) else Paragraph(str(v), styles["BodyText"]) for v in vals]
+            for vals in matrix
+        ]
+        widths = [260] + [60] * (len(cols) - 1)
+        return Table(cells, colWidths=widths, style=style, repeatRows=1)
+
+    def block(b: Dict) -> None:
+        story.append(Paragraph(b["label"], styles["Heading2"]))
+        story.append(Paragraph("Building Cleanliness Inspection — % by area", styles["Heading4"]))
+        story.append(table(b["bci_table"]))
+        story.append(Paragraph("OPERATIONAL MONTHLY ASSESSMENT", styles["Heading4"]))
+        story.append(table(b["op_table"]))
+
+    if payload.get("rollup"):
+        block(payload["rollup"])
+    for camp in payload["campuses"]:
+        story.append(PageBreak())
+        block(camp)
+        if camp["thumbnails"]:
+            story.append(Paragraph("Evidence", styles["Heading4"]))
+            cells = []
+            for th in camp["thumbnails"]:
+                text = Paragraph(f"<b>[{th['period']}] {th['area']}</b><br/>{th['question']}<br/><i>{th['caption']}</i>", styles["BodyText"])
+                try:
+                    data = th["image"]
+                    _, w, h = _thumb_scale(data)
+                    img = Image(io.BytesIO(data), width=w * 0.75, height=h * 0.75)
+                except Exception:
+                    img = Paragraph("(image unavailable)", styles["BodyText"])
+                cells.append([img, text])
+            story.append(Table(cells, colWidths=[150, 450], style=style))
+        story.append(Spacer(1, 12))
+    doc.build(story)
+    return buf.getvalue()
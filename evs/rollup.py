@@ -0,0 +1,113 @@
+"""Background precompute of hospital / system roll-ups, shared by all sessions.
+
+A roll-up is the merged response histogram of every campus in a scope, per
+period (see `evs.scoring.merge_histograms`); it does not depend on the response
+maps or weights, so slider changes rescore it instantly. Saves call `refresh`
+for the scopes containing the edited campus, and a worker thread rebuilds them
+from per-campus histograms cached by revision, so only edited campuses are
+re-tallied. Readers call `lookup`, which returns the newest finished result and
+whether it is stale (a refresh is queued or running); it never computes inline.
+
+Results are tagged with the scope's signature, the (path, revision, identity)
+of every campus in it, so a result built before a later save is never mistaken
+for a current one.
+"""
+import threading
+from collections import OrderedDict
+from concurrent.futures import Executor, Future, ThreadPoolExecutor, wait
+from typing import Dict, List, Tuple
+
+from evs.cache import CampusPath, HistogramCache
+from evs.scoring import merge_histograms
+
+Scope = Tuple[str, ...]  # (system,) or (system, hospital)
+Signature = Tuple[Tuple[CampusPath, int, int], ...]
+
+def scope_campuses(doc: Dict, scope: Scope) -> List[Tuple[CampusPath, Dict]]:
+    """(path, campus) for every campus of a system, or of one of its hospitals."""
+    hospitals = doc["systems"][scope[0]]["hospitals"]
+    names = [scope[1]] if len(scope) > 1 else list(hospitals)
+    return [((scope[0], h, c), camp) for h in names if h in hospitals for c, camp in hospitals[h]["campuses"].items()]
+
+def signature(campuses: List[Tuple[CampusPath, Dict]]) -> Signature:
+    return tuple((path, camp.get("revision", 0), id(camp)) for path, camp in campuses)
+
+def scope_histograms(campuses: List[Tuple[CampusPath, Dict]], cache: HistogramCache) -> Dict[str, Dict]:
+    """period -> merged histogram over the campuses that have that period."""
+    by_period: Dict[str, List[Dict]] = {}
+    for path, camp in campuses:
+        for p in list(camp["periods"]):
+            by_period.setdefault(p, []).append(cache.get(path, camp, p))
+    return {p: merge_histograms(hists) for p, hists in by_period.items()}
+
+class RollupService:
+    """Roll-up results per (doc id, scope), refreshed on a shared worker pool."""
+
+    def __init__(self, executor: Executor | None = None, max_workers: int = 2, keep: int = 256, keep_docs: int = 32):
+        self._executor = executor or ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="evs-rollup")
+        self._keep = keep
+        self._keep_docs = keep_docs
+        self._lock = threading.Lock()
+        self._results: "OrderedDict[Tuple[str, Scope], Tuple[Signature, Dict[str, Dict]]]" = OrderedDict()
+        self._pending: Dict[Tuple[str, Scope], Tuple[Signature, Future]] = {}
+        self._caches: "OrderedDict[str, HistogramCache]" = OrderedDict()
+
+    def _cache(self, doc_id: str) -> HistogramCache:
+        with self._lock:
+            cache = self._caches.pop(doc_id, None) or HistogramCache()
+            self._caches[doc_id] = cache
+            while len(self._caches) > self._keep_docs:
+                self._caches.popitem(last=False)
+        return cache
+
+    def _run(self, key: Tuple[str, Scope], sig: Signature, campuses: List[Tuple[CampusPath, Dict]], fut_box: List[Future]) -> None:
+        hists = scope_histograms(campuses, self._cache(key[0]))
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is None or pending[1] is not fut_box[0]:
+                return  # superseded by a later save
+            del self._pending[key]
+            self._results.pop(key, None)
+            self._results[key] = (sig, hists)
+            while len(self._results) > self._keep:
+                self._results.popitem(last=False)
+
+    def refresh(self, doc_id: str, scope: Scope, campuses: List[Tuple[CampusPath, Dict]]) -> Future | None:
+        """Queue a rebuild unless the current result or a queued job already matches the campuses."""
+        key, sig = (doc_id, scope), signature(campuses)
+        with self._lock:
+            done = self._results.get(key)
+            if done is not None and done[0] == sig:
+                return None
+            pending = self._pending.get(key)
+            if pending is not None:
+                if pending[0] == sig and not pending[1].done():
+                    return pending[1]
+                pending[1].cancel()  # a newer save supersedes a job that has not started yet
+            box: List[Future] = []
+            fut = self._executor.submit(self._run, key, sig, list(campuses), box)
+            box.append(fut)
+            self._pending[key] = (sig, fut)
+        return fut
+
+    def lookup(self, doc_id: str, scope: Scope, campuses: List[Tuple[CampusPath, Dict]],
+               wait_s: float = 0.0) -> Tuple[Dict[str, Dict] | None, bool]:
+        """(period -> merged histogram or None, stale). Queues a refresh when stale.
+
+        `wait_s` bounds how long to wait when there is no earlier result to show.
+        """
+        key, sig = (doc_id, scope), signature(campuses)
+        fut = self.refresh(doc_id, scope, campuses)
+        with self._lock:
+            done = self._results.get(key)
+        if done is None and fut is not None and wait_s > 0:
+            wait([fut], timeout=wait_s)
+            with self._lock:
+                done = self._results.get(key)
+        if done is None:
+            return None, True
+        return done[1], done[0] != sig
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._pending)
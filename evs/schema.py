@@ -0,0 +1,261 @@
+"""One-pass schema check and in-place repair for loaded documents.
+
+Run once when a doc enters the app (import, restore) or the batch CLI. After
+`repair_doc` every campus has the full v4 template shape: per-period fields are
+dicts, BCI items have numeric ``points`` and a ``photos`` dict of lists, and
+every photo has ``b64``, ``caption``, ``ts`` and a doc-unique ``id``. Rendering and scoring code can
+therefore index directly instead of guarding each level with ``.get(..., {})``.
+
+The pass touches every row and photo once, repairs in place (the doc is never
+copied) and only allocates when something is actually wrong.
+"""
+from typing import Dict, List, Set, Tuple
+
+from evs.model import (
+    BCI_AREAS, CONTRACTUAL_PIP_ITEMS, DEFAULT_RESPONSE_MAPS, DEFAULT_WEIGHTS, OPERATIONAL_INFO_ITEMS,
+    PERIOD_PLACEHOLDER, SYSTEM_STANDARD_ITEMS, build_evs_template, copy_response_maps, new_doc_id, new_photo_id,
+)
+
+SCHEMA_VERSION = 4
+DOC_LEVEL: Tuple = ()  # report key for problems outside any campus
+META_FIELDS = ("system", "hospital", "campus", "date", "assessed_by", "evs_manager")
+SECTION_SPECS: Dict[str, Tuple[Tuple[str, ...], Tuple[str, ...]]] = {
+    # section -> (template question names, per-period fields)
+    "operational_info": (OPERATIONAL_INFO_ITEMS, ("values", "comments")),
+    "contractual_pip": (CONTRACTUAL_PIP_ITEMS, ("responses", "comments")),
+    "system_standards": (SYSTEM_STANDARD_ITEMS, ("responses", "comments")),
+}
+BCI_FIELDS = ("responses", "comments")
+
+Report = Dict[Tuple, List[str]]
+
+def _per_period(row: Dict, field: str, periods: List[str], where: str, problems: List[str]) -> None:
+    val = row.get(field)
+    if type(val) is dict:
+        return
+    if isinstance(val, list) and len(val) <= len(periods):
+        # Older exports stored one value per period, in period order.
+        row[field] = {p: v for p, v in zip(periods, val) if v not in (None, "")}
+        problems.append(f"{where}: '{field}' was a list; mapped onto periods")
+    else:
+        row[field] = {}
+        if val is None:
+            problems.append(f"{where}: '{field}' missing; added")
+        else:
+            problems.append(f"{where}: '{field}' had type {type(val).__name__}; reset")
+
+def _repair_photos(item: Dict, where: str, problems: List[str], seen_ids: Set[str]) -> None:
+    photos = item.get("photos")
+    if type(photos) is not dict:
+        item["photos"] = {}
+        if photos is None:
+            problems.append(f"{where}: 'photos' missing; added")
+        else:
+            problems.append(f"{where}: 'photos' had type {type(photos).__name__}; reset")
+        return
+    for period, gallery in photos.items():
+        if type(gallery) is not list:
+            photos[period] = []
+            problems.append(f"{where}: photos for {period} were not a list; reset")
+            continue
+        bad = 0
+        for ph in gallery:
+            if type(ph) is not dict or type(ph.get("b64")) is not str:
+                bad += 1
+                continue
+            if type(ph.get("caption")) is not str:
+                ph["caption"] = str(ph.get("caption") or "")
+            if not isinstance(ph.get("ts"), (int, float)):
+                ph["ts"] = 0.0
+            pid = ph.get("id")
+            if type(pid) is not str or pid in seen_ids:
+                if pid is not None:
+                    problems.append(f"{where}: duplicate photo id {pid!r}; reassigned")
+                ph["id"] = pid = new_photo_id()
+            seen_ids.add(pid)
+        if bad:
+            gallery[:] = [ph for ph in gallery if type(ph) is dict and type(ph.get("b64")) is str]
+            problems.append(f"{where}: dropped {bad} photo(s) for {period} without image data")
+
+def _repair_rows(rows, names: Tuple[str, ...], fields: Tuple[str, ...], periods: List[str], where: str,
+                 problems: List[str], bci: bool, seen_ids: Set[str]) -> List[Dict]:
+    """Repair rows in place; returns `rows` itself unless it had to be replaced."""
+    if type(rows) is not list:
+        problems.append(f"{where}: not a list; rebuilt from the template")
+        rows = []
+    dropped = 0
+    for i, row in enumerate(rows):
+        if type(row) is not dict:
+            problems.append(f"{where} Q{i + 1}: not an object; dropped")
+            dropped += 1
+            continue
+        if type(row.get("name")) is not str:
+            row["name"] = names[i] if i < len(names) else str(row.get("name") or f"Question {i + 1}")
+            problems.append(f"{where} Q{i + 1}: missing question text")
+        for field in fields:
+            _per_period(row, field, periods, f"{where} Q{i + 1}", problems)
+        if bci:
+            pts = row.get("points")
+            if type(pts) is not float:
+                try:
+                    row["points"] = float(pts)
+                except (TypeError, ValueError):
+                    row["points"] = 1.0
+                    problems.append(f"{where} Q{i + 1}: invalid points {pts!r}; set to 1.0")
+            _repair_photos(row, f"{where} Q{i + 1}", problems, seen_ids)
+    if dropped:
+        rows = [r for r in rows if type(r) is dict]
+    if len(rows) < len(names):
+        present = {r["name"] for r in rows}
+        missing = [n for n in names if n not in present]
+        for n in missing:
+            row = {"name": n, **{f: {} for f in fields}}
+            if bci:
+                row.update(points=1.0, photos={})
+            rows.append(row)
+        if missing:
+            problems.append(f"{where}: added {len(missing)} missing template question(s)")
+    return rows
+
+def _labels_in(sections) -> List[str]:
+    """Period labels keying any per-period field or photo gallery, in first-seen order."""
+    rows: List = []
+    if type(sections) is dict:
+        for section in SECTION_SPECS:
+            if type(sections.get(section)) is list:
+                rows.extend(sections[section])
+        areas = sections.get("bci", {}).get("areas") if type(sections.get("bci")) is dict else None
+        if type(areas) is dict:
+            rows.extend(r for items in areas.values() if type(items) is list for r in items)
+    seen: Dict[str, None] = {}
+    for row in rows:
+        if type(row) is dict:
+            for field in ("values", "responses", "comments", "photos"):
+                if type(row.get(field)) is dict:
+                    seen.update(dict.fromkeys(row[field]))
+    return [p for p in seen if p != PERIOD_PLACEHOLDER]
+
+def repair_campus(campus: Dict, path: Tuple[str, str, str], seen_ids: Set[str] | None = None) -> List[str]:
+    """Bring one campus up to the v4 template in place; returns what was wrong.
+
+    `seen_ids` collects photo ids across campuses so duplicates are reassigned.
+    """
+    problems: List[str] = []
+    seen_ids = set() if seen_ids is None else seen_ids
+    meta = campus.get("meta")
+    if type(meta) is not dict:
+        campus["meta"] = meta = {}
+        problems.append("meta: missing; rebuilt")
+    for field, expected in zip(META_FIELDS, (*path, "", "", "")):
+        if type(meta.get(field)) is not str:
+            meta[field] = expected
+    periods = campus.get("periods")
+    if type(periods) is not list:
+        # Rebuilt from the labels the data is saved under, so none of it drops out of the selector or scoring.
+        campus["periods"] = periods = _labels_in(campus.get("sections"))
+        problems.append(f"periods: not a list; rebuilt from the saved data ({len(periods)} found)")
+    clean = list(dict.fromkeys(str(p) for p in periods if p not in (None, "")))
+    if clean != periods:
+        periods[:] = clean
+        problems.append("periods: removed blank or duplicate labels")
+    if type(campus.get("revision")) is not int:
+        campus["revision"] = 0
+
+    sections = campus.get("sections")
+    if type(sections) is not dict:
+        problems.append("sections: missing; rebuilt from the template")
+        campus["sections"] = build_evs_template()["sections"]
+        return problems
+    for section, (names, fields) in SECTION_SPECS.items():
+        rows = sections.get(section)
+        fixed = _repair_rows(rows, names, fields, periods, section, problems, bci=False, seen_ids=seen_ids)
+        if fixed is not rows:
+            sections[section] = fixed
+    bci = sections.get("bci")
+    if type(bci) is not dict or type(bci.get("areas")) is not dict:
+        problems.append("bci: missing areas; rebuilt from the template")
+        sections["bci"] = build_evs_template()["sections"]["bci"]
+        return problems
+    areas = bci["areas"]
+    for area, questions in BCI_AREAS.items():
+        items = areas.get(area)
+        if items is None:
+            problems.append(f"bci: area '{area}' missing; added from the template")
+        fixed = _repair_rows(items or [], questions, BCI_FIELDS, periods, area, problems, bci=True, seen_ids=seen_ids)
+        if fixed is not items:
+            areas[area] = fixed
+    for area in [a for a in areas if a not in BCI_AREAS]:
+        # Custom areas are kept (they still score), but their rows get the same repairs.
+        problems.append(f"bci: area '{area}' is not in the template; kept")
+        fixed = _repair_rows(areas[area], (), BCI_FIELDS, periods, area, problems, bci=True, seen_ids=seen_ids)
+        if fixed is not areas[area]:
+            areas[area] = fixed
+    return problems
+
+def repair_doc(doc: Dict) -> Report:
+    """Validate and repair a v4 doc in place.
+
+    Returns problems keyed by campus path (system, hospital, campus); doc-level
+    problems are under `DOC_LEVEL`. An empty report means the doc was clean.
+    """
+    report: Report = {}
+    top: List[str] = []
+    seen_ids: Set[str] = set()
+    if doc.get("version") != SCHEMA_VERSION:
+        top.append(f"version {doc.get('version')!r} treated as {SCHEMA_VERSION}")
+        doc["version"] = SCHEMA_VERSION
+    if type(doc.get("doc_id")) is not str:
+        doc["doc_id"] = new_doc_id()
+    if type(doc.get("revision")) is not int:
+        doc["revision"] = 0
+    weights = doc.get("weights")
+    if type(weights) is not dict:
+        doc["weights"] = weights = DEFAULT_WEIGHTS.copy()
+        top.append("weights: missing; defaults used")
+    for k, v in DEFAULT_WEIGHTS.items():
+        if not isinstance(weights.get(k), (int, float)):
+            weights[k] = v
+            top.append(f"weights: '{k}' missing; default used")
+    maps = doc.get("response_maps")
+    if type(maps) is not dict:
+        doc["response_maps"] = maps = copy_response_maps()
+        top.append("response_maps: missing; defaults used")
+    for section, default in DEFAULT_RESPONSE_MAPS.items():
+        if type(maps.get(section)) is not dict:
+            maps[section] = dict(default)
+            top.append(f"response_maps: '{section}' missing; defaults used")
+
+    systems = doc.get("systems")
+    if type(systems) is not dict:
+        doc["systems"] = systems = {}
+        top.append("systems: not an object; reset")
+    for sys_name, sysobj in list(systems.items()):
+        if type(sysobj) is not dict or type(sysobj.get("hospitals")) is not dict:
+            systems[sys_name] = sysobj = {"hospitals": {}}
+            top.append(f"system '{sys_name}': no hospitals; reset")
+        for hosp_name, hospobj in list(sysobj["hospitals"].items()):
+            if type(hospobj) is not dict or type(hospobj.get("campuses")) is not dict:
+                sysobj["hospitals"][hosp_name] = hospobj = {"campuses": {}}
+                top.append(f"hospital '{sys_name} / {hosp_name}': no campuses; reset")
+            for camp_name, camp in list(hospobj["campuses"].items()):
+                path = (sys_name, hosp_name, camp_name)
+                if type(camp) is not dict:
+                    hospobj["campuses"][camp_name] = camp = build_evs_template()
+                    camp["meta"].update({"system": sys_name, "hospital": hosp_name, "campus": camp_name})
+                    report[path] = ["campus: not an object; rebuilt from the template"]
+                    continue
+                problems = repair_campus(camp, path, seen_ids)
+                if problems:
+                    report[path] = problems
+    if top:
+        report[DOC_LEVEL] = top
+    return report
+
+def format_report(report: Report, limit: int = 5) -> List[str]:
+    """One line per campus (or the doc), with at most `limit` problems spelled out."""
+    lines = []
+    for path, problems in report.items():
+        where = " / ".join(path) if path else "Document"
+        more = f" (+{len(problems) - limit} more)" if len(problems) > limit else ""
+        lines.append(f"{where}: " + "; ".join(problems[:limit]) + more)
+    return lines
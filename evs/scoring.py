@@ -0,0 +1,175 @@
+"""Scoring: per-period (score, denominator) components, roll-ups and summary tables."""
+from typing import Dict, List, Tuple
+
+def score_section_responses(rows: List[Dict], period: str, resp_map: Dict[str, float | None]) -> Tuple[float, float]:
+    score = 0.0
+    denom = 0.0
+    for r in rows:
+        resp = r["responses"].get(period)
+        mult = resp_map.get(resp, None) if resp is not None else None
+        if mult is None:
+            continue
+        score += 1.0 * float(mult)
+        denom += 1.0
+    return score, denom
+
+def score_bci_area(items: List[Dict], period: str, resp_map: Dict[str, float | None]) -> Tuple[float, float]:
+    score = 0.0
+    denom = 0.0
+    for it in items:
+        pts = it["points"] or 1.0
+        resp = it["responses"].get(period)
+        mult = resp_map.get(resp, None) if resp is not None else None
+        if mult is None:
+            continue
+        score += pts * float(mult)
+        denom += pts
+    return score, denom
+
+def compute_period_components(campus: Dict, period: str, maps: Dict[str, Dict]) -> Dict:
+    areas = campus["sections"]["bci"]["areas"]
+    bci_by_dim: Dict[str, Tuple[float, float]] = {}
+    bci_total_s = 0.0
+    bci_total_d = 0.0
+    for area, items in areas.items():
+        s, d = score_bci_area(items, period, maps["bci"])
+        bci_by_dim[area] = (s, d)
+        bci_total_s += s
+        bci_total_d += d
+    pip_s, pip_d = score_section_responses(campus["sections"]["contractual_pip"], period, maps["contractual_pip"])
+    sys_s, sys_d = score_section_responses(campus["sections"]["system_standards"], period, maps["system_standards"])
+    return {"bci_by_dimension": bci_by_dim, "bci_total": (bci_total_s, bci_total_d), "pip": (pip_s, pip_d), "sys": (sys_s, sys_d)}
+
+# ---- Response histograms: tally once, rescore under any response map ----
+def _tally(rows: List[Dict], period: str, points: bool) -> Dict[str, float]:
+    out: Dict[str, float] = {}
+    for r in rows:
+        resp = r["responses"].get(period)
+        if resp is None:
+            continue
+        pts = (r["points"] or 1.0) if points else 1.0
+        out[resp] = out.get(resp, 0.0) + pts
+    return out
+
+def response_histogram(campus: Dict, period: str) -> Dict:
+    """Points (BCI) or counts (PIP / System Standards) per response label for one period.
+
+    Unlike components, a histogram does not depend on the response maps, so it
+    can be cached per campus revision and rescored by `components_from_histogram`.
+    """
+    return {
+        "bci_by_dimension": {area: _tally(items, period, True) for area, items in campus["sections"]["bci"]["areas"].items()},
+        "pip": _tally(campus["sections"]["contractual_pip"], period, False),
+        "sys": _tally(campus["sections"]["system_standards"], period, False),
+    }
+
+def failed_items(campus: Dict, period: str, fail_label: str = "Fail") -> List[Tuple[str, int]]:
+    """(area, item index) of every BCI item answered `fail_label` in the period."""
+    return [
+        (area, i)
+        for area, items in campus["sections"]["bci"]["areas"].items()
+        for i, it in enumerate(items)
+        if it["responses"].get(period) == fail_label
+    ]
+
+def _score_tally(tally: Dict[str, float], resp_map: Dict[str, float | None]) -> Tuple[float, float]:
+    score = 0.0
+    denom = 0.0
+    for resp, pts in tally.items():
+        mult = resp_map.get(resp, None)
+        if mult is None:
+            continue
+        score += pts * float(mult)
+        denom += pts
+    return score, denom
+
+def components_from_histogram(hist: Dict, maps: Dict[str, Dict]) -> Dict:
+    """Same result as `compute_period_components`, in O(areas × labels) instead of O(items)."""
+    bci_by_dim = {area: _score_tally(t, maps["bci"]) for area, t in hist["bci_by_dimension"].items()}
+    return {
+        "bci_by_dimension": bci_by_dim,
+        "bci_total": (sum(s for s, _ in bci_by_dim.values()), sum(d for _, d in bci_by_dim.values())),
+        "pip": _score_tally(hist["pip"], maps["contractual_pip"]),
+        "sys": _score_tally(hist["sys"], maps["system_standards"]),
+    }
+
+def merge_histograms(hists: List[Dict]) -> Dict:
+    """Sum label tallies across campuses; scoring the merge equals aggregating the components."""
+    out: Dict = {"bci_by_dimension": {}, "pip": {}, "sys": {}}
+    for h in hists:
+        for area, tally in h["bci_by_dimension"].items():
+            dst = out["bci_by_dimension"].setdefault(area, {})
+            for resp, pts in tally.items():
+                dst[resp] = dst.get(resp, 0.0) + pts
+        for key in ("pip", "sys"):
+            dst = out[key]
+            for resp, n in h[key].items():
+                dst[resp] = dst.get(resp, 0.0) + n
+    return out
+
+def summarise_from_components(comp: Dict, weights: Dict[str, float]) -> Dict:
+    bci_pct_by_dim = {a: (s / d * 100 if d else 0.0) for a, (s, d) in comp["bci_by_dimension"].items()}
+    bs, bd = comp["bci_total"]
+    bci_overall = (bs / bd * 100) if bd else 0.0
+    ps, pd = comp["pip"]
+    pip_pct = (ps / pd * 100) if pd else 0.0
+    ss, sd = comp["sys"]
+    sys_pct = (ss / sd * 100) if sd else 0.0
+    weighted = pip_pct * weights["financial_pip"] + sys_pct * weights["system_standards"] + bci_overall * weights["bci"]
+    return {
+        "bci_by_dimension": {k: round(v, 1) for k, v in bci_pct_by_dim.items()},
+        "bci_overall": round(bci_overall, 1),
+        "operational": {
+            "financial_pip": round(pip_pct, 1),
+            "system_standards": round(sys_pct, 1),
+            "bci": round(bci_overall, 1),
+            "weighted": round(weighted, 1),
+        },
+    }
+
+def aggregate_components(components: List[Dict]) -> Dict:
+    agg = {"bci_by_dimension": {}, "bci_total": (0.0, 0.0), "pip": (0.0, 0.0), "sys": (0.0, 0.0)}
+    for comp in components:
+        for area, (s, d) in comp["bci_by_dimension"].items():
+            ss, dd = agg["bci_by_dimension"].get(area, (0.0, 0.0))
+            agg["bci_by_dimension"][area] = (ss + s, dd + d)
+        bs, bd = agg["bci_total"]
+        cs, cd = comp["bci_total"]
+        agg["bci_total"] = (bs + cs, bd + cd)
+        ps, pd = agg["pip"]
+        ps2, pd2 = comp["pip"]
+        agg["pip"] = (ps + ps2, pd + pd2)
+        ss, sd = agg["sys"]
+        ss2, sd2 = comp["sys"]
+        agg["sys"] = (ss + ss2, sd + sd2)
+    return agg
+
+OP_LABELS: List[Tuple[str, str]] = [
+    ("Contractual Financial and PIP Results (30% of Total)", "financial_pip"),
+    ("System Standards (10% of Total)", "system_standards"),
+    ("Building Cleanliness Inspection (60% of Total)", "bci"),
+    ("Weighted % Compliant", "weighted"),
+]
+
+def summary_tables(summaries: Dict[str, Dict], chosen: List[str], dims: List[str]) -> Tuple[List[Dict], List[Dict]]:
+    """Row dicts for the BCI-by-area and OPERATIONAL MONTHLY ASSESSMENT tables (with Δ when ≥2 periods)."""
+    bci_rows = []
+    for d in dims:
+        row = {"Area": d}
+        for p in chosen:
+            row[p] = summaries.get(p, {}).get("bci_by_dimension", {}).get(d, 0.0)
+        bci_rows.append(row)
+    overall_row = {"Area": "% Compliant"}
+    for p in chosen:
+        overall_row[p] = summaries.get(p, {}).get("bci_overall", 0.0)
+    bci_rows.append(overall_row)
+    op_rows = []
+    for text, key in OP_LABELS:
+        r = {"Category": text}
+        for p in chosen:
+            r[p] = summaries.get(p, {}).get("operational", {}).get(key, 0.0)
+        op_rows.append(r)
+    if len(chosen) >= 2:
+        for r in bci_rows + op_rows:
+            r["Δ"] = round(r[chosen[-1]] - r[chosen[-2]], 1)
+    return bci_rows, op_rows
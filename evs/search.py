@@ -0,0 +1,160 @@
+"""Full-text search over comments, photo captions and question text (SQLite FTS5).
+
+Each searchable string is one row in ``entries`` (location columns, B-tree
+indexed) mirrored by rowid into the ``entries_fts`` FTS5 table. Comments and
+captions are rows of their period; each question's text is one row of its
+campus (period ``""``), however many findings it has. Save handlers call
+`SearchIndex.reindex` for the campus/period they touched, which replaces only
+those rows.
+"""
+import re
+import sqlite3
+import threading
+from typing import Dict, List, Tuple
+
+from evs.model import iter_campuses
+
+CampusPath = Tuple[str, str, str]
+SECTION_LABELS = {
+    "operational_info": "Operational Info",
+    "contractual_pip": "Contractual & PIP",
+    "system_standards": "System Standards",
+    "bci": "BCI",
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    system TEXT, hospital TEXT, campus TEXT, period TEXT,
+    section TEXT, area TEXT, idx INTEGER, kind TEXT, photo TEXT, question TEXT
+);
+CREATE INDEX IF NOT EXISTS entries_loc ON entries (system, hospital, campus, period);
+CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5(text, question, tokenize = 'porter unicode61');
+"""
+
+def _fts_query(text: str) -> str:
+    """User text -> safe FTS5 query: every word required, the last one as a prefix."""
+    words = re.findall(r"\w+", text, flags=re.UNICODE)
+    if not words:
+        return ""
+    terms = [f'"{w}"' for w in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+def _campus_rows(path: CampusPath, campus: Dict, period: str | None) -> List[Tuple]:
+    """(location..., text, question) for every non-empty finding in the campus (optionally one period).
+
+    Without a period, also one "question" row (text "") per question of the campus.
+    """
+    out = []
+
+    def periods_of(d: Dict) -> List[str]:
+        return [period] if period is not None else list(d)
+
+    sections = campus["sections"]
+    for section in ("operational_info", "contractual_pip", "system_standards"):
+        for i, r in enumerate(sections[section]):
+            if period is None:
+                out.append((*path, "", section, "", i, "question", "", "", r["name"]))
+            comments = r["comments"]
+            for p in periods_of(comments):
+                text = comments.get(p)
+                if text and isinstance(text, str):
+                    out.append((*path, p, section, "", i, "comment", "", text, r["name"]))
+    for area, items in sections["bci"]["areas"].items():
+        for i, it in enumerate(items):
+            if period is None:
+                out.append((*path, "", "bci", area, i, "question", "", "", it["name"]))
+            comments = it["comments"]
+            for p in periods_of(comments):
+                text = comments.get(p)
+                if text and isinstance(text, str):
+                    out.append((*path, p, "bci", area, i, "comment", "", text, it["name"]))
+            photos = it["photos"]
+            for p in periods_of(photos):
+                for ph in photos.get(p, ()):
+                    if ph["caption"]:
+                        out.append((*path, p, "bci", area, i, "caption", ph["id"], ph["caption"], it["name"]))
+    return out
+
+class SearchIndex:
+    """In-process FTS5 index; safe to share across Streamlit rerun threads."""
+
+    def __init__(self, path: str = ":memory:"):
+        self._lock = threading.Lock()
+        self._con = sqlite3.connect(path, check_same_thread=False)
+        self._con.executescript(_SCHEMA)
+
+    @classmethod
+    def from_doc(cls, doc: Dict, path: str = ":memory:") -> "SearchIndex":
+        idx = cls(path)
+        rows = []
+        for sys_name, hosp, camp, campus in iter_campuses(doc):
+            rows.extend(_campus_rows((sys_name, hosp, camp), campus, None))
+        idx._insert(rows)
+        return idx
+
+    def _insert(self, rows: List[Tuple]) -> None:
+        with self._lock, self._con:
+            for r in rows:
+                cur = self._con.execute(
+                    "INSERT INTO entries (system, hospital, campus, period, section, area, idx, kind, photo, question)"
+                    " VALUES (?,?,?,?,?,?,?,?,?,?)",
+                    (*r[:9], r[10]),
+                )
+                # Question text is indexed only on the question's own row, not again on each finding.
+                self._con.execute("INSERT INTO entries_fts (rowid, text, question) VALUES (?,?,?)",
+                                  (cur.lastrowid, r[9], r[10] if r[7] == "question" else ""))
+
+    def reindex(self, path: CampusPath, campus: Dict, period: str | None = None) -> None:
+        """Replace the rows for one campus (or one campus period, leaving its question rows) after a save."""
+        where = "system = ? AND hospital = ? AND campus = ?" + (" AND period = ?" if period is not None else "")
+        args = (*path, period) if period is not None else path
+        with self._lock, self._con:
+            ids = [r[0] for r in self._con.execute(f"SELECT id FROM entries WHERE {where}", args)]
+            self._con.executemany("DELETE FROM entries_fts WHERE rowid = ?", [(i,) for i in ids])
+            self._con.execute(f"DELETE FROM entries WHERE {where}", args)
+        self._insert(_campus_rows(path, campus, period))
+
+    def drop_campus(self, path: CampusPath) -> None:
+        with self._lock, self._con:
+            ids = [r[0] for r in self._con.execute("SELECT id FROM entries WHERE system = ? AND hospital = ? AND campus = ?", path)]
+            self._con.executemany("DELETE FROM entries_fts WHERE rowid = ?", [(i,) for i in ids])
+            self._con.execute("DELETE FROM entries WHERE system = ? AND hospital = ? AND campus = ?", path)
+
+    def search(self, text: str, system: str | None = None, hospital: str | None = None, campus: str | None = None,
+               period: str | None = None, area: str | None = None, include_questions: bool = False, limit: int = 200) -> List[Dict]:
+        """Ranked matches with a highlighted snippet; `None` filters mean "any".
+
+        Question hits (`include_questions`) have period "" and pass any period filter.
+        """
+        q = _fts_query(text)
+        if not q:
+            return []
+        match = q if include_questions else f"text : ({q})"
+        sql = [
+            "SELECT e.system, e.hospital, e.campus, e.period, e.section, e.area, e.idx, e.kind, e.photo,",
+            " snippet(entries_fts, -1, '**', '**', '…', 12), e.question",
+            " FROM entries_fts f JOIN entries e ON e.id = f.rowid WHERE entries_fts MATCH ?",
+        ]
+        args: List = [match]
+        for col, val in (("system", system), ("hospital", hospital), ("campus", campus), ("area", area)):
+            if val is not None:
+                sql.append(f" AND e.{col} = ?")
+                args.append(val)
+        if period is not None:
+            sql.append(" AND (e.period = ? OR e.kind = 'question')")
+            args.append(period)
+        sql.append(" ORDER BY bm25(entries_fts) LIMIT ?")
+        args.append(limit)
+        with self._lock:
+            rows = self._con.execute("".join(sql), args).fetchall()
+        return [
+            {"system": r[0], "hospital": r[1], "campus": r[2], "period": r[3], "section": r[4], "area": r[5],
+             "idx": r[6], "kind": r[7], "photo": r[8], "snippet": r[9], "question": r[10]}
+            for r in rows
+        ]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._con.execute("SELECT count(*) FROM entries").fetchone()[0]
@@ -0,0 +1,151 @@
+"""Scope-aware garbage collection for per-campus / per-period session state.
+
+Widget and panel keys in the entry tabs embed the (system, hospital, campus,
+period) being edited, so every scope a user browses leaves its own set of keys
+behind: editor deltas, open evidence panels, camera snapshots and upload
+buffers. `SessionGC` records which keys belong to which scope (the app claims
+them as it builds them), keeps scopes in least-recently-used order and, on each
+run, deletes the state of inactive scopes once the session is over its memory
+budget or holds more than `keep_scopes` scopes. The current scope is never
+evicted, so nothing on screen loses its value.
+
+Sizes are estimates (`sizeof` walks containers and counts byte buffers and
+DataFrames by their payload); they are meant for budgeting, not accounting.
+"""
+import io
+import sys
+from collections import OrderedDict
+from typing import Dict, Iterable, List, MutableMapping, Set, Tuple
+
+Scope = Tuple[str, str, str, str]  # (system, hospital, campus, period)
+
+DEFAULT_BUDGET_MB = 64
+DEFAULT_KEEP_SCOPES = 8
+
+def sizeof(obj, _seen: Set[int] | None = None) -> int:
+    """Approximate deep size of `obj` in bytes; shared objects are counted once."""
+    seen = set() if _seen is None else _seen
+    total = 0
+    stack = [obj]
+    while stack:
+        o = stack.pop()
+        if id(o) in seen:
+            continue
+        seen.add(id(o))
+        if isinstance(o, (str, bytes, bytearray, int, float, bool)) or o is None:
+            total += sys.getsizeof(o)
+        elif isinstance(o, io.BytesIO):  # includes uploaded files and camera snapshots
+            # CPython's getsizeof already counts a buffer the BytesIO owns, but not one it shares.
+            total += max(sys.getsizeof(o), o.getbuffer().nbytes)
+        elif isinstance(o, dict):
+            total += sys.getsizeof(o)
+            stack.extend(o.keys())
+            stack.extend(o.values())
+        elif isinstance(o, (list, tuple, set, frozenset)):
+            total += sys.getsizeof(o)
+            stack.extend(o)
+        elif hasattr(o, "memory_usage") and hasattr(o, "columns"):  # pandas DataFrame
+            total += int(o.memory_usage(deep=True).sum())
+        elif hasattr(o, "__dict__"):
+            total += sys.getsizeof(o)
+            stack.append(vars(o))
+        else:
+            total += sys.getsizeof(o)
+    return total
+
+def scope_suffix(scope: Scope) -> str:
+    return "_".join(str(p) for p in scope)
+
+class SessionGC:
+    """Key -> scope bookkeeping and least-recently-used eviction of inactive scopes."""
+
+    def __init__(self, budget_bytes: int = DEFAULT_BUDGET_MB * 1024 * 1024, keep_scopes: int = DEFAULT_KEEP_SCOPES):
+        self.budget_bytes = budget_bytes
+        self.keep_scopes = keep_scopes
+        self._scopes: "OrderedDict[Scope, Set[str]]" = OrderedDict()  # oldest first
+        self._owner: Dict[str, Scope] = {}
+        self._sizes: Dict[Scope, int] = {}   # bytes at the last collection
+        self.evicted = 0                     # keys deleted over the session
+
+    @property
+    def active(self) -> Scope | None:
+        return next(reversed(self._scopes), None)
+
+    def enter(self, scope: Scope) -> None:
+        """Mark `scope` as the one being shown (most recently used)."""
+        self._scopes.setdefault(scope, set())
+        self._scopes.move_to_end(scope)
+
+    def key(self, name: str, *parts) -> str:
+        """``{name}_{parts…}_{system}_{hospital}_{campus}_{period}`` for the active scope, claimed for it."""
+        scope = self.active
+        return self.claim("_".join(str(p) for p in (name, *parts, scope_suffix(scope))))
+
+    def claim(self, key: str, scope: Scope | None = None) -> str:
+        """Attribute `key` to `scope` (default: the active one); returns `key`."""
+        scope = scope or self.active
+        prev = self._owner.get(key)
+        if prev != scope:
+            if prev is not None:
+                self._scopes[prev].discard(key)
+            self._owner[key] = scope
+            self._scopes.setdefault(scope, set()).add(key)
+        return key
+
+    def _drop(self, state: MutableMapping, scope: Scope) -> List[str]:
+        gone = []
+        for k in self._scopes.pop(scope, ()):
+            self._owner.pop(k, None)
+            if k in state:
+                del state[k]
+                gone.append(k)
+        self._sizes.pop(scope, None)
+        self.evicted += len(gone)
+        return gone
+
+    def collect(self, state: MutableMapping) -> List[str]:
+        """Delete the state of inactive scopes (oldest first) until within budget; returns deleted keys."""
+        active = self.active
+        for scope, keys in self._scopes.items():
+            self._sizes[scope] = sum(sizeof(state[k]) for k in keys if k in state)
+        total = sum(self._sizes.values())
+        gone: List[str] = []
+        for scope in list(self._scopes):
+            if scope == active:
+                continue
+            if total <= self.budget_bytes and len(self._scopes) <= self.keep_scopes:
+                break
+            total -= self._sizes.get(scope, 0)
+            gone.extend(self._drop(state, scope))
+        return gone
+
+    def forget(self, state: MutableMapping, keep_active: bool = True) -> List[str]:
+        """Drop every tracked scope (e.g. when the document is replaced)."""
+        gone: List[str] = []
+        for scope in list(self._scopes):
+            if not (keep_active and scope == self.active):
+                gone.extend(self._drop(state, scope))
+        return gone
+
+    def usage(self, state: MutableMapping, groups: Dict[str, Iterable[str]] | None = None) -> Dict:
+        """Estimated session memory: scoped state per scope, named key groups, and everything else."""
+        scoped = {" / ".join(s): self._sizes.get(s, 0) for s in reversed(self._scopes)}  # newest first
+        named: Dict[str, int] = {}
+        grouped = set(self._owner)
+        seen: Set[int] = set()
+        for label, keys in (groups or {}).items():
+            keys = [k for k in keys if k in state]
+            grouped.update(keys)
+            named[label] = sum(sizeof(state[k], seen) for k in keys)
+        other = sum(sizeof(state[k], seen) for k in list(state.keys()) if k not in grouped)
+        return {
+            "scoped": scoped,
+            "groups": named,
+            "other": other,
+            "total": sum(scoped.values()) + sum(named.values()) + other,
+            "keys": len(state),
+            "evicted": self.evicted,
+        }
+
+    def __len__(self) -> int:
+        return len(self._scopes)
@@ -0,0 +1,85 @@
+"""What-if scoring: alternative weights / response maps over cached histograms.
+
+A scenario is ``{"name", "weights", "response_maps"}`` — the same shape as the
+doc's own settings. Scenarios never touch the doc; they rescore response
+histograms (see `evs.scoring.response_histogram`), so nothing rescans items.
+"""
+from typing import Dict, List, Tuple
+
+from evs.scoring import components_from_histogram
+
+WEIGHT_LABELS: List[Tuple[str, str]] = [
+    ("financial_pip", "Weight: Contractual & PIP"),
+    ("system_standards", "Weight: System Standards"),
+    ("bci", "Weight: BCI"),
+]
+MAP_LABELS: Dict[str, str] = {"contractual_pip": "PIP", "system_standards": "Sys Std", "bci": "BCI"}
+
+def scenario_from_doc(doc: Dict, name: str = "Current") -> Dict:
+    return {
+        "name": name,
+        "weights": dict(doc["weights"]),
+        "response_maps": {k: dict(v) for k, v in doc["response_maps"].items()},
+    }
+
+def scenario_parameters(scenario: Dict) -> List[Tuple[str, str, str, float]]:
+    """Editable knobs as (group, key, label, value); excluded (None) responses stay excluded."""
+    params = [("weights", k, label, float(scenario["weights"][k])) for k, label in WEIGHT_LABELS]
+    for section, short in MAP_LABELS.items():
+        for resp, mult in scenario["response_maps"][section].items():
+            if mult is not None:
+                params.append((section, resp, f"{short}: {resp}", float(mult)))
+    return params
+
+def scenario_with(base: Dict, name: str, values: Dict[Tuple[str, str], float]) -> Dict:
+    """Copy of `base` with (group, key) -> value overrides from `scenario_parameters`."""
+    out = scenario_from_doc({"weights": base["weights"], "response_maps": base["response_maps"]}, name)
+    for (group, key), val in values.items():
+        if group == "weights":
+            out["weights"][key] = float(val)
+        else:
+            out["response_maps"][group][key] = float(val)
+    return out
+
+def section_percentages(hist: Dict, maps: Dict[str, Dict]) -> Dict[str, float]:
+    """Unrounded PIP / System Standards / BCI percentages for one histogram."""
+    comp = components_from_histogram(hist, maps)
+    def pct(sd: Tuple[float, float]) -> float:
+        return sd[0] / sd[1] * 100 if sd[1] else 0.0
+    return {"financial_pip": pct(comp["pip"]), "system_standards": pct(comp["sys"]), "bci": pct(comp["bci_total"])}
+
+def weighted_score(pcts: Dict[str, float], weights: Dict[str, float]) -> float:
+    return sum(pcts[k] * weights[k] for k, _ in WEIGHT_LABELS)
+
+def whatif_table(entries: List[Tuple[str, Dict]], scenarios: List[Dict]) -> List[Dict]:
+    """One row per (label, histogram) entry with each scenario's weighted % side by side.
+
+    Section percentages are computed once per distinct response-map set, so
+    scenarios that only change weights cost three multiplications per entry.
+    """
+    by_maps: Dict[str, List[Dict[str, float]]] = {}
+    rows = [{"Scope": label} for label, _ in entries]
+    first = scenarios[0]["name"] if scenarios else None
+    for sc in scenarios:
+        maps_key = repr(sorted((k, sorted(v.items())) for k, v in sc["response_maps"].items()))
+        if maps_key not in by_maps:
+            by_maps[maps_key] = [section_percentages(h, sc["response_maps"]) for _, h in entries]
+        for row, pcts in zip(rows, by_maps[maps_key]):
+            row[sc["name"]] = round(weighted_score(pcts, sc["weights"]), 1)
+            if sc["name"] != first:
+                row[f"Δ {sc['name']}"] = round(row[sc["name"]] - row[first], 1)
+    return rows
+
+def scenario_breakdown(hist: Dict, scenarios: List[Dict]) -> List[Dict]:
+    """Section-level percentages per scenario for a single (e.g. system-wide) histogram."""
+    out = []
+    for sc in scenarios:
+        pcts = section_percentages(hist, sc["response_maps"])
+        out.append({
+            "Scenario": sc["name"],
+            "Contractual & PIP %": round(pcts["financial_pip"], 1),
+            "System Standards %": round(pcts["system_standards"], 1),
+            "BCI %": round(pcts["bci"], 1),
+            "Weighted %": round(weighted_score(pcts, sc["weights"]), 1),
+        })
+    return out
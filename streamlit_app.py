@@ -1,404 +1,225 @@
+import time
+_RUN_T0 = time.perf_counter()  # first statement, so the timing includes imports on a cold start
+
 import streamlit as st
-import pandas as pd
 import json
+from collections import deque
+from functools import partial
 from typing import Dict, List, Tuple
-import base64
-import time
+import os
+import statistics
+
+from evs.analytics import EXAMPLE_QUERIES, TABLES, AnalyticsStore
+from evs.cache import FrameCache, HistogramCache
+from evs.codec import DOC_FORMATS, dump_document, dump_json, load_document
+from evs.eventlog import FIELD_EVENTS, OP_LABELS, EventLog, held_cells, list_logged_docs, restore_latest
+from evs.hierarchy import HierarchyIndex
+from evs.merge import doc_delta, is_delta, merge_delta
+from evs.model import (
+    BCI_AREA_NAMES, PERIOD_PLACEHOLDER, bump_revision, bytes_to_b64, ensure_bci_item_photos, ensure_campus, ensure_hospital, ensure_system,
+    migrate_old_doc, new_doc_id, new_photo_id,
+)
+from evs.photos import PhotoIndex
+from evs.rankings import RankingIndex
+from evs.reports import REPORT_FORMATS, ReportQueue, build_report_payload, make_report_executor
+from evs.rollup import RollupService, scope_campuses
+from evs.scoring import (
+    components_from_histogram, compute_period_components, score_bci_area, score_section_responses,
+    merge_histograms, summarise_from_components, summary_tables,
+)
+from evs.schema import format_report, repair_doc
+from evs.search import SECTION_LABELS, SearchIndex
+from evs.session import DEFAULT_BUDGET_MB, SessionGC
+from evs.whatif import scenario_breakdown, scenario_from_doc, scenario_parameters, scenario_with, whatif_table
 
 # ---------------------- App meta ----------------------
 st.set_page_config(page_title="EVS Ops Assessment", layout="wide")
 st.title("EVS Inspection & Operational Assessment — Multi-Hospital")
 APP_VERSION = "v4.9.0"
 st.caption("Create Systems → Hospitals → Campuses, collect inspections by month, attach photos per BCI item (per-area save), and roll up metrics by campus, hospital, or system.")
-PERIOD_PLACEHOLDER = "(create new)"
 
-# =============================================================
-# Constants and Templates
-# =============================================================
-DEFAULT_WEIGHTS: Dict[str, float] = {
-    "financial_pip": 0.30,
-    "system_standards": 0.10,
-    "bci": 0.60,
-}
-
-# NOTE: None means "exclude from denominator"
-DEFAULT_RESPONSE_MAPS: Dict[str, Dict[str, float | None]] = {
-    "contractual_pip": {"Yes": 1.0, "Partial": 0.25, "No": 0.0, "N/A": None},
-    "system_standards": {"Yes": 1.0, "Partial": 0.5, "No": 0.0, "N/A": None},
-    "bci": {"Pass": 1.0, "Partial": 0.5, "Fail": 0.0, "N/A": None},
-}
-
-# =============================================================
-# Photo helpers
-# =============================================================
-def _bytes_to_b64(data: bytes) -> str:
-    return base64.b64encode(data).decode("utf-8")
-
-def _ensure_bci_item_photos(item: Dict, period: str) -> None:
-    photos = item.setdefault("photos", {})
-    photos.setdefault(period, [])
+@st.cache_resource
+def _perf_stats() -> Dict:
+    """Server-process timings: the first (cold) script run and a window of warm reruns."""
+    return {"cold_start_s": None, "warm_runs_s": deque(maxlen=100)}
+
+def _record_run() -> float:
+    """Add this run's wall time to `_perf_stats`; called at the end of the script and by `_stop`."""
+    run_s = time.perf_counter() - _RUN_T0
+    perf = _perf_stats()
+    if perf["cold_start_s"] is None:
+        perf["cold_start_s"] = run_s
+    else:
+        perf["warm_runs_s"].append(run_s)
+    return run_s
 
-# =============================================================
-# Template
-# =============================================================
-def build_evs_template() -> Dict:
-    """Campus template with sections, checklists, and per-question photo storage."""
-    bci_areas = {
-        "Entrance and Lobby": [
-            "Are entrance areas free of cigarette butts and litter?",
-            "Are mats clean and in proper position?",
-            "Are walls, windows, glass, mirrors and doors free of marks and finger smears?",
-            "Are cigarette urns, exterior urns and trash containers clean and properly lined?",
-            "Are floors finished with depth shine and/or carpets are clean and fresh?",
-            "Are ledges, lights, vents and registers clean and free of dust?",
-            "Are furniture, cabinets and locker exteriors dust free and clean?",
-        ],
-        "Restrooms": [
-            "Are floors clean and free of dirt, spills, litter and are grout lines clean?",
-            "Are all fixtures (sinks, toilets, tubs, water fountain, etc.) clean and mineral free?",
-            "Are walls, windows, glass, mirrors and doors free of marks and finger smears?",
-            "Are waste containers clean, properly lined and in proper condition?",
-            "Are supply dispensers clean and adequately filled?",
-            "Is room odor free?",
-        ],
-        "Corridors": [
-            "Are floors finished with depth shine and/or carpets are clean and fresh?",
-            "Are ledges, lights, vents and registers clean and free of dust?",
-            "Are walls windows, glass, mirrors and doors free of marks and finger smears?",
-            "Are waste containers clean, properly lined and in proper condition?",
-            "Are furniture, cabinets and locker exteriors dust free and clean?",
-            "Are fixtures (sinks, water fountain, etc.) soap and mineral free?",
-        ],
-        "Elevators": [
-            "Are floors finished with depth shine and/or carpets are clean and fresh?",
-            "Are walls are clean and free of smudges and marks?",
-            "Are ledges, lights, vents and registers clean and free of dust?",
-            "Are elevator tracks clean?",
-        ],
-        "Stairs": [
-            "Are floors finished with depth shine and/or carpets are clean and fresh?",
-            "Are walls, hand rails and doors clean and free of smudges and marks?",
-            "Are ledges, lights, vents and registers clean and free of dust?",
-            "Are fire extinguisher cabinets/closets clean?",
-        ],
-        "Support Rooms (Conference and Training)": [
-            "Are floors finished with depth shine and/or carpets are clean and fresh?",
-            "Are ledges, lights, vents and registers clean and free of dust?",
-            "Are walls, windows, glass, mirrors and doors free of marks and finger smears?",
-            "Are waste containers clean, properly lined and in proper condition?",
-            "Are furniture, cabinets and locker exteriors dust free and clean?",
-            "Are fixtures (sinks, water fountain, etc.) soap and mineral free?",
-        ],
-        "Patient/Resident Room (4 rooms)": [
-            "Are floors finished with depth shine and/or carpets are clean and fresh?",
-            "Are ledges, lights, vents and registers clean and free of dust?",
-            "Are walls, windows, glass, mirrors and doors free of marks and finger smears?",
-            "Are waste containers clean and properly lined and in proper condition?",
-            "Is the patient bed clean including side rails, headboard, footboard, frame and wheels?",
-            "Are furniture, cabinets and locker exteriors dust free and clean?",
-            "Are tent cards in patient room?",
-            "Are curtains, drapes and linens free of spots and dust?",
-            "Are all fixtures (sinks, toilets, tubs, water fountain, etc.) soap and mineral free?",
-            "Are supply dispensers clean and adequately filled?",
-            "Are the Que's of Clean completed in the Bathroom?",
-            "Is the room odor free?",
-        ],
-        "Operating Rooms, Corridor and Core": [
-            "Are the floors clean and free of visible debris and have the proper finish?",
-            "Are the vents and exhaust fans dust free?",
-            "Are the walls, doors and windows clean and with no spot or stains?",
-            "Are trash cans clean, emptied and lined?",
-            "Is the Equipment in EVS scope of services clean and sanitized to include behind and under equipment?",
-            "Are ledges and other horizontal surfaces clean and dust free?",
-            "Are all fixtures (scrub sinks, water fountain, etc.) soap and mineral free?",
-            "Are supply dispensers clean and adequately filled?",
-            "Is the room terminally cleaned within 24 hours after procedures?",
-        ],
-        "Sterile Processing Department": [
-            "Are the floors clean and free of visible debris and have the proper finish?",
-            "Are the vents and exhaust fans dust free?",
-            "Are the walls, doors and windows clean and with no spot or stains?",
-            "Are trash cans clean, emptied and lined?",
-            "Is the Equipment in EVS scope of services clean and sanitized to include behind and under equipment?",
-            "Are ledges and other horizontal surfaces clean and dust free?",
-            "Are all fixtures (scrub sinks, water fountain, etc.) soap and mineral free?",
-            "Are supply dispensers clean and adequately filled?",
-        ],
-        "Emergency Department": [
-            "Are floors finished with depth shine and/or carpets are clean and fresh?",
-            "Are ledges, lights, vents and registers clean and free of dust?",
-            "Are walls, windows, glass, mirrors and doors free of marks and finger smears?",
-            "Are trash cans clean, emptied and lined?",
-            "Are patient beds clean including side rails, headboard, footboard, frame and wheels?",
-            "Are furniture, cabinets and locker exteriors dust free and clean?",
-            "Are curtains, drapes and linens free of spots and dust?",
-            "Are all fixtures (sinks, toilets, tubs, water fountain, etc.) soap and mineral free?",
-            "Are supply dispensers clean and adequately filled?",
-            "Is the room odor free?",
-        ],
-        "Offices (4 rooms)": [
-            "Are floors finished with depth shine and/or carpets are clean and fresh?",
-            "Are ledges, lights, vents and registers clean and free of dust?",
-            "Are walls, windows, glass, mirrors and doors free of marks and finger smears?",
-            "Are trash cans clean, emptied and lined?",
-            "Are furniture, cabinets and locker exteriors dust free and clean?",
-            "Are restrooms clean and free of trash?",
-            "Are telephones clean and free of dust?",
-            "Are all fixtures (sinks, water fountain, etc.) soap and mineral free?",
-            "Are supply dispensers clean and adequately filled?",
-        ],
-    }
-
-    contractual_pip_items = [
-        "Qualtrics Patient Satisfaction Scores Cleanliness",
-        "Qualtrics Patient Satisfaction Scores Courtesy",
-        "Overall Discharge Clean Compliance Percent of Stat Rooms cleaned within 60 minutes and Routine rooms within 120 minutes equal to or above MHHS PIP Target?",
-        "Virtual Manager Utilization Percentage",
-        "ATP Compliance YTD equal to or above the PIP Targets?",
-        "Linen Clean Reject Rate",
-        "Linen Overall Fill Rate",
-        "Linen Overall On time Delivery",
-        "Is the Linen Utilization Pounds Per Adjusted Patient Day equal to or below the PIP Target?",
-        "Is Contract Service - Housekeeping Fees and Expenses below YTD budget",
-        "Is Chemicals Expenses below YTD budget",
-        "Is Housekeeping Supplies expenses below YTD budget",
-    ]
-
-    system_standard_items = [
-        "Is My Rounding program in place and maintained per Compass requirements (incl. feedback, service recovery communication)?",
-        "Has EVS implemented Right Person/Right Place to evaluate unit scores and dedicate staff accordingly?",
-        "Is patient scripting conducted daily (verified)?",
-        "Does EVS management conduct observations for 10 Step Cleaning & QA of rooms daily (≥2 per employee per month) and meet Compass targets?",
-        "Are Nurse Roundings conducted by EVS leadership and at/above Compass YTD targets?",
-        "Is EVS equipment in good working order with no dirt buildup?",
-    ]
-
-    operational_info = [
-        "YTD Adjusted Patient Days variance to budget",
-        "YTD Discharge Cleans",
-        "ATP swabs completed YTD?",
-        "Stat Rooms percent of total discharge cleans?",
-        "Bed Turnaround time for Stat Rooms cleans % compliant in 60 min",
-        "Bed Turnaround time for Regular Room cleans % compliant in 120 min.",
-        "Stat rooms % rooms occupied w/in 90 min",
-        "Stat rooms % rooms occupied w/in 60 min",
-        "Does Facility use Auto Stat function for bed to designate bed clean status in Bed Management?",
-        "Open Positions",
-    ]
-
-    campus = {
-        "meta": {
-            "system": "",
-            "hospital": "",
-            "campus": "",
-            "date": "",
-            "assessed_by": "",
-            "evs_manager": "",
-        },
-        "periods": [],
-        "sections": {
-            "operational_info": [
-                {"name": k, "values": {}, "comments": {}} for k in operational_info
-            ],
-            "contractual_pip": [
-                {"name": k, "responses": {}, "comments": {}} for k in contractual_pip_items
-            ],
-            "system_standards": [
-                {"name": k, "responses": {}, "comments": {}} for k in system_standard_items
-            ],
-            "bci": {
-                "areas": {
-                    area: [
-                        {"name": q, "points": 1.0, "responses": {}, "comments": {}, "photos": {}}
-                        for q in qs
-                    ]
-                    for area, qs in bci_areas.items()
-                }
-            },
-        },
-    }
-    return campus
+def _stop() -> None:
+    """`st.stop()` that still records the run, so early-exit runs (e.g. no period yet) are timed too."""
+    _record_run()
+    st.stop()
 
 # =============================================================
 # Initialization & Migration
 # =============================================================
-def _new_empty_doc() -> Dict:
-    return {
-        "systems": {},
-        "weights": DEFAULT_WEIGHTS.copy(),
-        "response_maps": json.loads(json.dumps(DEFAULT_RESPONSE_MAPS)),
-        "version": 4,
-    }
-
-def ensure_system(name: str) -> None:
-    if name and name not in st.session_state.doc["systems"]:
-        st.session_state.doc["systems"][name] = {"hospitals": {}}
-
-def ensure_hospital(sys: str, hosp: str) -> None:
-    ensure_system(sys)
-    sysobj = st.session_state.doc["systems"][sys]
-    if hosp and hosp not in sysobj["hospitals"]:
-        sysobj["hospitals"][hosp] = {"campuses": {}}
-
-def ensure_campus(sys: str, hosp: str, camp: str) -> None:
-    ensure_hospital(sys, hosp)
-    hospobj = st.session_state.doc["systems"][sys]["hospitals"][hosp]
-    if camp and camp not in hospobj["campuses"]:
-        hospobj["campuses"][camp] = build_evs_template()
-        hospobj["campuses"][camp]["meta"].update({"system": sys, "hospital": hosp, "campus": camp})
-
-def _migrate_old_doc(old_doc: Dict | None) -> Dict:
-    """Migrate v2/v3 single-facility docs to v4 multi-hospital."""
-    new_doc = _new_empty_doc()
-    if not isinstance(old_doc, dict):
-        return new_doc
-    if "facilities" in old_doc and isinstance(old_doc["facilities"], dict) and old_doc["facilities"]:
-        sys_name = old_doc.get("system_name", "Migrated System")
-        new_doc["systems"][sys_name] = {"hospitals": {}}
-        for fac_name, fac_data in old_doc["facilities"].items():
-            campus = build_evs_template()
-            if isinstance(fac_data, dict):
-                if isinstance(fac_data.get("sections"), dict):
-                    campus["sections"] = fac_data["sections"]
-                if isinstance(fac_data.get("periods"), list):
-                    campus["periods"] = fac_data["periods"]
-                if isinstance(fac_data.get("meta"), dict):
-                    campus["meta"].update({
-                        "date": fac_data["meta"].get("date", ""),
-                        "assessed_by": fac_data["meta"].get("assessed_by", ""),
-                        "evs_manager": fac_data["meta"].get("evs_manager", ""),
-                    })
-            campus["meta"].update({"system": sys_name, "hospital": fac_name, "campus": "Main Campus"})
-            new_doc["systems"][sys_name]["hospitals"][fac_name] = {"campuses": {"Main Campus": campus}}
-        if "weights" in old_doc:
-            new_doc["weights"] = old_doc["weights"]
-        if "response_maps" in old_doc:
-            new_doc["response_maps"] = old_doc["response_maps"]
-        return new_doc
-    return new_doc
+# Session-scoped indexes and caches derived from the doc; dropped whenever the doc is replaced.
+DERIVED_STATE = ("hierarchy_index", "hist_cache", "search_index", "photo_index", "frame_cache", "event_log", "analytics", "query_result")
+
+def _adopt_doc(doc: Dict) -> None:
+    """Make `doc` the session document: repair its schema and drop everything derived from the old one."""
+    st.session_state["load_report"] = format_report(repair_doc(doc))
+    st.session_state["checked_doc_id"] = doc["doc_id"]
+    st.session_state.doc = doc
+    for k in DERIVED_STATE:
+        st.session_state.pop(k, None)
+    # Editor and evidence state of the old doc's campuses must not leak into the new one.
+    _session_gc().forget(st.session_state, keep_active=False)
+
+def _bump_revision(campus: Dict | None = None) -> None:
+    bump_revision(st.session_state.doc, campus)
+
+def _on_saved(campus: Dict, period: str | None = None, path: Tuple[str, str, str] | None = None,
+              caption: Tuple[str, str] | None = None) -> None:
+    """Bookkeeping after any save to a campus (default: the current one): revision bump and index refresh.
+
+    `caption` is (photo id, new caption) for a caption-only edit, which updates that one photo-index entry.
+    """
+    path = path or (current_sys, current_hosp, current_camp)
+    _bump_revision(campus)
+    idx = st.session_state.get("search_index")
+    if idx is not None:
+        idx.reindex(path, campus, period)
+    photos = st.session_state.get("photo_index")
+    if photos is not None:
+        if caption:
+            photos.set_caption(*caption)
+        else:
+            photos.reindex(path, campus)
+    # Roll-ups of the campus's hospital and system are rebuilt in the background, not on the next view.
+    doc = st.session_state.doc
+    for scope in ((path[0], path[1]), (path[0],)):
+        _rollup_service().refresh(doc["doc_id"], scope, scope_campuses(doc, scope))
+    # The query tables (and their Parquet mirror) are not touched here: the revision bump marks the campus
+    # stale, and the next query syncs just the stale campuses.
+
+@st.cache_resource
+def _rollup_service() -> RollupService:
+    """One worker pool and result store for the whole server; results are keyed by doc id."""
+    return RollupService(max_workers=2)
+
+EVS_DATA_DIR = os.environ.get("EVS_DATA_DIR") or None
+EVS_SESSION_BUDGET_MB = float(os.environ.get("EVS_SESSION_BUDGET_MB") or DEFAULT_BUDGET_MB)
+
+def _session_gc() -> SessionGC:
+    """Tracks widget state per (system, hospital, campus, period) and evicts scopes the user has left."""
+    if "session_gc" not in st.session_state:
+        st.session_state["session_gc"] = SessionGC(int(EVS_SESSION_BUDGET_MB * 1024 * 1024))
+    return st.session_state["session_gc"]
 
 # Put a valid doc in session
 _doc = st.session_state.get("doc")
 if not isinstance(_doc, dict) or "systems" not in _doc:
-    st.session_state.doc = _migrate_old_doc(_doc)
-else:
-    st.session_state.doc.setdefault("systems", {})
-    st.session_state.doc.setdefault("weights", DEFAULT_WEIGHTS.copy())
-    st.session_state.doc.setdefault("response_maps", json.loads(json.dumps(DEFAULT_RESPONSE_MAPS)))
-    st.session_state.doc.setdefault("version", 4)
+    # Migrated docs (v2/v3 or nothing) are repaired like any import before anything renders or scores them.
+    _adopt_doc(migrate_old_doc(_doc))
+elif st.session_state.get("checked_doc_id") != st.session_state.doc.get("doc_id", ""):
+    # Schema check once per document, not on every rerun (imports and restores go through `_adopt_doc`).
+    st.session_state["load_report"] = format_report(repair_doc(st.session_state.doc))
+    st.session_state["checked_doc_id"] = st.session_state.doc["doc_id"]
+
+def _event_log() -> EventLog:
+    """Edit log for the session's doc: on disk under EVS_DATA_DIR when set, otherwise in memory."""
+    log = st.session_state.get("event_log")
+    if log is None or log.doc_id != st.session_state.doc.get("doc_id"):
+        log = EventLog(st.session_state.doc, EVS_DATA_DIR)
+        st.session_state["event_log"] = log
+    return log
+
+def _record(op: str, target: Dict | None = None, period: str | None = None, path: Tuple[str, str, str] | None = None, **values) -> None:
+    """Apply an edit to a campus (default: the current one) through the event log."""
+    _event_log().record(st.session_state.doc, op, path or (current_sys, current_hosp, current_camp), period, target, **values)
+
+def _set_field(op: str, target: Dict, values: Dict, new) -> None:
+    """Record a per-period field edit for the current period, skipping unchanged values."""
+    if current_period in values:
+        if values[current_period] == new:
+            return
+        _record(op, target, current_period, old=values[current_period], new=new)
+    else:
+        _record(op, target, current_period, new=new)
+
+def _analytics() -> AnalyticsStore:
+    """Query tables for the session's doc; mirrored as Parquet under EVS_DATA_DIR when set.
+
+    Synced when a query runs, not on save, so edits never wait on Arrow or Parquet writes.
+    """
+    if "analytics" not in st.session_state:
+        directory = os.path.join(EVS_DATA_DIR, st.session_state.doc["doc_id"], "tables") if EVS_DATA_DIR else None
+        st.session_state["analytics"] = AnalyticsStore(directory)
+    return st.session_state["analytics"]
+
+def _hierarchy() -> HierarchyIndex:
+    """Sidebar sibling lists and campus finder; rebuilt only when the doc's hierarchy changes shape."""
+    idx = st.session_state.get("hierarchy_index")
+    if idx is None or not idx.covers(st.session_state.doc):
+        idx = HierarchyIndex.from_doc(st.session_state.doc)
+        st.session_state["hierarchy_index"] = idx
+    return idx
+
+def _search_index() -> SearchIndex:
+    """Built from the whole doc on first use; afterwards kept current by `_on_saved`."""
+    if "search_index" not in st.session_state:
+        st.session_state["search_index"] = SearchIndex.from_doc(st.session_state.doc)
+    return st.session_state["search_index"]
+
+def _photo_index() -> PhotoIndex:
+    """Built from the whole doc on first use; afterwards kept current by `_on_saved`."""
+    if "photo_index" not in st.session_state:
+        st.session_state["photo_index"] = PhotoIndex.from_doc(st.session_state.doc)
+    return st.session_state["photo_index"]
+
+def _hist_cache() -> HistogramCache:
+    """Per-session histogram cache; entries self-invalidate on campus revision bumps."""
+    if "hist_cache" not in st.session_state:
+        st.session_state["hist_cache"] = HistogramCache()
+    return st.session_state["hist_cache"]
+
+def _frame_cache() -> FrameCache:
+    """Per-session editor frames; rebuilt only when the campus revision moves."""
+    if "frame_cache" not in st.session_state:
+        st.session_state["frame_cache"] = FrameCache()
+    return st.session_state["frame_cache"]
+
+def _editor_frame(rows: List[Dict], part: str, columns):
+    return _frame_cache().get((current_sys, current_hosp, current_camp), CAMP, current_period, part,
+                              partial(editor_frame, rows, current_period, columns))
+
+def _save_cells(rows: List[Dict], target: Dict, changes) -> None:
+    """Write only the edited cells (from `changed_cells`) through the event log."""
+    for i, field, val in changes:
+        cell = {**target, "idx": i}
+        if field == "points":
+            pts = float(val or 1.0)
+            if pts != rows[i]["points"]:
+                _record("points_set", cell, old=rows[i]["points"], new=pts)
+        else:
+            _set_field(FIELD_EVENTS[field], cell, rows[i][field], "" if val is None else val)
 
-# =============================================================
-# Scoring helpers
-# =============================================================
-def score_section_responses(rows: List[Dict], period: str, resp_map: Dict[str, float | None]) -> Tuple[float, float]:
-    score = 0.0
-    denom = 0.0
-    for r in rows:
-        resp = r.get("responses", {}).get(period, None)
-        mult = resp_map.get(resp, None) if resp is not None else None
-        if mult is None:
-            continue
-        score += 1.0 * float(mult)
-        denom += 1.0
-    return score, denom
-
-def score_bci_area(items: List[Dict], period: str, resp_map: Dict[str, float | None]) -> Tuple[float, float]:
-    score = 0.0
-    denom = 0.0
-    for it in items:
-        pts = float(it.get("points", 1) or 1)
-        resp = it.get("responses", {}).get(period, None)
-        mult = resp_map.get(resp, None) if resp is not None else None
-        if mult is None:
-            continue
-        score += pts * float(mult)
-        denom += pts
-    return score, denom
-
-def compute_period_components(campus: Dict, period: str, maps: Dict[str, Dict]) -> Dict:
-    areas = campus["sections"]["bci"]["areas"]
-    bci_by_dim: Dict[str, Tuple[float, float]] = {}
-    bci_total_s = 0.0
-    bci_total_d = 0.0
-    for area, items in areas.items():
-        s, d = score_bci_area(items, period, maps["bci"])
-        bci_by_dim[area] = (s, d)
-        bci_total_s += s
-        bci_total_d += d
-    pip_s, pip_d = score_section_responses(campus["sections"]["contractual_pip"], period, maps["contractual_pip"])
-    sys_s, sys_d = score_section_responses(campus["sections"]["system_standards"], period, maps["system_standards"])
-    return {"bci_by_dimension": bci_by_dim, "bci_total": (bci_total_s, bci_total_d), "pip": (pip_s, pip_d), "sys": (sys_s, sys_d)}
-
-def summarise_from_components(comp: Dict, weights: Dict[str, float]) -> Dict:
-    bci_pct_by_dim = {a: (s / d * 100 if d else 0.0) for a, (s, d) in comp["bci_by_dimension"].items()}
-    bs, bd = comp["bci_total"]
-    bci_overall = (bs / bd * 100) if bd else 0.0
-    ps, pd = comp["pip"]
-    pip_pct = (ps / pd * 100) if pd else 0.0
-    ss, sd = comp["sys"]
-    sys_pct = (ss / sd * 100) if sd else 0.0
-    weighted = pip_pct * weights["financial_pip"] + sys_pct * weights["system_standards"] + bci_overall * weights["bci"]
-    return {
-        "bci_by_dimension": {k: round(v, 1) for k, v in bci_pct_by_dim.items()},
-        "bci_overall": round(bci_overall, 1),
-        "operational": {
-            "financial_pip": round(pip_pct, 1),
-            "system_standards": round(sys_pct, 1),
-            "bci": round(bci_overall, 1),
-            "weighted": round(weighted, 1),
-        },
-    }
-
-def aggregate_components(components: List[Dict]) -> Dict:
-    agg = {"bci_by_dimension": {}, "bci_total": (0.0, 0.0), "pip": (0.0, 0.0), "sys": (0.0, 0.0)}
-    for comp in components:
-        for area, (s, d) in comp["bci_by_dimension"].items():
-            ss, dd = agg["bci_by_dimension"].get(area, (0.0, 0.0))
-            agg["bci_by_dimension"][area] = (ss + s, dd + d)
-        bs, bd = agg["bci_total"]
-        cs, cd = comp["bci_total"]
-        agg["bci_total"] = (bs + cs, bd + cd)
-        ps, pd = agg["pip"]
-        ps2, pd2 = comp["pip"]
-        agg["pip"] = (ps + ps2, pd + pd2)
-        ss, sd = agg["sys"]
-        ss2, sd2 = comp["sys"]
-        agg["sys"] = (ss + ss2, sd + sd2)
-    return agg
-
-def migrate_period_label(campus: Dict, old_label: str, new_label: str) -> None:
-    """Move any data saved under a placeholder period label to the new label."""
-    if not old_label or not new_label or old_label == new_label:
+NAV_HITS = 8     # finder results shown
+NAV_RECENT = 5   # recently visited campuses kept as shortcuts
+
+def _nav_goto(path: Tuple[str, str, str]) -> None:
+    """Finder / recent-campus callback: runs before the hierarchy widgets are created."""
+    st.session_state["sys_select"], st.session_state["hosp_select"], st.session_state["camp_select"] = path
+    st.session_state["nav_find"] = ""
+
+def _nav_create(sys_name: str, hosp_name: str) -> None:
+    """Create the campus named in the sidebar (or select it if it already exists)."""
+    name = (st.session_state.get("nav_new_camp") or "").strip()
+    if not name:
         return
-    # Operational Info
-    for r in campus["sections"]["operational_info"]:
-        if old_label in r["values"]:
-            r["values"].setdefault(new_label, r["values"][old_label])
-            r["values"].pop(old_label, None)
-        if old_label in r["comments"]:
-            r["comments"].setdefault(new_label, r["comments"][old_label])
-            r["comments"].pop(old_label, None)
-    # Contractual & System Standards
-    for section in ["contractual_pip", "system_standards"]:
-        for r in campus["sections"][section]:
-            if old_label in r["responses"]:
-                r["responses"].setdefault(new_label, r["responses"][old_label])
-                r["responses"].pop(old_label, None)
-            if old_label in r["comments"]:
-                r["comments"].setdefault(new_label, r["comments"][old_label])
-                r["comments"].pop(old_label, None)
-    # BCI
-    for items in campus["sections"]["bci"]["areas"].values():
-        for it in items:
-            if old_label in it["responses"]:
-                it["responses"].setdefault(new_label, it["responses"][old_label])
-                it["responses"].pop(old_label, None)
-            if old_label in it["comments"]:
-                it["comments"].setdefault(new_label, it["comments"][old_label])
-                it["comments"].pop(old_label, None)
-            if "photos" in it and old_label in it["photos"]:
-                it["photos"].setdefault(new_label, it["photos"][old_label])
-                it["photos"].pop(old_label, None)
+    ensure_campus(st.session_state.doc, sys_name, hosp_name, name)
+    _hierarchy().add(st.session_state.doc, (sys_name, hosp_name, name))
+    st.session_state["camp_select"] = name
+    st.session_state["nav_new_camp"] = ""
 
 # =============================================================
 # Sidebar — Hierarchy, Periods, Scoring Maps, Save/Load
@@ -411,11 +232,29 @@ with st.sidebar:
         st.session_state["new_period_input"] = ""
         st.session_state["clear_new_period_flag"] = False
 
+    # Search jump: select the hit's location before the hierarchy widgets are created
+    _jump = st.session_state.pop("search_jump", None)
+    if _jump:
+        if not _jump["period"]:  # a question hit: open the campus's latest period
+            _periods = st.session_state.doc["systems"][_jump["system"]]["hospitals"][_jump["hospital"]]["campuses"][_jump["campus"]]["periods"]
+            _jump = dict(_jump, period=_periods[-1] if _periods else PERIOD_PLACEHOLDER)
+        st.session_state["sys_select"] = _jump["system"]
+        st.session_state["hosp_select"] = _jump["hospital"]
+        st.session_state["camp_select"] = _jump["campus"]
+        st.session_state["current_period_select"] = _jump["period"]
+        if _jump["section"] == "bci":
+            _pk = f"bci_pending_capture_{_jump['system']}_{_jump['hospital']}_{_jump['campus']}_{_jump['period']}"
+            _open = st.session_state.setdefault(_pk, {}).setdefault(_jump["area"], [])
+            if _jump["idx"] not in _open:
+                _open.append(_jump["idx"])
+        st.session_state["search_focus"] = _jump
+
     # Commit handlers
     if st.session_state.get("sys_add_commit"):
         name = (st.session_state.get("sys_new_name") or "").strip()
         if name:
-            ensure_system(name)
+            ensure_system(st.session_state.doc, name)
+            _hierarchy().add(st.session_state.doc, (name,))
             st.session_state["sys_select"] = name
         st.session_state["sys_add_commit"] = False
         st.session_state["clear_sys_new_flag"] = True
@@ -425,7 +264,8 @@ with st.sidebar:
         name = (st.session_state.get("hosp_new_name") or "").strip()
         parent = st.session_state.get("hosp_new_parent_sys")
         if name and parent:
-            ensure_hospital(parent, name)
+            ensure_hospital(st.session_state.doc, parent, name)
+            _hierarchy().add(st.session_state.doc, (parent, name))
             st.session_state["sys_select"] = parent
             st.session_state["hosp_select"] = name
         st.session_state["hosp_add_commit"] = False
@@ -437,8 +277,26 @@ with st.sidebar:
             del st.session_state[k]
         st.rerun()
 
+    # -------- Find campus --------
+    # Sibling lists and search come from the prebuilt index, so nothing here scales with the number of campuses.
+    nav = _hierarchy()
+    nav_text = st.text_input("Find campus", placeholder=f"Search {len(nav)} campuses by campus, hospital or system", key="nav_find")
+    if nav_text.strip():
+        nav_hits = nav.search(nav_text, limit=NAV_HITS)
+        if not nav_hits:
+            st.caption("No matching campus. Use **➕ New campus** below to create one.")
+        for i, path in enumerate(nav_hits):
+            st.button(" / ".join(path), key=f"nav_hit_{i}", on_click=_nav_goto, args=(path,), use_container_width=True)
+    else:
+        _here = tuple(st.session_state.get(k) for k in ("sys_select", "hosp_select", "camp_select"))
+        nav_recent = [p for p in st.session_state.get("nav_recent", []) if p != _here and p in nav][:NAV_RECENT]
+        if nav_recent:
+            st.caption("Recent")
+            for i, path in enumerate(nav_recent):
+                st.button(" / ".join(path), key=f"nav_recent_{i}", on_click=_nav_goto, args=(path,), use_container_width=True)
+
     # -------- System --------
-    sys_names = sorted(list(st.session_state.doc["systems"].keys()))
+    sys_names = nav.systems
     SYS_ADD_LABEL = "➕ Add new system…"
     sys_options = sys_names + [SYS_ADD_LABEL] if sys_names else [SYS_ADD_LABEL]
 
@@ -454,12 +312,12 @@ with st.sidebar:
             st.session_state["sys_new_name"] = new_sys_name.strip()
             st.session_state["sys_add_commit"] = True
             st.rerun()
-        st.stop()
+        _stop()
     else:
         current_sys = selected_sys
 
     # -------- Hospital --------
-    hosp_names = sorted(list(st.session_state.doc["systems"][current_sys]["hospitals"].keys()))
+    hosp_names = nav.hospitals.get(current_sys, [])
     HOSP_ADD_LABEL = "➕ Add new hospital…"
     hosp_options = hosp_names + [HOSP_ADD_LABEL] if hosp_names else [HOSP_ADD_LABEL]
 
@@ -476,31 +334,52 @@ with st.sidebar:
             st.session_state["hosp_new_parent_sys"] = current_sys
             st.session_state["hosp_add_commit"] = True
             st.rerun()
-        st.stop()
+        _stop()
     else:
         current_hosp = selected_hosp
 
     # -------- Campus --------
-    camp_names = list(st.session_state.doc["systems"][current_sys]["hospitals"][current_hosp]["campuses"].keys())
-    new_camp = st.text_input("Create/Select Campus", placeholder="e.g., Main, East, West", key="camp_input")
-    if new_camp:
-        ensure_campus(current_sys, current_hosp, new_camp)
-        current_camp = new_camp
-    elif camp_names:
-        current_camp = st.selectbox("Campus", camp_names, index=0, key="camp_select")
-    else:
-        ensure_campus(current_sys, current_hosp, "Main Campus")
-        current_camp = "Main Campus"
+    camp_names = nav.campuses.get((current_sys, current_hosp), [])
+    if not camp_names:
+        ensure_campus(st.session_state.doc, current_sys, current_hosp, "Main Campus")
+        nav.add(st.session_state.doc, (current_sys, current_hosp, "Main Campus"))
+        camp_names = nav.campuses[(current_sys, current_hosp)]
+    if st.session_state.get("camp_select") not in camp_names:
+        st.session_state["camp_select"] = camp_names[0]
+    current_camp = st.selectbox("Campus", camp_names, key="camp_select")
+    with st.expander("➕ New campus"):
+        new_camp = st.text_input("Campus name", placeholder="e.g., Main, East, West", key="nav_new_camp").strip()
+        if new_camp in camp_names:
+            st.caption(f"**{new_camp}** already exists in {current_hosp}; creating selects it.")
+        elif new_camp:
+            near = nav.similar(current_sys, current_hosp, new_camp)
+            if near:
+                st.warning(f"Similar campus already in {current_hosp}: " + ", ".join(f"**{c}**" for c in near) + ". Check for a typo before creating.")
+        st.button(f"Create campus in {current_hosp}", key="nav_create_btn", on_click=_nav_create, args=(current_sys, current_hosp))
+
+    _here = (current_sys, current_hosp, current_camp)
+    _recent = st.session_state.setdefault("nav_recent", [])
+    if not _recent or _recent[0] != _here:
+        st.session_state["nav_recent"] = [_here] + [p for p in _recent if p != _here][:NAV_RECENT]
 
     CAMP = st.session_state.doc["systems"][current_sys]["hospitals"][current_hosp]["campuses"][current_camp]
 
     with st.expander("Campus Profile", expanded=True):
         c1, c2 = st.columns(2)
         with c1:
-            CAMP["meta"]["assessed_by"] = st.text_input("Assessed By", CAMP["meta"].get("assessed_by", ""), key="assessed_by_input")
-            CAMP["meta"]["evs_manager"] = st.text_input("EVS Manager", CAMP["meta"].get("evs_manager", ""), key="evs_manager_input")
+            meta_in = {
+                "assessed_by": st.text_input("Assessed By", CAMP["meta"].get("assessed_by", ""), key="assessed_by_input"),
+                "evs_manager": st.text_input("EVS Manager", CAMP["meta"].get("evs_manager", ""), key="evs_manager_input"),
+            }
         with c2:
-            CAMP["meta"]["date"] = st.text_input("Date", CAMP["meta"].get("date", ""), placeholder="e.g., 6/19/2025", key="date_input")
+            meta_in["date"] = st.text_input("Date", CAMP["meta"].get("date", ""), placeholder="e.g., 6/19/2025", key="date_input")
+        meta_changed = False
+        for field, val in meta_in.items():
+            if CAMP["meta"].get(field, "") != val:
+                _record("meta_set", {"field": field}, old=CAMP["meta"].get(field, ""), new=val)
+                meta_changed = True
+        if meta_changed:
+            _on_saved(CAMP)
 
     periods = CAMP["periods"]
 
@@ -513,9 +392,15 @@ with st.sidebar:
         new_period = st.text_input("New period label", placeholder="e.g., Jun-25", key="new_period_input")
         add_clicked = st.button("Add/Select Period", key="add_select_period_btn")
         if add_clicked and new_period:
-            migrate_period_label(CAMP, PERIOD_PLACEHOLDER, new_period)
-            if new_period not in CAMP["periods"]:
-                CAMP["periods"].append(new_period)
+            # Only data actually entered under the placeholder is moved (and recorded, so undo moves just that back).
+            moved = held_cells(CAMP, PERIOD_PLACEHOLDER, new_period)
+            added = new_period not in CAMP["periods"]
+            if moved:
+                _record("period_renamed", old=PERIOD_PLACEHOLDER, new=new_period, cells=moved)
+            if added:
+                _record("period_added", period=new_period)
+            if moved or added:
+                _on_saved(CAMP)
             st.session_state["current_period_select"] = new_period
             st.session_state["clear_new_period_flag"] = True
             st.rerun()
@@ -562,24 +447,145 @@ with st.sidebar:
         )
 
     st.divider()
-    doc_json = json.dumps(st.session_state.doc, indent=2).encode("utf-8")
-    st.download_button("💾 Download Document (JSON)", doc_json, file_name="EVS_MultiHospital.json")
-    up = st.file_uploader("Import Document (JSON)", type=["json"])
-    if up:
+    with st.expander("🕘 Campus history"):
+        _log = _event_log()
+        _hist = _log.history((current_sys, current_hosp, current_camp), limit=15)
+        if not _hist:
+            st.caption("No edits recorded for this campus yet.")
+        for ev in _hist:
+            _what = OP_LABELS.get(ev["op"], ev["op"])
+            _where = ev.get("target", {}).get("area") or ev.get("target", {}).get("section") or ev.get("target", {}).get("field", "")
+            _when = time.strftime("%m-%d %H:%M", time.localtime(ev["ts"]))
+            _flags = " ↩️ undo" if "undo_of" in ev else (" ~~undone~~" if ev["undone"] else "")
+            st.caption(f"#{ev['seq']} · {_when} · {_what} {_where} {ev.get('period', '')}{_flags}")
+        if _hist and st.button("↩️ Undo last change", key="undo_last_btn"):
+            if _log.undo_last(st.session_state.doc, (current_sys, current_hosp, current_camp)) is not None:
+                _on_saved(CAMP)
+                # Drop widget state that still holds the undone values so it re-reads the doc.
+                _suffix = f"_{current_sys}_{current_hosp}_{current_camp}_"
+                for _k in list(st.session_state.keys()):
+                    if _k in ("assessed_by_input", "evs_manager_input", "date_input") or "_editor" + _suffix in _k or (_k.startswith("bci_bulk_") and _suffix in _k):
+                        del st.session_state[_k]
+            st.rerun()
+        if _log.seq:
+            _at = st.number_input("Document as of event #", min_value=_log.oldest_restorable(), max_value=_log.seq,
+                                  value=_log.seq, step=1, key="history_as_of")
+            st.download_button(
+                "⬇️ Download that version (JSON)",
+                partial(lambda seq: dump_json(_log.state_at(seq)), int(_at)),
+                file_name=f"EVS_MultiHospital_event{int(_at)}.json",
+                key="history_download",
+            )
+        if EVS_DATA_DIR:
+            _logged = [d for d, _ in list_logged_docs(EVS_DATA_DIR) if d != _log.doc_id]
+            if _logged:
+                _pick = st.selectbox("Restore a logged document", _logged, key="restore_doc_select")
+                if st.button("Restore latest state", key="restore_doc_btn"):
+                    _adopt_doc(restore_latest(EVS_DATA_DIR, _pick))
+                    st.rerun()
+
+    # Serialised only when clicked (on a side thread), not on every rerun.
+    st.download_button("💾 Download Document (JSON)", partial(dump_json, st.session_state.doc), file_name="EVS_MultiHospital.json")
+    st.download_button(
+        "🗜️ Download compact (.evsb)", partial(dump_document, st.session_state.doc, "evsb"),
+        file_name="EVS_MultiHospital.evsb", mime=DOC_FORMATS["evsb"][1],
+        help="MessagePack + zstd with raw photo bytes: much smaller and faster to load than JSON.",
+    )
+    up = st.file_uploader("Import Document (JSON or .evsb)", type=["json", "evsb"])
+    # The uploader keeps its file across reruns; import each upload only once.
+    if up and st.session_state.get("imported_file_id") != up.file_id:
+        st.session_state["imported_file_id"] = up.file_id
         try:
-            incoming = json.load(up)
+            incoming = load_document(up.getvalue())
+            if is_delta(incoming):
+                raise ValueError("this is a delta file; use **Merge inspector changes** to apply it.")
             if not isinstance(incoming, dict) or "systems" not in incoming:
-                incoming = _migrate_old_doc(incoming)
-            st.session_state.doc = incoming
+                incoming = migrate_old_doc(incoming)
+            # An imported copy starts its own edit-log lineage.
+            incoming["doc_id"] = new_doc_id()
+            # Never reuse a revision number another doc already used in this session.
+            _rev = incoming.get("revision")
+            incoming["revision"] = max(_rev if isinstance(_rev, int) else 0, st.session_state.doc["revision"]) + 1
+            _adopt_doc(incoming)
             st.success("Document loaded.")
             st.rerun()
         except Exception as e:
             st.error(f"Load failed: {e}")
 
+    with st.expander("🔀 Merge inspector changes"):
+        st.caption("Export only what you changed since this document was loaded, or merge other inspectors' "
+                   "delta files (or full copies of the same base document) into yours, cell by cell.")
+        _log = _event_log()
+        st.download_button(
+            "⬇️ Export my changes (delta)",
+            lambda: dump_json(doc_delta(_log.state_at(_log.oldest_restorable()), st.session_state.doc)),
+            file_name=f"EVS_delta_{time.strftime('%Y%m%d_%H%M')}.json", key="delta_export",
+        )
+        merge_files = st.file_uploader("Delta or document files", type=["json", "evsb"], accept_multiple_files=True, key="merge_files")
+        merge_prefer = st.radio("On conflict", ["ours", "theirs"], horizontal=True, key="merge_prefer",
+                                format_func=lambda p: "Keep mine" if p == "ours" else "Take theirs")
+        if merge_files and st.button("Merge", key="merge_btn"):
+            _base = None
+            _summary = {"files": [], "conflicts": []}
+            _touched: Dict[Tuple[str, str, str], None] = {}
+            for f in merge_files:
+                try:
+                    delta = load_document(f.getvalue())
+                    if not is_delta(delta):
+                        # A full copy: diff it against our base to get its changes.
+                        if not isinstance(delta, dict) or "systems" not in delta:
+                            delta = migrate_old_doc(delta)
+                        repair_doc(delta)
+                        _base = _base or _log.state_at(_log.oldest_restorable())
+                        delta = doc_delta(_base, delta)
+                    res = merge_delta(
+                        st.session_state.doc, delta, prefer=merge_prefer,
+                        apply=lambda ev: _log.record(st.session_state.doc, ev["op"], ev["path"], ev.get("period"), ev.get("target"),
+                                                     **{k: ev[k] for k in ("old", "new") if k in ev}),
+                    )
+                except Exception as e:
+                    _summary["files"].append(f"{f.name}: failed ({e})")
+                    continue
+                _summary["files"].append(f"{f.name}: {res['applied']} applied, {res['unchanged']} already present, {len(res['conflicts'])} conflict(s)")
+                _summary["conflicts"].extend({"File": f.name, **c} for c in res["conflicts"])
+                _touched.update(dict.fromkeys(res["touched"]))
+            for _path in _touched:
+                _on_saved(st.session_state.doc["systems"][_path[0]]["hospitals"][_path[1]]["campuses"][_path[2]], None, _path)
+            st.session_state["merge_report"] = _summary
+            st.rerun()
+
+_merge_report = st.session_state.pop("merge_report", None)
+if _merge_report:
+    st.success("Merged: " + " · ".join(_merge_report["files"]))
+    if _merge_report["conflicts"]:
+        with st.expander(f"⚠️ {len(_merge_report['conflicts'])} merge conflict(s)", expanded=True):
+            st.dataframe(_merge_report["conflicts"], use_container_width=True, hide_index=True)
+
+_load_report = st.session_state.pop("load_report", None)
+if _load_report:
+    with st.expander(f"⚠️ Repaired {len(_load_report)} problem area(s) in the loaded document", expanded=False):
+        for _line in _load_report:
+            st.caption(_line)
+
+_focus = st.session_state.pop("search_focus", None)
+if _focus:
+    _where = SECTION_LABELS[_focus["section"]] + (f" → {_focus['area']}" if _focus["area"] else "")
+    st.info(f"🔎 Search hit: **{_where}**, Q{_focus['idx'] + 1} — {_focus['question']} ({_focus['period']}). Open the {SECTION_LABELS[_focus['section']]} tab; BCI evidence panels are already open.")
+
 # Stop early if no real period selected
 if current_period == PERIOD_PLACEHOLDER:
     st.warning("Create/select a period first: enter a label then click **Add/Select Period**. Once a real period is selected, the data entry tabs will appear.")
-    st.stop()
+    _stop()
+
+# Deferred until a real period is selected: the sidebar-only runs above never need pandas.
+import pandas as pd
+from evs.frames import BCI_COLUMNS, SECTION_COLUMNS, changed_cells, editor_frame, requested_actions
+
+# Keys below are built with `_gc.key` / `_gc.claim` so they are owned by the scope on screen.
+# Evict before any scoped widget is created; the current scope is always kept.
+_gc = _session_gc()
+_gc.enter((current_sys, current_hosp, current_camp, current_period))
+_gc.collect(st.session_state)
 
 # =============================================================
 # Tabs
@@ -591,18 +597,20 @@ tabs = st.tabs([
     "🧹 BCI",
     "📋 Campus Summary",
     "📊 Roll-Up Dashboard",
+    "🧪 What-If",
+    "🔎 Search",
+    "🖼️ Evidence",
+    "🧮 Query",
+    "📦 Reports",
 ])
-TAB_OPINFO, TAB_PIP, TAB_SYS, TAB_BCI, TAB_SUMMARY, TAB_ROLLUP = tabs
+TAB_OPINFO, TAB_PIP, TAB_SYS, TAB_BCI, TAB_SUMMARY, TAB_ROLLUP, TAB_WHATIF, TAB_SEARCH, TAB_EVIDENCE, TAB_QUERY, TAB_REPORTS = tabs
 
 # ---------------------- Operational Info ----------------------
 with TAB_OPINFO:
     st.subheader(f"Operational Information — {current_sys} / {current_hosp} / {current_camp} / {current_period}")
     rows = CAMP["sections"]["operational_info"]
-    df = pd.DataFrame([
-        {"KPI": r["name"], "Value": r.get("values", {}).get(current_period, ""), "Comments": r.get("comments", {}).get(current_period, "")}
-        for r in rows
-    ])
-    with st.form(key=f"form_opinfo_{current_sys}_{current_hosp}_{current_camp}_{current_period}"):
+    df = _editor_frame(rows, "operational_info", SECTION_COLUMNS["operational_info"])
+    with st.form(key=_gc.key("form_opinfo")):
         edited = st.data_editor(
             df, use_container_width=True, num_rows="dynamic",
             column_config={
@@ -610,25 +618,22 @@ with TAB_OPINFO:
                 "Value": st.column_config.TextColumn(),
                 "Comments": st.column_config.TextColumn(),
             },
-            key=f"opinfo_editor_{current_sys}_{current_hosp}_{current_camp}_{current_period}",
+            key=_gc.key("opinfo_editor"),
         )
         saved = st.form_submit_button("Save operational info")
     if saved:
-        for i, r in enumerate(rows):
-            r["values"][current_period] = edited.iloc[i]["Value"]
-            r["comments"][current_period] = edited.iloc[i]["Comments"]
+        _save_cells(rows, {"section": "operational_info"}, changed_cells(df, edited, SECTION_COLUMNS["operational_info"]))
+        _on_saved(CAMP, current_period)
         st.success("Saved.")
 
 # ---------------------- Contractual & PIP ----------------------
 with TAB_PIP:
     st.subheader("Contractual Financial & PIP Results")
-    rows = CAMP["sections"]["contractual_pip"]
+    section_key = "contractual_pip"
+    rows = CAMP["sections"][section_key]
     options = list(st.session_state.doc["response_maps"]["contractual_pip"].keys())
-    df = pd.DataFrame([
-        {"Question": r["name"], "Response": r.get("responses", {}).get(current_period, ""), "Comments": r.get("comments", {}).get(current_period, "")}
-        for r in rows
-    ])
-    with st.form(key=f"form_pip_{current_sys}_{current_hosp}_{current_camp}_{current_period}"):
+    df = _editor_frame(rows, section_key, SECTION_COLUMNS[section_key])
+    with st.form(key=_gc.key("form_pip")):
         edited = st.data_editor(
             df, use_container_width=True, num_rows="dynamic",
             column_config={
@@ -636,13 +641,12 @@ with TAB_PIP:
                 "Response": st.column_config.SelectboxColumn(options=options),
                 "Comments": st.column_config.TextColumn(),
             },
-            key=f"pip_editor_{current_sys}_{current_hosp}_{current_camp}_{current_period}",
+            key=_gc.key("pip_editor"),
         )
         saved = st.form_submit_button("Save PIP responses")
     if saved:
-        for i, r in enumerate(rows):
-            r["responses"][current_period] = edited.iloc[i]["Response"]
-            r["comments"][current_period] = edited.iloc[i]["Comments"]
+        _save_cells(rows, {"section": section_key}, changed_cells(df, edited, SECTION_COLUMNS[section_key]))
+        _on_saved(CAMP, current_period)
         st.success("Saved.")
     s, d = score_section_responses(rows, current_period, st.session_state.doc["response_maps"]["contractual_pip"])
     st.metric("Section Total", f"{s:.1f}")
@@ -651,13 +655,11 @@ with TAB_PIP:
 # ---------------------- System Standards ----------------------
 with TAB_SYS:
     st.subheader("System Standards")
-    rows = CAMP["sections"]["system_standards"]
+    section_key = "system_standards"
+    rows = CAMP["sections"][section_key]
     options = list(st.session_state.doc["response_maps"]["system_standards"].keys())
-    df = pd.DataFrame([
-        {"Question": r["name"], "Response": r.get("responses", {}).get(current_period, ""), "Comments": r.get("comments", {}).get(current_period, "")}
-        for r in rows
-    ])
-    with st.form(key=f"form_sys_{current_sys}_{current_hosp}_{current_camp}_{current_period}"):
+    df = _editor_frame(rows, section_key, SECTION_COLUMNS[section_key])
+    with st.form(key=_gc.key("form_sys")):
         edited = st.data_editor(
             df, use_container_width=True, num_rows="dynamic",
             column_config={
@@ -665,13 +667,12 @@ with TAB_SYS:
                 "Response": st.column_config.SelectboxColumn(options=options),
                 "Comments": st.column_config.TextColumn(),
             },
-            key=f"sys_editor_{current_sys}_{current_hosp}_{current_camp}_{current_period}",
+            key=_gc.key("sys_editor"),
         )
         saved = st.form_submit_button("Save System Standards")
     if saved:
-        for i, r in enumerate(rows):
-            r["responses"][current_period] = edited.iloc[i]["Response"]
-            r["comments"][current_period] = edited.iloc[i]["Comments"]
+        _save_cells(rows, {"section": section_key}, changed_cells(df, edited, SECTION_COLUMNS[section_key]))
+        _on_saved(CAMP, current_period)
         st.success("Saved.")
     s, d = score_section_responses(rows, current_period, st.session_state.doc["response_maps"]["system_standards"])
     st.metric("Section Total", f"{s:.1f}")
@@ -688,7 +689,7 @@ with TAB_BCI:
     st.caption("Edit in the table below, then click **Save changes & open evidence** for that area. This prevents the camera panel from blinking while you type.")
 
     # session state bucket for evidence panels to show: { area_name: [row_idx, ...], ... }
-    pending_key = f"bci_pending_capture_{current_sys}_{current_hosp}_{current_camp}_{current_period}"
+    pending_key = _gc.key("bci_pending_capture")
     if pending_key not in st.session_state:
         st.session_state[pending_key] = {}
 
@@ -702,24 +703,15 @@ with TAB_BCI:
             st.session_state[pending_key].pop(area, None)
 
     def _show_key(area_name: str, idx: int) -> str:
-        return f"bci_show_ev_{area_name}_{idx}_{current_sys}_{current_hosp}_{current_camp}_{current_period}"
+        return _gc.key("bci_show_ev", area_name, idx)
 
     for area, items in areas.items():
         st.markdown(f"#### {area}")
 
         # --- FORM: buffer edits until user hits Save ---
-        with st.form(key=f"bci_form_{area}_{current_sys}_{current_hosp}_{current_camp}_{current_period}"):
-            df = pd.DataFrame([
-                {
-                    "Q#": i + 1,
-                    "Item": it["name"],
-                    "Points": it.get("points", 1.0),
-                    "Response": it.get("responses", {}).get(current_period, ""),
-                    "Comments": it.get("comments", {}).get(current_period, ""),
-                    "Action": "",  # "" or "Add evidence"
-                }
-                for i, it in enumerate(items)
-            ])
+        with st.form(key=_gc.key("bci_form", area)):
+            # "Action" is "" or "Add evidence"
+            df = _editor_frame(items, f"bci:{area}", BCI_COLUMNS)
 
             edited = st.data_editor(
                 df,
@@ -733,40 +725,20 @@ with TAB_BCI:
                     "Comments": st.column_config.TextColumn(),
                     "Action": st.column_config.SelectboxColumn(options=["", "Add evidence"]),
                 },
-                key=f"bci_bulk_{area}_{current_sys}_{current_hosp}_{current_camp}_{current_period}",
+                key=_gc.key("bci_bulk", area),
             )
 
             save_btn = st.form_submit_button("Save changes & open evidence", use_container_width=True)
 
         # --- APPLY SAVES ONLY WHEN BUTTON CLICKED ---
         if save_btn:
-            to_open: List[int] = []
-            for _, row in edited.iterrows():
-                try:
-                    i = int(row["Q#"]) - 1
-                except Exception:
-                    continue
-                if i < 0 or i >= len(items):
-                    continue
-
-                it = items[i]
-                _ensure_bci_item_photos(it, current_period)
-
-                # Save edits
-                pts_new = float(row.get("Points", it.get("points", 1.0)) or 1.0)
-                it["points"] = pts_new
-
-                resp_new = row.get("Response", "")
-                it.setdefault("responses", {})[current_period] = resp_new
-
-                cmt_new = row.get("Comments", "")
-                it.setdefault("comments", {})[current_period] = cmt_new
-
-                # Queue evidence panel
-                if (row.get("Action") or "") == "Add evidence":
-                    to_open.append(i)
-                    st.session_state[_show_key(area, i)] = True  # remember panel "open"
+            _save_cells(items, {"section": "bci", "area": area}, changed_cells(df, edited, BCI_COLUMNS))
+            # Queue evidence panels
+            to_open = requested_actions(edited, len(items))
+            for i in to_open:
+                st.session_state[_show_key(area, i)] = True  # remember panel "open"
 
+            _on_saved(CAMP, current_period)
             if to_open:
                 _ensure_area_pending(area)
                 existing = set(st.session_state[pending_key].get(area, []))
@@ -782,82 +754,94 @@ with TAB_BCI:
                 if i < 0 or i >= len(items):
                     continue
                 it = items[i]
-                _ensure_bci_item_photos(it, current_period)
+                ensure_bci_item_photos(it, current_period)
                 gallery = it["photos"].get(current_period, [])
 
                 st.markdown(f"**Q{i+1}. {it['name']}**")
                 col_cam, col_controls = st.columns([3, 2])
 
                 with col_cam:
-                    cam_key = f"bci_cam_{area}_{i}_{current_sys}_{current_hosp}_{current_camp}_{current_period}"
+                    cam_key = _gc.key("bci_cam", area, i)
                     snap = st.camera_input("Take photo", key=cam_key)
 
-                    if st.button("💾 Save camera photo", key=f"bci_save_cam_{cam_key}") and snap is not None:
+                    if st.button("💾 Save camera photo", key=_gc.claim(f"bci_save_cam_{cam_key}")) and snap is not None:
                         try:
-                            it["photos"][current_period].append({
-                                "b64": _bytes_to_b64(snap.getvalue()),
+                            photo = {
+                                "b64": bytes_to_b64(snap.getvalue()),
                                 "caption": (st.session_state.get(f"cap_cam_{cam_key}", "") or "").strip(),
                                 "ts": time.time(),
-                            })
+                                "id": new_photo_id(),
+                            }
+                            _record("photo_added", {"section": "bci", "area": area, "idx": i, "photo": photo["id"]}, current_period, new=photo)
+                            _on_saved(CAMP, current_period)
                             st.success("Camera photo saved.")
                             st.rerun()
                         except Exception as e:
                             st.error(f"Save failed: {e}")
 
-                    upl_key = f"bci_upl_{area}_{i}_{current_sys}_{current_hosp}_{current_camp}_{current_period}"
+                    upl_key = _gc.key("bci_upl", area, i)
                     uploads = st.file_uploader(
                         "Upload images", type=["jpg", "jpeg", "png"], accept_multiple_files=True, key=upl_key
                     )
-                    if st.button("💾 Save uploads", key=f"bci_save_upl_{upl_key}") and uploads:
+                    if st.button("💾 Save uploads", key=_gc.claim(f"bci_save_upl_{upl_key}")) and uploads:
                         saved_cnt = 0
                         for up in uploads:
                             try:
-                                it["photos"][current_period].append({
-                                    "b64": _bytes_to_b64(up.getvalue()),
+                                photo = {
+                                    "b64": bytes_to_b64(up.getvalue()),
                                     "caption": (st.session_state.get(f"cap_upl_{upl_key}", "") or "").strip(),
                                     "ts": time.time(),
-                                })
+                                    "id": new_photo_id(),
+                                }
+                                _record("photo_added", {"section": "bci", "area": area, "idx": i, "photo": photo["id"]}, current_period, new=photo)
                                 saved_cnt += 1
                             except Exception as e:
                                 st.error(f"Save failed for {getattr(up, 'name','file')}: {e}")
                         if saved_cnt:
+                            _on_saved(CAMP, current_period)
                             st.success(f"Saved {saved_cnt} image(s).")
                             st.rerun()
 
                 with col_controls:
-                    st.text_input("Caption (camera)", key=f"cap_cam_{cam_key}")
-                    st.text_input("Caption (uploads)", key=f"cap_upl_{upl_key}")
+                    st.text_input("Caption (camera)", key=_gc.claim(f"cap_cam_{cam_key}"))
+                    st.text_input("Caption (uploads)", key=_gc.claim(f"cap_upl_{upl_key}"))
 
-                    if st.button("✖️ Done with this item", key=f"bci_done_{area}_{i}_{current_sys}_{current_hosp}_{current_camp}_{current_period}"):
+                    if st.button("✖️ Done with this item", key=_gc.key("bci_done", area, i)):
                         _remove_area_idx(area, i)
                         st.rerun()
 
                 # Mini-gallery with caption edit/delete
                 if gallery:
                     st.caption("Evidence:")
-                    gallery_sorted = sorted(gallery, key=lambda x: x.get("ts", 0), reverse=True)
+                    gallery_sorted = sorted(gallery, key=lambda x: x["ts"], reverse=True)
+                    if len(gallery) > 6:
+                        st.caption(f"Showing the newest 6 of {len(gallery)} — see the 🖼️ Evidence tab for all.")
                     gcols = st.columns(3)
                     for gidx, ph in enumerate(gallery_sorted[:6]):  # show up to 6
                         with gcols[gidx % 3]:
                             try:
-                                st.image(base64.b64decode(ph["b64"]), use_container_width=True)
+                                st.image(_photo_index().thumbnail(ph["id"]), use_container_width=True)
+                                if st.toggle("🔍 Full size", key=_gc.claim(f"bci_full_{ph['id']}")):
+                                    st.image(_photo_index().image(ph["id"]), use_container_width=True)
                             except Exception:
                                 st.warning("Unable to display image.")
-                            edit_key = f"bci_cap_edit_{area}_{i}_{gidx}_{current_sys}_{current_hosp}_{current_camp}_{current_period}"
-                            new_cap = st.text_input("Caption", value=ph.get("caption",""), key=edit_key)
+                            # Keyed by photo id so widgets stay attached to their photo as the gallery grows.
+                            edit_key = _gc.claim(f"bci_cap_edit_{ph['id']}")
+                            new_cap = st.text_input("Caption", value=ph["caption"], key=edit_key)
                             e1, e2 = st.columns(2)
                             with e2:
-                                if st.button("💾 Save", key=f"bci_cap_save_{edit_key}"):
-                                    for j, orig in enumerate(it["photos"][current_period]):
-                                        if orig.get("ts") == ph.get("ts"):
-                                            it["photos"][current_period][j]["caption"] = new_cap
-                                            st.success("Caption updated.")
-                                            break
+                                if st.button("💾 Save", key=_gc.claim(f"bci_cap_save_{edit_key}")):
+                                    pos = _photo_index().position(ph["id"])
+                                    _record("caption_set", {"section": "bci", "area": area, "idx": i, "photo": ph["id"], "pos": pos},
+                                            current_period, old=ph["caption"], new=new_cap)
+                                    _on_saved(CAMP, current_period, caption=(ph["id"], new_cap))
+                                    st.success("Caption updated.")
                             with e1:
-                                if st.button("🗑️ Delete", key=f"bci_cap_del_{edit_key}"):
-                                    it["photos"][current_period] = [
-                                        p for p in it["photos"][current_period] if p.get("ts") != ph.get("ts")
-                                    ]
+                                if st.button("🗑️ Delete", key=_gc.claim(f"bci_cap_del_{edit_key}")):
+                                    pos = _photo_index().position(ph["id"])
+                                    _record("photo_removed", {"section": "bci", "area": area, "idx": i, "photo": ph["id"], "pos": pos},
+                                            current_period, old=ph)
+                                    _on_saved(CAMP, current_period)
                                     st.success("Deleted.")
                                     st.rerun()
 
@@ -885,40 +869,15 @@ with TAB_SUMMARY:
         comps = {p: compute_period_components(CAMP, p, maps) for p in chosen}
         summaries = {p: summarise_from_components(c, weights) for p, c in comps.items()}
         dims = list(CAMP["sections"]["bci"]["areas"].keys())
-        rows = []
-        for d in dims:
-            row = {"Area": d}
-            for p in chosen:
-                row[p] = summaries[p]["bci_by_dimension"].get(d, 0.0)
-            rows.append(row)
-        df_bci = pd.DataFrame(rows)
-        overall_row = {"Area": "% Compliant"}
-        for p in chosen:
-            overall_row[p] = summaries[p]["bci_overall"]
-        df_bci = pd.concat([df_bci, pd.DataFrame([overall_row])], ignore_index=True)
-        if len(chosen) >= 2:
-            df_bci["Δ"] = (df_bci[chosen[-1]] - df_bci[chosen[-2]]).round(1)
+        bci_rows, op_rows = summary_tables(summaries, chosen, dims)
+        df_bci = pd.DataFrame(bci_rows)
         cfg = {p: st.column_config.NumberColumn(format="%.1f%%") for p in chosen}
         if "Δ" in df_bci.columns:
             cfg["Δ"] = st.column_config.NumberColumn(format="%+.1f%%")
         st.dataframe(df_bci, use_container_width=True, column_config=cfg)
 
         st.markdown("#### OPERATIONAL MONTHLY ASSESSMENT")
-        labels = [
-            ("Contractual Financial and PIP Results (30% of Total)", "financial_pip"),
-            ("System Standards (10% of Total)", "system_standards"),
-            ("Building Cleanliness Inspection (60% of Total)", "bci"),
-            ("Weighted % Compliant", "weighted"),
-        ]
-        op_rows = []
-        for text, key in labels:
-            r = {"Category": text}
-            for p in chosen:
-                r[p] = summaries[p]["operational"][key]
-            op_rows.append(r)
         df_op = pd.DataFrame(op_rows)
-        if len(chosen) >= 2:
-            df_op["Δ"] = (df_op[chosen[-1]] - df_op[chosen[-2]]).round(1)
         cfg2 = {p: st.column_config.NumberColumn(format="%.1f%%") for p in chosen}
         if "Δ" in df_op.columns:
             cfg2["Δ"] = st.column_config.NumberColumn(format="%+.1f%%")
@@ -947,6 +906,7 @@ with TAB_ROLLUP:
         campuses = hospobj["campuses"]
         available_periods = all_campus_periods(campuses)
         ms_key = f"rollup_periods_hospital_{current_sys}_{current_hosp}"
+        rollup_scope = (current_sys, current_hosp)
     else:
         all_camps = {}
         for h in sysobj["hospitals"].values():
@@ -954,6 +914,7 @@ with TAB_ROLLUP:
         campuses = all_camps
         available_periods = all_campus_periods(campuses)
         ms_key = f"rollup_periods_system_{current_sys}"
+        rollup_scope = (current_sys,)
 
     chosen = st.multiselect(
         "Choose periods (up to 4)",
@@ -964,59 +925,36 @@ with TAB_ROLLUP:
     )
 
     if chosen:
-        comps_by_period = {}
-        for p in chosen:
-            comp_list = []
-            for camp in campuses.values():
-                if p in camp["periods"]:
-                    comp_list.append(compute_period_components(camp, p, maps))
-            if comp_list:
-                comps_by_period[p] = aggregate_components(comp_list)
-        summaries = {p: summarise_from_components(c, weights) for p, c in comps_by_period.items()}
+        # Precomputed scope histograms (see evs.rollup); never waited on: a scope still computing shows its
+        # last figures, or a placeholder on a first-ever view.
+        rollup_hists, rollup_stale = _rollup_service().lookup(
+            st.session_state.doc["doc_id"], rollup_scope, scope_campuses(st.session_state.doc, rollup_scope),
+        )
+        if rollup_stale:
+            r1, r2 = st.columns([4, 1])
+            r1.caption("⏳ Roll-up is refreshing in the background" + (" — showing the last computed figures." if rollup_hists else "…"))
+            r2.button("Refresh", key="rollup_refresh_btn")
+        summaries = {p: summarise_from_components(components_from_histogram(rollup_hists[p], maps), weights)
+                     for p in chosen if p in (rollup_hists or {})}
         if not summaries:
-            st.info("No data for selected periods.")
+            st.info("No data for selected periods." if rollup_hists is not None else "⏳ Computing the roll-up… click **Refresh** in a moment.")
         else:
-            dims = list(build_evs_template()["sections"]["bci"]["areas"].keys())
-            rows = []
-            for d in dims:
-                row = {"Area": d}
-                for p in chosen:
-                    row[p] = summaries.get(p, {}).get("bci_by_dimension", {}).get(d, 0.0)
-                rows.append(row)
-            df_bci = pd.DataFrame(rows)
-            overall_row = {"Area": "% Compliant"}
-            for p in chosen:
-                overall_row[p] = summaries.get(p, {}).get("bci_overall", 0.0)
-            df_bci = pd.concat([df_bci, pd.DataFrame([overall_row])], ignore_index=True)
-            if len(chosen) >= 2:
-                df_bci["Δ"] = (df_bci[chosen[-1]] - df_bci[chosen[-2]]).round(1)
+            dims = list(BCI_AREA_NAMES)
+            bci_rows, op_rows = summary_tables(summaries, chosen, dims)
+            df_bci = pd.DataFrame(bci_rows)
             cfg = {p: st.column_config.NumberColumn(format="%.1f%%") for p in chosen}
             if "Δ" in df_bci.columns:
                 cfg["Δ"] = st.column_config.NumberColumn(format="%+.1f%%")
             st.dataframe(df_bci, use_container_width=True, column_config=cfg)
 
             st.markdown("#### OPERATIONAL MONTHLY ASSESSMENT")
-            labels = [
-                ("Contractual Financial and PIP Results (30% of Total)", "financial_pip"),
-                ("System Standards (10% of Total)", "system_standards"),
-                ("Building Cleanliness Inspection (60% of Total)", "bci"),
-                ("Weighted % Compliant", "weighted"),
-            ]
-            op_rows = []
-            for text, key in labels:
-                r = {"Category": text}
-                for p in chosen:
-                    r[p] = summaries.get(p, {}).get("operational", {}).get(key, 0.0)
-                op_rows.append(r)
             df_op = pd.DataFrame(op_rows)
-            if len(chosen) >= 2:
-                df_op["Δ"] = (df_op[chosen[-1]] - df_op[chosen[-2]]).round(1)
             cfg2 = {p: st.column_config.NumberColumn(format="%.1f%%") for p in chosen}
             if "Δ" in df_op.columns:
                 cfg2["Δ"] = st.column_config.NumberColumn(format="%+.1f%%")
             st.dataframe(df_op, use_container_width=True, column_config=cfg2)
 
-            # Per-campus snapshot
+            # Per-campus leaderboard from the cached ranking index
             st.markdown("#### Per-campus snapshot (selected period)")
             detail_period = st.selectbox(
                 "Campus snapshot period",
@@ -1024,37 +962,374 @@ with TAB_ROLLUP:
                 index=len(chosen) - 1,
                 key=f"campus_snapshot_{ms_key}",
             )
-            rows = []
-            for campus_name, camp in campuses.items():
-                if detail_period in camp["periods"]:
-                    comp = compute_period_components(camp, detail_period, maps)
-                    s = summarise_from_components(comp, weights)
-                    rows.append({
-                        "Campus": campus_name,
-                        "BCI Overall %": s["bci_overall"],
-                        "Contractual & PIP %": s["operational"]["financial_pip"],
-                        "System Standards %": s["operational"]["system_standards"],
-                        "Weighted %": s["operational"]["weighted"],
-                    })
-            if rows:
-                snap_df = pd.DataFrame(rows).sort_values("Weighted %", ascending=False)
+            if scope.startswith("Hospital"):
+                rank_campuses = [((current_sys, current_hosp, c), camp) for c, camp in hospobj["campuses"].items()]
+            else:
+                rank_campuses = [((current_sys, h, c), camp) for h, hobj in sysobj["hospitals"].items() for c, camp in hobj["campuses"].items()]
+            rank_key = (ms_key, st.session_state.doc.get("revision", 0), json.dumps([weights, maps], sort_keys=True))
+            if st.session_state.get("ranking_index_key") != rank_key:
+                st.session_state["ranking_index"] = RankingIndex.build(
+                    rank_campuses, maps, weights, _hist_cache(), previous=st.session_state.get("ranking_index"),
+                )
+                st.session_state["ranking_index_key"] = rank_key
+            rank_index: RankingIndex = st.session_state["ranking_index"]
+
+            if rank_index.campus_count(detail_period):
+                metric_options = ["weighted"] + [f"area:{a}" for a in BCI_AREA_NAMES]
+                metric = st.selectbox(
+                    "Rank by",
+                    metric_options,
+                    format_func=lambda m: "Weighted %" if m == "weighted" else f"BCI — {m[5:]}",
+                    key=f"rank_metric_{ms_key}",
+                )
+                dist = rank_index.distribution(detail_period, metric)
+                st.caption("Distribution across campuses — " + " | ".join(f"{k}: {v:.1f}%" for k, v in dist.items()))
+                pct_cols = ["Score %", "BCI Overall %", "Contractual & PIP %", "System Standards %", "Weighted %"]
                 st.dataframe(
-                    snap_df,
+                    pd.DataFrame(rank_index.leaderboard(detail_period, metric)),
                     use_container_width=True,
+                    hide_index=True,
                     column_config={
-                        "BCI Overall %": st.column_config.NumberColumn(format="%.1f%%"),
-                        "Contractual & PIP %": st.column_config.NumberColumn(format="%.1f%%"),
-                        "System Standards %": st.column_config.NumberColumn(format="%.1f%%"),
-                        "Weighted %": st.column_config.NumberColumn(format="%.1f%%"),
+                        **{c: st.column_config.NumberColumn(format="%.1f%%") for c in pct_cols},
+                        "Percentile": st.column_config.ProgressColumn(min_value=0.0, max_value=100.0, format="%.0f"),
                     },
                 )
+
+                st.markdown("#### Outliers")
+                o1, o2 = st.columns(2)
+                with o1:
+                    st.markdown("**Worst-performing BCI areas**")
+                    worst = rank_index.worst_areas(detail_period)
+                    if worst:
+                        st.dataframe(pd.DataFrame(worst), use_container_width=True, hide_index=True,
+                                     column_config={c: st.column_config.NumberColumn(format="%.1f%%") for c in ["Scope %", "Lowest campus %", "Median campus %"]})
+                    else:
+                        st.caption("No BCI responses scored for this period.")
+                with o2:
+                    st.markdown("**Biggest month-over-month drops (Weighted %)**")
+                    drops = rank_index.biggest_drops(detail_period)
+                    if drops:
+                        st.dataframe(pd.DataFrame(drops), use_container_width=True, hide_index=True,
+                                     column_config={"Previous %": st.column_config.NumberColumn(format="%.1f%%"),
+                                                    "Current %": st.column_config.NumberColumn(format="%.1f%%"),
+                                                    "Δ": st.column_config.NumberColumn(format="%+.1f%%")})
+                    else:
+                        st.caption("No campus dropped versus its previous period.")
+                st.markdown("**\"Fail\" clusters — same question failing at several campuses**")
+                min_camps = st.number_input("Minimum campuses", min_value=2, value=2, step=1, key=f"fail_cluster_min_{ms_key}")
+                clusters = rank_index.fail_clusters(detail_period, min_campuses=int(min_camps))
+                if clusters:
+                    st.dataframe(pd.DataFrame(clusters), use_container_width=True, hide_index=True,
+                                 column_config={"Share %": st.column_config.NumberColumn(format="%.1f%%")})
+                else:
+                    st.caption("No question fails at that many campuses.")
             else:
                 st.info("No campuses have data for that period.")
     else:
         st.info("Pick at least one period to render roll-ups.")
 
+# ---------------------- What-If ----------------------
+with TAB_WHATIF:
+    st.subheader("What-If Scoring (whole system)")
+    st.caption("Compare alternative weights and response maps side by side. Scenarios rescore cached response tallies and never change the document or the sidebar settings.")
+    sysobj = st.session_state.doc["systems"][current_sys]
+    wi_periods = sorted({p for h in sysobj["hospitals"].values() for c in h["campuses"].values() for p in c["periods"]})
+    if not wi_periods:
+        st.info("No periods recorded in this system yet.")
+    else:
+        wi_period = st.selectbox("Period", wi_periods, index=len(wi_periods) - 1, key=f"whatif_period_{current_sys}")
+        current = scenario_from_doc(st.session_state.doc)
+        params = scenario_parameters(current)
+        scen_names = ["Scenario A", "Scenario B", "Scenario C"]
+        # The editor's base frame only changes when the set of knobs does, so edits survive reruns.
+        base_key = "whatif_base_" + "|".join(f"{g}:{k}" for g, k, _, _ in params)
+        if base_key not in st.session_state:
+            st.session_state[base_key] = pd.DataFrame(
+                {"Parameter": [label for _, _, label, _ in params], **{n: [v for *_, v in params] for n in scen_names}}
+            )
+        wi_edited = st.data_editor(
+            st.session_state[base_key],
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                "Parameter": st.column_config.TextColumn(disabled=True),
+                **{n: st.column_config.NumberColumn(min_value=0.0, max_value=1.0, step=0.05) for n in scen_names},
+            },
+            key=f"whatif_editor_{base_key}",
+        )
+        if st.button("Reset scenarios to current settings", key="whatif_reset_btn"):
+            st.session_state.pop(base_key, None)
+            st.session_state.pop(f"whatif_editor_{base_key}", None)
+            st.rerun()
+        scenarios = [current] + [
+            scenario_with(current, n, {
+                (g, k): float(wi_edited[n].iloc[i]) if pd.notna(wi_edited[n].iloc[i]) else v
+                for i, (g, k, _, v) in enumerate(params)
+            })
+            for n in scen_names
+        ]
+
+        t0 = time.perf_counter()
+        cache = _hist_cache()
+        entries, hosp_entries, all_hists = [], [], []
+        for h_name, hobj in sysobj["hospitals"].items():
+            h_hists = []
+            for c_name, camp in hobj["campuses"].items():
+                if wi_period in camp["periods"]:
+                    hist = cache.get((current_sys, h_name, c_name), camp, wi_period)
+                    entries.append((f"{h_name} / {c_name}", hist))
+                    h_hists.append(hist)
+            if h_hists:
+                hosp_entries.append((f"{h_name} — all campuses", merge_histograms(h_hists)))
+                all_hists.extend(h_hists)
+        if not entries:
+            st.info("No campuses have data for that period.")
+        else:
+            system_hist = merge_histograms(all_hists)
+            st.markdown("#### System total by scenario")
+            pct_cfg = {c: st.column_config.NumberColumn(format="%.1f%%") for c in ["Contractual & PIP %", "System Standards %", "BCI %", "Weighted %"]}
+            st.dataframe(pd.DataFrame(scenario_breakdown(system_hist, scenarios)), use_container_width=True, hide_index=True, column_config=pct_cfg)
+            st.markdown("#### Weighted % by hospital and campus")
+            table = whatif_table([(f"{current_sys} — system", system_hist)] + hosp_entries + entries, scenarios)
+            cfg = {}
+            for sc in scenarios:
+                cfg[sc["name"]] = st.column_config.NumberColumn(format="%.1f%%")
+                if sc is not current:
+                    cfg[f"Δ {sc['name']}"] = st.column_config.NumberColumn(format="%+.1f%%")
+            st.dataframe(pd.DataFrame(table), use_container_width=True, hide_index=True, column_config=cfg)
+            st.caption(f"Rescored {len(entries)} campuses × {len(scenarios)} scenarios in {(time.perf_counter() - t0) * 1000:.1f} ms.")
+
+# ---------------------- Search ----------------------
+with TAB_SEARCH:
+    st.subheader("Search Findings")
+    st.caption("Full-text search over comments and photo captions (optionally question text, once per campus). Select a result and jump straight to it.")
+    ANY = "(any)"
+    q_text = st.text_input("Search", placeholder="e.g., mineral buildup, missing tent cards", key="search_text")
+    f1, f2, f3, f4, f5 = st.columns(5)
+    with f1:
+        f_sys = st.selectbox("System", [ANY] + nav.systems, key="search_f_sys")
+    hosp_opts = nav.hospitals.get(f_sys, [])
+    with f2:
+        f_hosp = st.selectbox("Hospital", [ANY] + hosp_opts, key="search_f_hosp")
+    camp_opts = nav.campuses.get((f_sys, f_hosp), [])
+    with f3:
+        f_camp = st.selectbox("Campus", [ANY] + camp_opts, key="search_f_camp")
+    with f4:
+        f_period = st.text_input("Period", placeholder="any", key="search_f_period")
+    with f5:
+        f_area = st.selectbox("BCI area", [ANY] + list(BCI_AREA_NAMES), key="search_f_area")
+    q_questions = st.checkbox("Also match question text", key="search_questions")
+
+    if q_text.strip():
+        t0 = time.perf_counter()
+        hits = _search_index().search(
+            q_text,
+            system=None if f_sys == ANY else f_sys,
+            hospital=None if f_hosp in (ANY, "") or f_hosp not in hosp_opts else f_hosp,
+            campus=None if f_camp == ANY or f_camp not in camp_opts else f_camp,
+            period=f_period.strip() or None,
+            area=None if f_area == ANY else f_area,
+            include_questions=q_questions,
+        )
+        st.caption(f"{len(hits)} result(s) in {(time.perf_counter() - t0) * 1000:.1f} ms")
+        if hits:
+            hit_df = pd.DataFrame([
+                {
+                    "Match": h["snippet"],
+                    "Where": f"{h['system']} / {h['hospital']} / {h['campus']}",
+                    "Period": h["period"],
+                    "Section": SECTION_LABELS[h["section"]] + (f" → {h['area']}" if h["area"] else ""),
+                    "Q#": h["idx"] + 1,
+                    "Question": h["question"],
+                    "Type": h["kind"],
+                }
+                for h in hits
+            ])
+            picked = st.dataframe(hit_df, use_container_width=True, hide_index=True, on_select="rerun", selection_mode="single-row", key="search_results")
+            sel_rows = picked.selection.rows if picked else []
+            if sel_rows and st.button("➡️ Jump to selected result", key="search_jump_btn"):
+                st.session_state["search_jump"] = hits[sel_rows[0]]
+                st.rerun()
+
+# ---------------------- Evidence browser ----------------------
+EVIDENCE_PAGE_SIZE = 24
+EVIDENCE_COLUMNS = 4
+
+with TAB_EVIDENCE:
+    st.subheader("Evidence Browser")
+    st.caption("BCI photos across the hospital or system, newest first. Only the page on screen is decoded.")
+    pidx = _photo_index()
+    ANY = "(any)"
+    g1, g2, g3, g4 = st.columns(4)
+    with g1:
+        ev_scope = st.radio("Scope", ["Hospital", "System"], horizontal=True, key=f"evidence_scope_{current_sys}")
+    ev_hosp = current_hosp if ev_scope == "Hospital" else None
+    with g2:
+        ev_camp_opts = sorted(st.session_state.doc["systems"][current_sys]["hospitals"][current_hosp]["campuses"]) if ev_hosp else []
+        ev_camp = st.selectbox("Campus", [ANY] + ev_camp_opts, key=f"evidence_camp_{current_sys}_{current_hosp}")
+    with g3:
+        ev_period = st.text_input("Period", placeholder="any", key="evidence_period").strip() or None
+    with g4:
+        ev_area = st.selectbox("BCI area", [ANY] + list(BCI_AREA_NAMES), key="evidence_area")
+    ev_filter = dict(system=current_sys, hospital=ev_hosp, campus=None if ev_camp == ANY else ev_camp,
+                     period=ev_period, area=None if ev_area == ANY else ev_area)
+    ev_total = pidx.count(**ev_filter)
+    ev_pages = max(1, -(-ev_total // EVIDENCE_PAGE_SIZE))
+    ev_page = st.number_input("Page", min_value=1, max_value=ev_pages, value=1, step=1, key="evidence_page")
+    st.caption(f"{ev_total} photo(s) · page {ev_page} of {ev_pages}")
+    ev_hits = pidx.page(**ev_filter, offset=(ev_page - 1) * EVIDENCE_PAGE_SIZE, limit=EVIDENCE_PAGE_SIZE)
+    for start in range(0, len(ev_hits), EVIDENCE_COLUMNS):
+        for col, ph in zip(st.columns(EVIDENCE_COLUMNS), ev_hits[start:start + EVIDENCE_COLUMNS]):
+            with col:
+                pid = ph["id"]
+                try:
+                    st.image(pidx.thumbnail(pid), use_container_width=True)
+                    if st.toggle("🔍 Full size", key=_gc.claim(f"evidence_full_{pid}")):
+                        st.image(pidx.image(pid), use_container_width=True)
+                except Exception:
+                    st.warning("Unable to display image.")
+                st.caption(f"{ph['hospital']} / {ph['campus']} · {ph['period']} · {ph['area']} Q{ph['idx'] + 1}")
+                new_cap = st.text_input("Caption", value=ph["caption"], key=_gc.claim(f"evidence_cap_{pid}"), label_visibility="collapsed")
+                path = (ph["system"], ph["hospital"], ph["campus"])
+                target = {"section": "bci", "area": ph["area"], "idx": ph["idx"], "photo": pid}
+                ev_campus = st.session_state.doc["systems"][path[0]]["hospitals"][path[1]]["campuses"][path[2]]
+                b1, b2 = st.columns(2)
+                if b1.button("💾 Save", key=_gc.claim(f"evidence_save_{pid}")) and new_cap != ph["caption"]:
+                    _record("caption_set", {**target, "pos": pidx.position(pid)}, ph["period"], path=path, old=ph["caption"], new=new_cap)
+                    _on_saved(ev_campus, ph["period"], path, caption=(pid, new_cap))
+                    st.rerun()
+                if b2.button("🗑️ Delete", key=_gc.claim(f"evidence_del_{pid}")):
+                    _record("photo_removed", {**target, "pos": pidx.position(pid)}, ph["period"], path=path, old=pidx.photo(pid))
+                    _on_saved(ev_campus, ph["period"], path)
+                    st.rerun()
+
+# ---------------------- Query ----------------------
+def _load_example_query():
+    example = st.session_state.get("query_example")
+    if example in EXAMPLE_QUERIES:
+        st.session_state["query_sql"] = EXAMPLE_QUERIES[example]
+
+with TAB_QUERY:
+    st.subheader("Ad-hoc Query")
+    st.caption("DuckDB SQL over the whole document (every system, hospital, campus and period). "
+               "Tables refresh only the campuses edited since the last query.")
+    with st.expander("Tables and columns"):
+        for name, cols in TABLES.items():
+            st.markdown(f"**{name}** — " + ", ".join(f"`{c}`" for c, _ in cols))
+    st.selectbox("Start from an example", ["(choose)"] + list(EXAMPLE_QUERIES), key="query_example", on_change=_load_example_query)
+    q_sql = st.text_area("SQL", key="query_sql", height=160, placeholder="SELECT hospital, avg(weighted_pct) FROM scores GROUP BY hospital")
+    if st.button("▶️ Run query", key="query_run_btn") and q_sql.strip():
+        try:
+            store = _analytics()
+            synced = store.sync(st.session_state.doc)
+            q_df, q_ms, q_more = store.query(q_sql)
+            st.session_state["query_result"] = (q_df, q_ms, q_more, synced)
+        except RuntimeError as e:
+            st.session_state.pop("query_result", None)
+            st.info(f"{e} Install it with `pip install duckdb pyarrow`.")
+        except Exception as e:
+            st.session_state.pop("query_result", None)
+            st.error(f"Query failed: {e}")
+    if "query_result" in st.session_state:
+        q_df, q_ms, q_more, synced = st.session_state["query_result"]
+        if q_df is None:
+            st.success(f"Done in {q_ms:.0f} ms.")
+        else:
+            st.caption(f"{len(q_df)}{'+' if q_more else ''} row(s) in {q_ms:.0f} ms · tables: {synced['rebuilt']} of "
+                       f"{synced['campuses']} campus(es) refreshed in {synced['ms']:.0f} ms")
+            st.dataframe(q_df, use_container_width=True, hide_index=True)
+            st.download_button("⬇️ Download result (CSV)", partial(q_df.to_csv, index=False), file_name="EVS_query.csv",
+                               mime="text/csv", key="query_download")
+
+# ---------------------- Reports ----------------------
+@st.cache_resource
+def _report_executor():
+    """One render pool per server process, shared by every session."""
+    return make_report_executor(max_workers=2)
+
+with TAB_REPORTS:
+    st.subheader("Monthly Report Packets")
+    st.caption("Packets render in a background worker pool; keep working and come back to download. Finished packets are reused until the document changes.")
+    if "report_queue" not in st.session_state:
+        st.session_state["report_queue"] = ReportQueue(_report_executor())
+    queue: ReportQueue = st.session_state["report_queue"]
+    weights = st.session_state.doc["weights"]
+    maps = st.session_state.doc["response_maps"]
+    sysobj = st.session_state.doc["systems"][current_sys]
+
+    rep_scope = st.radio("Scope", ["Campus", "Hospital", "System"], horizontal=True, key=f"report_scope_{current_sys}_{current_hosp}")
+    if rep_scope == "Campus":
+        rep_title = f"{current_sys} / {current_hosp} / {current_camp}"
+        rep_campuses = [(rep_title, CAMP)]
+    elif rep_scope == "Hospital":
+        rep_title = f"{current_sys} / {current_hosp}"
+        rep_campuses = [(f"{rep_title} / {c}", camp) for c, camp in sysobj["hospitals"][current_hosp]["campuses"].items()]
+    else:
+        rep_title = current_sys
+        rep_campuses = [
+            (f"{current_sys} / {h} / {c}", camp)
+            for h, hobj in sysobj["hospitals"].items()
+            for c, camp in hobj["campuses"].items()
+        ]
+    rep_periods = sorted({p for _, camp in rep_campuses for p in camp["periods"]})
+    rep_chosen = st.multiselect(
+        "Choose periods (up to 4)",
+        options=rep_periods,
+        default=rep_periods[-4:],
+        max_selections=4,
+        key=f"report_periods_{rep_scope}_{current_sys}_{current_hosp}",
+    )
+    rep_fmt = st.radio("Format", list(REPORT_FORMATS), format_func=lambda f: REPORT_FORMATS[f][0], horizontal=True, key="report_format")
+    rep_key = (
+        rep_scope, rep_title, tuple(rep_chosen), rep_fmt, st.session_state.doc.get("revision", 0),
+        json.dumps([weights, maps], sort_keys=True),
+    )
+
+    status = queue.status(rep_key)
+    c1, c2 = st.columns([1, 3])
+    with c1:
+        if st.button("Generate packet", key="report_generate_btn", disabled=not rep_chosen or status in ("running", "ready")):
+            queue.submit(rep_key, build_report_payload(rep_title, rep_campuses, rep_chosen, maps, weights, rep_scope != "Campus", APP_VERSION,
+                                                        thumbnail=lambda ph: _photo_index().thumbnail(ph["id"])), rep_fmt)
+            st.rerun()
+    with c2:
+        if status == "running":
+            st.info("Rendering in the background…")
+            st.button("Refresh status", key="report_refresh_btn")
+        elif status == "ready":
+            st.download_button(
+                f"⬇️ Download {REPORT_FORMATS[rep_fmt][0]} packet",
+                queue.result(rep_key),
+                file_name=f"EVS_Packet_{rep_title.replace(' / ', '_')}.{rep_fmt}",
+                mime=REPORT_FORMATS[rep_fmt][1],
+                key="report_download_btn",
+            )
+        elif status == "failed":
+            st.error(f"Report failed: {queue.error(rep_key)}")
+        elif not rep_chosen:
+            st.info("Pick at least one period to build a packet.")
+
+# ---------------------- Run timing ----------------------
+_run_s = _record_run()
+_perf = _perf_stats()
+_warm = list(_perf["warm_runs_s"])
+_timing = f"this run {_run_s * 1000:.0f} ms | cold start {_perf['cold_start_s'] * 1000:.0f} ms"
+if _warm:
+    _timing += f" | warm rerun median {statistics.median(_warm) * 1000:.0f} ms (n={len(_warm)})"
+
+with st.sidebar:
+    with st.expander("🧠 Session memory"):
+        if st.checkbox("Measure", key="session_mem_show", help="Walks the whole session state; leave off on large documents."):
+            _mem = _gc.usage(st.session_state, {"Document": ["doc"], "Indexes & caches": DERIVED_STATE})
+            _mb = lambda n: f"{n / 1048576:.1f} MB"
+            st.caption(f"Total ≈ {_mb(_mem['total'])} across {_mem['keys']} keys · budget {EVS_SESSION_BUDGET_MB:g} MB for campus/period state")
+            st.caption(" · ".join(f"{k}: {_mb(v)}" for k, v in _mem["groups"].items()) + f" · other: {_mb(_mem['other'])}")
+            st.dataframe([{"Scope": s, "MB": round(n / 1048576, 2)} for s, n in _mem["scoped"].items()],
+                         use_container_width=True, hide_index=True)
+        st.caption(f"{len(_gc)} campus/period scope(s) held · {_gc.evicted} stale key(s) evicted this session")
+
 st.caption(
     "Add Systems → Hospitals → Campuses and months. Use the per-area bulk editor, then Save to open evidence panels without blinking. "
-    "Export/import the whole file as JSON. | App " + APP_VERSION
+    "Export/import the whole file as JSON. | App " + APP_VERSION + " | " + _timing
 )
 
@@ -0,0 +1,24 @@
+"""Shared fixtures: a fresh v4 doc holding one template campus at `path`."""
+import pytest
+
+from evs.model import ensure_campus, new_empty_doc
+
+@pytest.fixture
+def path():
+    return ("S", "H", "C")
+
+@pytest.fixture
+def doc(path):
+    d = new_empty_doc()
+    ensure_campus(d, *path)
+    return d
+
+@pytest.fixture
+def campus(doc, path):
+    s, h, c = path
+    return doc["systems"][s]["hospitals"][h]["campuses"][c]
+
+@pytest.fixture
+def restrooms(campus):
+    """The first BCI item of the Restrooms area."""
+    return campus["sections"]["bci"]["areas"]["Restrooms"][0]
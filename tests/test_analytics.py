@@ -0,0 +1,28 @@
+import pytest
+
+from evs.model import bump_revision
+
+pytest.importorskip("pyarrow")
+from evs.analytics import AnalyticsStore  # noqa: E402
+
+def test_sync_rebuilds_only_campuses_whose_revision_moved(doc, campus):
+    store = AnalyticsStore()
+    assert store.sync(doc)["rebuilt"] == 1
+    campus["meta"]["assessed_by"] = "J. Doe"
+    assert store.sync(doc)["rebuilt"] == 0  # rows are keyed by campus revision
+    assert store.table("campuses").column("assessed_by").to_pylist() == [""]
+
+    bump_revision(doc, campus)
+    assert store.sync(doc)["rebuilt"] == 1
+    assert store.table("campuses").column("assessed_by").to_pylist() == ["J. Doe"]
+
+def test_numeric_answers_and_comments_become_strings(doc, campus, restrooms):
+    campus["periods"] = ["Jun-25"]
+    campus["sections"]["operational_info"][0]["values"]["Jun-25"] = 0
+    restrooms["responses"]["Jun-25"] = 1
+    restrooms["comments"]["Jun-25"] = 42.5
+    store = AnalyticsStore()
+    store.sync(doc)  # pa.string() columns reject raw numbers
+    rows = store.table("responses").to_pylist()
+    assert {(r["section"], r["response"], r["value"], r["comment"]) for r in rows} == {
+        ("operational_info", None, "0", None), ("bci", "1", None, "42.5")}
@@ -0,0 +1,37 @@
+import pytest
+
+from evs import codec
+from evs.codec import MAGIC, detect_format, dump_binary, dump_json, load_document
+
+@pytest.fixture
+def photo_doc(doc, restrooms):
+    restrooms["responses"]["Jun-25"] = "Pass"
+    restrooms["photos"]["Jun-25"] = [
+        {"id": "p0", "b64": "iVBORw0KGgo=", "caption": "Sink", "ts": 1.5},
+        {"id": "p1", "b64": "QR==", "caption": "", "ts": 2.0},            # non-canonical padding bits
+        {"id": "p2", "b64": "not base64!", "caption": "", "ts": 3.0},
+        {"caption": "legacy order", "b64": "AAEC", "ts": 4.0, "id": "p3"},
+    ]
+    return doc
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_binary_round_trip_re_exports_identical_json(photo_doc, compress):
+    if compress:
+        pytest.importorskip("zstandard")
+    data = dump_binary(photo_doc, compress=compress)
+    assert bool(data[5] & codec.FLAG_ZSTD) == compress
+    assert dump_json(load_document(data)) == dump_json(photo_doc)
+
+def test_only_canonical_base64_is_stored_as_bytes(photo_doc, path, restrooms):
+    s, h, c = path
+    stored = codec._photos_to_bytes(photo_doc)
+    item = stored["systems"][s]["hospitals"][h]["campuses"][c]["sections"]["bci"]["areas"]["Restrooms"][0]
+    assert [("img" in ph, "b64" in ph) for ph in item["photos"]["Jun-25"]] == [
+        (True, False), (False, True), (False, True), (True, False)]
+    assert restrooms["photos"]["Jun-25"][0]["b64"] == "iVBORw0KGgo="  # the doc itself is untouched
+
+def test_detect_format_reads_the_header(photo_doc):
+    assert detect_format(dump_binary(photo_doc, compress=False)) == "evsb"
+    assert detect_format(dump_json(photo_doc)) == "json"
+    assert detect_format(MAGIC + bytes([1, 0])) == "evsb"
+    assert detect_format(b"") == "json"
@@ -0,0 +1,57 @@
+from evs.eventlog import EventLog, held_cells
+from evs.model import PERIOD_PLACEHOLDER as PLACEHOLDER
+
+BCI = {"section": "bci", "area": "Restrooms", "idx": 0}
+
+def _select_period(log, doc, path, campus, label):
+    """What the sidebar's Add/Select Period button records."""
+    moved = held_cells(campus, PLACEHOLDER, label)
+    added = label not in campus["periods"]
+    if moved:
+        log.record(doc, "period_renamed", path, old=PLACEHOLDER, new=label, cells=moved)
+    if added:
+        log.record(doc, "period_added", path, period=label)
+
+def test_undo_after_reselecting_existing_period_keeps_its_data(doc, path, campus, restrooms):
+    log = EventLog(doc)
+    _select_period(log, doc, path, campus, "Jun-25")
+    log.record(doc, "response_set", path, "Jun-25", BCI, new="Pass")
+
+    _select_period(log, doc, path, campus, "Jun-25")  # nothing under the placeholder, period exists: nothing to record
+    assert log.undo_last(doc, path)["op"] == "response_set"
+    assert restrooms["responses"] == {}
+    assert log.undo_last(doc, path)["op"] == "period_removed"
+
+def test_undo_of_placeholder_move_restores_only_moved_cells(doc, path, campus):
+    log = EventLog(doc)
+    _select_period(log, doc, path, campus, "Jun-25")
+    rows = campus["sections"]["contractual_pip"]
+    log.record(doc, "response_set", path, "Jun-25", {"section": "contractual_pip", "idx": 0}, new="Yes")
+    log.record(doc, "response_set", path, PLACEHOLDER, {"section": "contractual_pip", "idx": 1}, new="No")
+
+    _select_period(log, doc, path, campus, "Jun-25")
+    assert rows[0]["responses"] == {"Jun-25": "Yes"}
+    assert rows[1]["responses"] == {"Jun-25": "No"}
+
+    assert log.undo_last(doc, path)["op"] == "period_renamed"
+    assert rows[0]["responses"] == {"Jun-25": "Yes"}
+    assert rows[1]["responses"] == {PLACEHOLDER: "No"}
+
+def test_memory_log_keeps_one_snapshot_sharing_photo_data(doc, path, restrooms):
+    restrooms["photos"]["Jun-25"] = [{"id": "p0", "b64": "A" * 100_000, "caption": "", "ts": 0.0}]
+    log = EventLog(doc, snapshot_every=10)
+    photo = {"id": "p1", "b64": "B" * 100_000, "caption": "", "ts": 1.0}
+    added = log.record(doc, "photo_added", path, "Jun-25", {**BCI, "photo": "p1"}, new=photo)
+    for i in range(25):
+        log.record(doc, "response_set", path, "Jun-25", BCI, new="Pass" if i % 2 else "Fail")
+    log.record(doc, "caption_set", path, "Jun-25", {**BCI, "photo": "p1"}, old="", new="Mineral buildup")
+
+    assert list(log._snapshots) == [0]
+    s, h, c = path
+    snap_item = log._snapshots[0]["systems"][s]["hospitals"][h]["campuses"][c]["sections"]["bci"]["areas"]["Restrooms"][0]
+    assert snap_item["photos"]["Jun-25"][0]["b64"] is restrooms["photos"]["Jun-25"][0]["b64"]
+    assert restrooms["photos"]["Jun-25"][1]["b64"] is photo["b64"]
+    # The caption edit changed the doc's photo, not the one held by the photo_added event.
+    assert log.event(added["seq"])["new"]["caption"] == ""
+    replayed = log.state_at(added["seq"])["systems"][s]["hospitals"][h]["campuses"][c]
+    assert replayed["sections"]["bci"]["areas"]["Restrooms"][0]["photos"]["Jun-25"][1]["caption"] == ""
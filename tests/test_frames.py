@@ -0,0 +1,24 @@
+from evs.frames import BCI_COLUMNS, changed_cells, editor_frame, requested_actions
+
+def test_changed_cells_reports_only_touched_cells(campus, restrooms):
+    items = campus["sections"]["bci"]["areas"]["Restrooms"]
+    restrooms["responses"]["Jun-25"] = "Pass"
+    restrooms["comments"]["Jun-25"] = "Streaks"
+    df = editor_frame(items, "Jun-25", BCI_COLUMNS)
+    assert changed_cells(df, df.copy(), BCI_COLUMNS) == []
+
+    edited = df.copy()
+    edited.loc[0, "Response"] = None         # cleared in the editor
+    edited.loc[0, "Comments"] = ""
+    edited.loc[1, "Response"] = "Fail"
+    edited.loc[1, "Points"] = 2.5
+    edited.loc[2, "Comments"] = None         # blank -> blank is not an edit
+    edited.loc[2, "Item"] = "Renamed"        # read-only and display-only columns are ignored
+    edited.loc[2, "Action"] = "Add evidence"
+    edited.loc[len(df)] = edited.loc[0]      # rows added in the editor are ignored
+
+    changes = changed_cells(df, edited, BCI_COLUMNS)
+    assert sorted(changes) == [(0, "comments", ""), (0, "responses", ""), (1, "points", 2.5), (1, "responses", "Fail")]
+    points = next(v for _, field, v in changes if field == "points")
+    assert type(points) is float  # plain Python for the event log, not a numpy scalar
+    assert requested_actions(edited, len(items)) == [2]
@@ -0,0 +1,12 @@
+from evs.hierarchy import HierarchyIndex
+from evs.model import ensure_campus
+
+def test_typo_matches_names_added_after_the_build(doc):
+    idx = HierarchyIndex.from_doc(doc)
+    assert idx.search("memorail") == []
+
+    ensure_campus(doc, "Memorial Hermann", "Cypress", "North Campus")
+    idx.add(doc, ("Memorial Hermann", "Cypress", "North Campus"))
+    assert idx.search("memorail") == [("Memorial Hermann", "Cypress", "North Campus")]
+    assert idx.search("cypres north") == [("Memorial Hermann", "Cypress", "North Campus")]
+    assert idx.covers(doc)
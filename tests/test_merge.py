@@ -0,0 +1,75 @@
+import copy
+
+import pytest
+
+from evs.merge import doc_delta, merge_delta
+from evs.model import ensure_campus
+
+@pytest.fixture
+def base(doc, campus, restrooms):
+    campus["periods"] = ["Jun-25"]
+    restrooms["responses"]["Jun-25"] = "Fail"
+    restrooms["photos"]["Jun-25"] = [{"id": "p0", "b64": "AAAA", "caption": "Before", "ts": 0.0}]
+    return doc
+
+def _item(doc, path, area="Restrooms", idx=0):
+    s, h, c = path
+    return doc["systems"][s]["hospitals"][h]["campuses"][c]["sections"]["bci"]["areas"][area][idx]
+
+def _merge(base, ours, theirs, **kw):
+    return merge_delta(ours, doc_delta(base, theirs), **kw)
+
+def test_change_on_one_side_applies(base, path):
+    ours, theirs = copy.deepcopy(base), copy.deepcopy(base)
+    _item(theirs, path)["responses"]["Jun-25"] = "Pass"
+    _item(ours, path)["comments"]["Jun-25"] = "Mopped"  # an unrelated cell of ours
+
+    res = _merge(base, ours, theirs)
+    assert (res["applied"], res["conflicts"], res["touched"]) == (1, [], [path])
+    assert _item(ours, path)["responses"]["Jun-25"] == "Pass"
+    assert _item(ours, path)["comments"]["Jun-25"] == "Mopped"
+    assert _merge(base, ours, theirs)["unchanged"] == 1  # merging again changes nothing
+
+@pytest.mark.parametrize("prefer, kept, value", [("ours", "mine", "N/A"), ("theirs", "theirs", "Pass")])
+def test_change_on_both_sides_is_a_conflict(base, path, prefer, kept, value):
+    ours, theirs = copy.deepcopy(base), copy.deepcopy(base)
+    _item(theirs, path)["responses"]["Jun-25"] = "Pass"
+    _item(ours, path)["responses"]["Jun-25"] = "N/A"
+
+    res = _merge(base, ours, theirs, prefer=prefer)
+    conflict, = res["conflicts"]
+    assert (conflict["Base"], conflict["Mine"], conflict["Theirs"], conflict["Kept"]) == ("Fail", "N/A", "Pass", kept)
+    assert _item(ours, path)["responses"]["Jun-25"] == value
+
+def test_same_change_on_both_sides_is_not_a_conflict(base, path):
+    ours, theirs = copy.deepcopy(base), copy.deepcopy(base)
+    for d in (ours, theirs):
+        _item(d, path)["responses"]["Jun-25"] = "Pass"
+    res = _merge(base, ours, theirs)
+    assert (res["applied"], res["unchanged"], res["conflicts"]) == (0, 1, [])
+
+def test_new_period_and_new_campus_arrive(base, path):
+    ours, theirs = copy.deepcopy(base), copy.deepcopy(base)
+    s, h, c = path
+    theirs["systems"][s]["hospitals"][h]["campuses"][c]["periods"].append("Jul-25")
+    _item(theirs, path)["responses"]["Jul-25"] = "Pass"
+    ensure_campus(theirs, s, h, "North")
+    theirs["systems"][s]["hospitals"][h]["campuses"]["North"]["periods"] = ["Jul-25"]
+    _item(theirs, (s, h, "North"))["comments"]["Jul-25"] = "New campus"
+
+    res = _merge(base, ours, theirs)
+    assert res["conflicts"] == [] and res["touched"] == [path, (s, h, "North")]
+    assert ours["systems"][s]["hospitals"][h]["campuses"][c]["periods"] == ["Jun-25", "Jul-25"]
+    assert _item(ours, path)["responses"] == {"Jun-25": "Fail", "Jul-25": "Pass"}
+    assert ours["systems"][s]["hospitals"][h]["campuses"]["North"]["periods"] == ["Jul-25"]
+    assert _item(ours, (s, h, "North"))["comments"] == {"Jul-25": "New campus"}
+
+def test_photos_added_and_removed_merge_as_sets(base, path):
+    ours, theirs = copy.deepcopy(base), copy.deepcopy(base)
+    _item(theirs, path)["photos"]["Jun-25"] = [{"id": "p1", "b64": "BBBB", "caption": "After", "ts": 1.0}]  # p0 removed
+    _item(ours, path)["photos"]["Jun-25"].append({"id": "p2", "b64": "CCCC", "caption": "", "ts": 2.0})
+
+    res = _merge(base, ours, theirs)
+    assert (res["applied"], res["conflicts"]) == (2, [])
+    assert [ph["id"] for ph in _item(ours, path)["photos"]["Jun-25"]] == ["p1", "p2"]
+    assert _item(ours, path)["photos"]["Jun-25"][0]["b64"] == "BBBB"
@@ -0,0 +1,45 @@
+import io
+
+import pytest
+
+from evs.eventlog import EventLog
+from evs.model import bytes_to_b64
+from evs.photos import THUMB_PX, PhotoIndex
+
+BCI = {"section": "bci", "area": "Restrooms", "idx": 0}
+
+@pytest.fixture
+def gallery(restrooms):
+    restrooms["photos"]["Jun-25"] = [{"id": f"p{i}", "b64": "AAAA", "caption": "", "ts": float(i)} for i in range(3)]
+    return restrooms["photos"]["Jun-25"]
+
+def test_caption_and_delete_by_indexed_position(doc, path, gallery):
+    idx, log = PhotoIndex.from_doc(doc), EventLog(doc)
+    assert idx.page("S")[0]["id"] == "p2"
+
+    log.record(doc, "caption_set", path, "Jun-25", {**BCI, "photo": "p1", "pos": idx.position("p1")}, old="", new="Streaks")
+    idx.set_caption("p1", "Streaks")
+    assert gallery[1]["caption"] == "Streaks"
+    assert [ph["caption"] for ph in idx.page("S")] == ["", "Streaks", ""]
+
+    log.record(doc, "photo_removed", path, "Jun-25", {**BCI, "photo": "p1", "pos": idx.position("p1")}, old=idx.photo("p1"))
+    assert [ph["id"] for ph in gallery] == ["p0", "p2"]
+    log.undo_last(doc, path)
+    assert [ph["id"] for ph in gallery] == ["p0", "p1", "p2"]
+
+def test_stale_position_falls_back_to_id(doc, path, gallery):
+    EventLog(doc).record(doc, "photo_removed", path, "Jun-25", {**BCI, "photo": "p2", "pos": 0}, old=gallery[2])
+    assert [ph["id"] for ph in gallery] == ["p0", "p1"]
+
+def test_thumbnails_are_small_cached_jpegs(doc, restrooms):
+    Image = pytest.importorskip("PIL.Image")
+    buf = io.BytesIO()
+    Image.new("RGB", (1600, 1200), (200, 30, 30)).save(buf, "PNG")
+    restrooms["photos"]["Jun-25"] = [{"id": "big", "b64": bytes_to_b64(buf.getvalue()), "caption": "", "ts": 0.0}]
+    idx = PhotoIndex.from_doc(doc)
+
+    thumb = idx.thumbnail("big")
+    with Image.open(io.BytesIO(thumb)) as im:
+        assert im.format == "JPEG" and max(im.size) == THUMB_PX
+    assert idx.thumbnail("big") is thumb
+    assert idx.image("big") == buf.getvalue()
@@ -0,0 +1,32 @@
+from evs.cache import HistogramCache
+from evs.loadtest import synthetic_doc
+from evs.model import bump_revision, iter_campuses
+from evs.rankings import RankingIndex
+
+def _rows(idx, period):
+    return idx._rows[period]
+
+def test_rebuild_rescores_only_campuses_whose_revision_moved():
+    doc = synthetic_doc(systems=1, hospitals=2, campuses=2, periods=2, photos=0)
+    campuses = [((s, h, c), camp) for s, h, c, camp in iter_campuses(doc)]
+    maps, weights, cache = doc["response_maps"], doc["weights"], HistogramCache()
+    period = campuses[0][1]["periods"][-1]
+    first = RankingIndex.build(campuses, maps, weights, cache)
+
+    (path, camp), others = campuses[0], campuses[1:]
+    for area in camp["sections"]["bci"]["areas"].values():
+        for it in area:
+            it["responses"][period] = "Fail"
+    bump_revision(doc, camp)
+    second = RankingIndex.build(campuses, maps, weights, cache, previous=first)
+
+    assert all(_rows(second, period)[p] is _rows(first, period)[p] for p, _ in others)
+    assert _rows(second, period)[path] is not _rows(first, period)[path]
+    assert _rows(second, period)[path]["bci"] == 0.0
+    fresh = RankingIndex.build(campuses, maps, weights, HistogramCache())
+    assert second.leaderboard(period) == fresh.leaderboard(period)
+    assert second.leaderboard(period, worst_first=True)[0]["Campus"] == f"{path[1]} / {path[2]}"
+
+    # Other weights: nothing can be reused.
+    third = RankingIndex.build(campuses, maps, {**weights, "bci": 0.2}, cache, previous=second)
+    assert not any(_rows(third, period)[p] is _rows(second, period)[p] for p, _ in campuses)
@@ -0,0 +1,24 @@
+import io
+
+import pytest
+
+from evs.model import DEFAULT_WEIGHTS, bytes_to_b64, copy_response_maps
+from evs.photos import THUMB_PX
+from evs.reports import build_report_payload
+
+Image = pytest.importorskip("PIL.Image")
+
+def test_payload_carries_thumbnails_not_full_photos(campus, restrooms):
+    buf = io.BytesIO()
+    Image.new("RGB", (2400, 1800), "teal").save(buf, format="PNG")
+    campus["periods"] = ["Jun-25"]
+    restrooms["photos"]["Jun-25"] = [{"id": "p0", "b64": bytes_to_b64(buf.getvalue()), "caption": "Sink", "ts": 0.0},
+                                     {"id": "p1", "b64": "not an image", "caption": "", "ts": 1.0}]
+
+    payload = build_report_payload("Packet", [("C", campus)], ["Jun-25"], copy_response_maps(), DEFAULT_WEIGHTS, False)
+    thumbs = payload["campuses"][0]["thumbnails"]
+    assert [th["caption"] for th in thumbs] == ["", "Sink"]
+    assert thumbs[0]["image"] is None
+    assert "b64" not in thumbs[1] and "photo" not in thumbs[1]
+    with Image.open(io.BytesIO(thumbs[1]["image"])) as im:
+        assert im.format == "JPEG" and max(im.size) <= THUMB_PX
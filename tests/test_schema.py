@@ -0,0 +1,19 @@
+from evs.model import PERIOD_PLACEHOLDER
+from evs.schema import repair_doc
+
+def test_missing_fields_are_added_and_reported(doc, path, campus, restrooms):
+    del restrooms["photos"]
+    del campus["sections"]["contractual_pip"][0]["comments"]
+    problems = repair_doc(doc)[path]
+    assert "Restrooms Q1: 'photos' missing; added" in problems
+    assert "contractual_pip Q1: 'comments' missing; added" in problems
+    assert restrooms["photos"] == {}
+
+def test_periods_are_rebuilt_from_saved_data(doc, path, campus, restrooms):
+    campus["sections"]["operational_info"][0]["values"] = {"May-25": "95%"}
+    restrooms["responses"] = {"Jun-25": "Pass", PERIOD_PLACEHOLDER: "Fail"}
+    restrooms["photos"] = {"Jul-25": []}
+    campus["periods"] = "May-25"
+    problems = repair_doc(doc)[path]
+    assert campus["periods"] == ["May-25", "Jun-25", "Jul-25"]
+    assert problems[0] == "periods: not a list; rebuilt from the saved data (3 found)"
@@ -0,0 +1,22 @@
+from evs.search import SearchIndex
+
+def _where(hits):
+    return sorted((h["kind"], h["period"]) for h in hits if h["area"] == "Restrooms" and h["idx"] == 0)
+
+def test_question_text_is_indexed_once_per_question(doc, path, campus, restrooms):
+    restrooms["comments"] = {"Jun-25": "Mineral buildup on taps", "Jul-25": "Taps fixed"}
+    restrooms["photos"]["Jun-25"] = [{"id": "p0", "b64": "", "caption": "Buildup", "ts": 0.0}]
+    idx = SearchIndex.from_doc(doc)
+
+    # "grout" is only in the question text: one hit, not one per comment and caption.
+    assert _where(idx.search("grout", include_questions=True)) == [("question", "")]
+    assert idx.search("grout") == []
+    hit, = idx.search("buildup on taps")
+    assert hit["question"] == restrooms["name"]
+
+    # A period save replaces that period's findings and leaves the question row alone.
+    restrooms["comments"]["Jun-25"] = "Clean"
+    idx.reindex(path, campus, "Jun-25")
+    assert _where(idx.search("buildup")) == [("caption", "Jun-25")]
+    assert _where(idx.search("taps", period="Jul-25")) == [("comment", "Jul-25")]
+    assert _where(idx.search("grout", period="Jul-25", include_questions=True)) == [("question", "")]
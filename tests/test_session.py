@@ -0,0 +1,40 @@
+import io
+
+from evs.session import SessionGC, sizeof
+
+KB = 1024
+
+def _visit(gc, state, scope, kb):
+    gc.enter(scope)
+    state[gc.key("bci_cam", "Restrooms", 0)] = io.BytesIO(b"x" * kb * KB)
+
+def test_bytesio_is_counted_once():
+    for buf in (io.BytesIO(b"x" * 100 * KB), io.BytesIO(bytes(100 * KB))):  # owned and shared buffers
+        assert 100 * KB <= sizeof(buf) < 101 * KB
+
+def test_collect_evicts_least_recently_used_scopes_until_within_budget():
+    gc, state = SessionGC(budget_bytes=250 * KB, keep_scopes=10), {"doc": {}}
+    a, b, c, d = (("S", "H", camp, "Jun-25") for camp in "ABCD")
+    for scope in (a, b, c):
+        _visit(gc, state, scope, 100)
+    gc.enter(a)                      # revisiting A makes B the oldest
+    _visit(gc, state, d, 100)
+
+    gone = gc.collect(state)
+    assert gone == ["bci_cam_Restrooms_0_S_H_B_Jun-25", "bci_cam_Restrooms_0_S_H_C_Jun-25"]
+    assert sorted(state) == ["bci_cam_Restrooms_0_S_H_A_Jun-25", "bci_cam_Restrooms_0_S_H_D_Jun-25", "doc"]
+    assert (len(gc), gc.evicted, gc.collect(state)) == (2, 2, [])
+    assert sum(sizeof(state[k]) for k in state if k != "doc") <= gc.budget_bytes
+
+def test_scope_count_limit_and_the_active_scope():
+    gc, state = SessionGC(budget_bytes=50 * KB, keep_scopes=2), {}
+    scopes = [("S", "H", "C", p) for p in ("Apr-25", "May-25", "Jun-25")]
+    for scope in scopes:
+        _visit(gc, state, scope, 100)  # each one alone is over budget
+
+    gc.collect(state)
+    assert list(state) == ["bci_cam_Restrooms_0_S_H_C_Jun-25"]  # the active scope is never evicted
+    assert gc.active == scopes[-1] and len(gc) == 1
+
+    assert gc.forget(state) == [] and len(state) == 1
+    assert gc.forget(state, keep_active=False) == ["bci_cam_Restrooms_0_S_H_C_Jun-25"] and state == {}
@@ -0,0 +1,43 @@
+import pytest
+
+from evs.loadtest import synthetic_doc
+from evs.model import iter_campuses
+from evs.scoring import (
+    aggregate_components, compute_period_components, merge_histograms, response_histogram, summarise_from_components,
+)
+from evs.whatif import scenario_breakdown, scenario_from_doc, scenario_with, whatif_table
+
+@pytest.fixture
+def filled():
+    return synthetic_doc(systems=1, hospitals=1, campuses=3, periods=2, photos=0)
+
+@pytest.fixture
+def scenarios(filled):
+    current = scenario_from_doc(filled)
+    return [
+        current,
+        scenario_with(current, "BCI-heavy", {("weights", "bci"): 0.8, ("weights", "financial_pip"): 0.1}),
+        scenario_with(current, "Lenient", {("bci", "Fail"): 0.25, ("contractual_pip", "No"): 0.5, ("weights", "bci"): 0.5}),
+    ]
+
+def _rescored(campus, period, sc):
+    return summarise_from_components(compute_period_components(campus, period, sc["response_maps"]), sc["weights"])["operational"]
+
+def test_whatif_rows_equal_a_full_rescore(filled, scenarios):
+    campuses = [(c, camp) for _, _, c, camp in iter_campuses(filled)]
+    entries = [(f"{c} {p}", response_histogram(camp, p)) for c, camp in campuses for p in camp["periods"]]
+    rows = whatif_table(entries, scenarios)
+    expected = [{sc["name"]: _rescored(camp, p, sc)["weighted"] for sc in scenarios} for _, camp in campuses for p in camp["periods"]]
+    assert [{sc["name"]: row[sc["name"]] for sc in scenarios} for row in rows] == expected
+    assert expected[0]["Lenient"] != expected[0]["Current"]  # the scenarios really differ
+
+def test_breakdown_of_merged_histograms_equals_aggregated_rescore(filled, scenarios):
+    camps = [camp for *_, camp in iter_campuses(filled)]
+    period = camps[0]["periods"][-1]
+    merged = merge_histograms([response_histogram(camp, period) for camp in camps])
+    for row, sc in zip(scenario_breakdown(merged, scenarios), scenarios):
+        full = summarise_from_components(
+            aggregate_components([compute_period_components(camp, period, sc["response_maps"]) for camp in camps]), sc["weights"],
+        )["operational"]
+        assert (row["Contractual & PIP %"], row["System Standards %"], row["BCI %"], row["Weighted %"]) == (
+            full["financial_pip"], full["system_standards"], full["bci"], full["weighted"])